@@ -0,0 +1,354 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from metrics import CLASSIFY_LIMIT
+
+logger = logging.getLogger(__name__)
+
+# 基线延迟取最近两个窗口（每个窗口这么多个成功请求）内的最小延迟，服务本身变慢后阈值能跟上
+_BASELINE_WINDOW = 200
+
+
+class Overloaded(Exception):
+    """队列已满：overflow 为 shed，或 block 等待超过 block_timeout"""
+
+
+class AIMDLimiter:
+    """
+    按观察到的延迟与错误率调整并发上限（AIMD）：
+    请求失败或延迟超过阈值时上限乘以 backoff（同一拥塞窗口内只减一次，即只响应上次减少之后开始的请求），
+    请求正常且并发已用满时每个请求增加 1/limit，约每轮并发增加 1。
+
+    延迟阈值为 latency_target；为 0 时取基线延迟的 tolerance 倍，
+    基线延迟为最近 200 到 400 个成功请求中的最小延迟。
+
+    Args:
+        initial: 初始并发上限
+        min_limit: 并发上限下限
+        max_limit: 并发上限上限
+        latency_target: 延迟阈值（秒），0 表示按基线延迟自动确定
+        tolerance: 自动阈值相对基线延迟的倍数
+        backoff: 拥塞时并发上限的缩小比例
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 32, latency_target: float = 0.0,
+                 tolerance: float = 2.0, backoff: float = 0.75):
+        self.min_limit = max(1, int(min_limit))
+        self.max_limit = max(self.min_limit, int(max_limit))
+        self.latency_target = max(0.0, float(latency_target))
+        self.tolerance = max(1.0, float(tolerance))
+        self.backoff = min(0.99, max(0.1, float(backoff)))
+        self._lock = threading.Lock()
+        self._limit = float(min(self.max_limit, max(self.min_limit, int(initial))))
+        self._window_min: Optional[float] = None
+        self._previous_min: Optional[float] = None
+        self._window_count = 0
+        self._last_decrease = float("-inf")
+
+        self._samples = 0
+        self._errors = 0
+        self._congested = 0
+        self._increases = 0
+        self._decreases = 0
+        CLASSIFY_LIMIT.set(int(self._limit))
+
+    @property
+    def limit(self) -> int:
+        with self._lock:
+            return int(self._limit)
+
+    def record(self, started: float, latency: float, ok: bool, saturated: bool) -> bool:
+        """
+        记录一次请求结果。
+
+        Args:
+            started: 请求开始时间（time.monotonic()）
+            latency: 请求耗时（秒）
+            ok: 请求是否成功
+            saturated: 并发是否已用满（有排队任务或在途请求数达到上限），未用满时不增加上限
+
+        Returns:
+            并发上限是否变化
+        """
+        with self._lock:
+            self._samples += 1
+            if ok:
+                self._update_baseline(latency)
+            before = int(self._limit)
+            threshold = self._threshold()
+            if not ok or (threshold is not None and latency > threshold):
+                if ok:
+                    self._congested += 1
+                else:
+                    self._errors += 1
+                if started >= self._last_decrease:
+                    self._limit = max(float(self.min_limit), self._limit * self.backoff)
+                    self._last_decrease = time.monotonic()
+                    self._decreases += 1
+            elif saturated:
+                self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+                if int(self._limit) > before:
+                    self._increases += 1
+            changed = int(self._limit) != before
+        if changed:
+            CLASSIFY_LIMIT.set(int(self._limit))
+        return changed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limit": int(self._limit),
+                "min_limit": self.min_limit,
+                "max_limit": self.max_limit,
+                "baseline": self._baseline() or 0.0,
+                "threshold": self._threshold() or 0.0,
+                "samples": self._samples,
+                "errors": self._errors,
+                "congested": self._congested,
+                "increases": self._increases,
+                "decreases": self._decreases,
+            }
+
+    def _update_baseline(self, latency: float) -> None:
+        if self._window_min is None or latency < self._window_min:
+            self._window_min = latency
+        self._window_count += 1
+        if self._window_count >= _BASELINE_WINDOW:
+            self._previous_min, self._window_min, self._window_count = self._window_min, None, 0
+
+    def _baseline(self) -> Optional[float]:
+        candidates = [value for value in (self._window_min, self._previous_min) if value is not None]
+        return min(candidates) if candidates else None
+
+    def _threshold(self) -> Optional[float]:
+        if self.latency_target:
+            return self.latency_target
+        baseline = self._baseline()
+        if baseline is None:
+            return None
+        return baseline * self.tolerance
+
+
+class AdaptiveExecutor:
+    """
+    并发数受 AIMDLimiter 控制的线程池：最多 limiter.limit 个任务同时执行，其余在有界队列中等待。
+    队列已满时 overflow 为 block 则阻塞提交方（向调度器施加背压，block_timeout 为 0 表示一直等待），
+    为 shed 则直接抛出 Overloaded。线程按当前并发上限惰性创建。
+
+    任务自行调用 record 报告下游服务的延迟与结果，不涉及服务调用的任务（如本地预筛）不影响并发上限。
+
+    Args:
+        limiter: 并发上限控制器
+        queue_size: 等待队列长度，0 表示不限制
+        overflow: 队列已满时的处理方式，block 或 shed
+        block_timeout: block 模式下最多等待的时间（秒），超时后抛出 Overloaded，0 表示一直等待
+        drain_timeout: shutdown 时等待已提交任务完成的时间（秒），超时后取消仍在排队的任务
+        name: 线程名前缀
+    """
+
+    def __init__(self, limiter: AIMDLimiter, queue_size: int = 256, overflow: str = "block",
+                 block_timeout: float = 0.0, drain_timeout: float = 60.0, name: str = "adaptive"):
+        self.limiter = limiter
+        self.queue_size = max(0, int(queue_size))
+        self.overflow = str(overflow).lower()
+        if self.overflow not in ("block", "shed"):
+            raise ValueError(f"未知的队列溢出处理方式: {overflow}")
+        self.block_timeout = max(0.0, float(block_timeout))
+        self.drain_timeout = max(0.0, float(drain_timeout))
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending: Deque[Tuple[Future, Callable[..., Any], tuple, dict]] = deque()
+        self._inflight = 0
+        self._threads: List[threading.Thread] = []
+        self._shutdown = False
+
+        self._submitted = 0
+        self._completed = 0
+        self._shed = 0
+        self._cancelled = 0
+        self._blocked = 0
+        self._blocked_time = 0.0
+        self._peak_pending = 0
+        self._peak_inflight = 0
+
+    @classmethod
+    def from_config(cls, service_cfg: Dict[str, Any], min_limit: int = 1, name: str = "classify") -> "AdaptiveExecutor":
+        """
+        根据 service 段创建分类线程池：service.workers 为初始并发，service.limiter 控制自适应范围与队列。
+
+        Args:
+            service_cfg: service 配置段
+            min_limit: 并发上限的最低值（微批模式下为 MicroBatcher.min_concurrency）
+            name: 线程名前缀
+        """
+        limiter_cfg = service_cfg.get("limiter", {}) or {}
+        initial = max(int(service_cfg.get("workers", 4)), min_limit)
+        if limiter_cfg.get("enabled", True):
+            low = max(int(limiter_cfg.get("min_limit", 1)), min_limit)
+            high = max(int(limiter_cfg.get("max_limit", 32)), initial)
+        else:
+            # 关闭自适应时并发固定为 service.workers
+            low = high = initial
+        limiter = AIMDLimiter(
+            initial=initial,
+            min_limit=low,
+            max_limit=high,
+            latency_target=float(limiter_cfg.get("latency_target", 0.0)),
+            tolerance=float(limiter_cfg.get("tolerance", 2.0)),
+            backoff=float(limiter_cfg.get("backoff", 0.75)),
+        )
+        return cls(
+            limiter,
+            queue_size=int(limiter_cfg.get("queue_size", 256)),
+            overflow=limiter_cfg.get("overflow", "block"),
+            block_timeout=float(limiter_cfg.get("block_timeout", 0.0)),
+            drain_timeout=float(limiter_cfg.get("drain_timeout", 60.0)),
+            name=name,
+        )
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """
+        提交任务。队列已满时按 overflow 阻塞或抛出 Overloaded。
+
+        Raises:
+            Overloaded: 队列已满且被丢弃
+            RuntimeError: 已经 shutdown
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("线程池已关闭")
+            if self.queue_size and len(self._pending) >= self.queue_size:
+                if self.overflow == "shed":
+                    self._shed += 1
+                    raise Overloaded(f"等待队列已满 ({self.queue_size})")
+                self._wait_for_room()
+            self._pending.append((future, fn, args, kwargs))
+            self._submitted += 1
+            self._peak_pending = max(self._peak_pending, len(self._pending))
+            self._spawn()
+            self._cond.notify_all()
+        return future
+
+    def record(self, started: float, latency: float, ok: bool) -> None:
+        """由任务报告一次下游服务调用的开始时间（time.monotonic()）、耗时与结果"""
+        with self._cond:
+            saturated = bool(self._pending) or self._inflight >= self.limiter.limit
+        if self.limiter.record(started, latency, ok, saturated):
+            with self._cond:
+                self._spawn()
+                self._cond.notify_all()
+
+    def shutdown(self, timeout: Optional[float] = None) -> int:
+        """
+        停止接受新任务，最多等待 timeout 秒（默认 drain_timeout）让已提交的任务完成，
+        之后取消仍在排队的任务（Future 以 CancelledError 结束）。
+
+        Returns:
+            被取消的任务数
+        """
+        timeout = self.drain_timeout if timeout is None else max(0.0, timeout)
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+            while self._pending or self._inflight:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            leftover = list(self._pending)
+            self._pending.clear()
+            inflight = self._inflight
+            self._cancelled += len(leftover)
+            self._cond.notify_all()
+        for future, _, _, _ in leftover:
+            future.cancel()
+        if leftover or inflight:
+            logger.warning(f"{self.name} 线程池关闭: 取消 {len(leftover)} 个排队任务, {inflight} 个任务仍在执行")
+        for thread in self._threads:
+            thread.join(timeout=0.1 if inflight else 5)
+        return len(leftover)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.limiter.stats()
+        with self._cond:
+            stats.update(
+                submitted=self._submitted,
+                completed=self._completed,
+                pending=len(self._pending),
+                inflight=self._inflight,
+                peak_pending=self._peak_pending,
+                peak_inflight=self._peak_inflight,
+                blocked=self._blocked,
+                blocked_time=self._blocked_time,
+                shed=self._shed,
+                cancelled=self._cancelled,
+                threads=len(self._threads),
+            )
+        return stats
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"并发上限 {stats['limit']} (范围 {stats['min_limit']}-{stats['max_limit']}, "
+            f"增加 {stats['increases']} 次, 减少 {stats['decreases']} 次), "
+            f"基线延迟 {stats['baseline'] * 1000:.0f}ms, 服务调用 {stats['samples']} 次 "
+            f"(失败 {stats['errors']}, 超过延迟阈值 {stats['congested']}), "
+            f"提交 {stats['submitted']} 个, 完成 {stats['completed']} 个, 在途峰值 {stats['peak_inflight']}, "
+            f"排队峰值 {stats['peak_pending']}, 阻塞提交 {stats['blocked']} 次 (共 {stats['blocked_time']:.1f}s), "
+            f"丢弃 {stats['shed']} 个, 取消 {stats['cancelled']} 个"
+        )
+
+    def _wait_for_room(self) -> None:
+        """阻塞到队列有空位（调用方持有 _cond）"""
+        self._blocked += 1
+        started = time.monotonic()
+        deadline = started + self.block_timeout if self.block_timeout else None
+        try:
+            while len(self._pending) >= self.queue_size:
+                if self._shutdown:
+                    raise RuntimeError("线程池已关闭")
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._shed += 1
+                    raise Overloaded(f"等待队列已满 ({self.queue_size})，等待 {self.block_timeout}s 后仍无空位")
+                self._cond.wait(remaining)
+        finally:
+            self._blocked_time += time.monotonic() - started
+
+    def _spawn(self) -> None:
+        """线程数补足到当前并发上限（调用方持有 _cond）"""
+        while len(self._threads) < self.limiter.limit:
+            thread = threading.Thread(target=self._worker, name=f"{self.name}-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def _worker(self) -> None:
+        while True:
+            with self._cond:
+                while not (self._pending and self._inflight < self.limiter.limit):
+                    if self._shutdown and not self._pending:
+                        return
+                    self._cond.wait()
+                future, fn, args, kwargs = self._pending.popleft()
+                self._inflight += 1
+                self._peak_inflight = max(self._peak_inflight, self._inflight)
+                self._cond.notify_all()
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        result = fn(*args, **kwargs)
+                    except BaseException as e:
+                        future.set_exception(e)
+                    else:
+                        future.set_result(result)
+            finally:
+                with self._cond:
+                    self._inflight -= 1
+                    self._completed += 1
+                    self._cond.notify_all()
@@ -0,0 +1,64 @@
+import logging
+import queue
+import threading
+import time
+from typing import Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """
+    后台批量写入线程：调用方只把记录放入队列，由写入线程按 batch_size 条或 flush_interval 秒
+    凑成一批交给 _write，避免磁盘写入拖慢调用方。
+
+    子类实现 _write(batch)；需要在写入线程中打开连接等资源时重写 _run 并在其中调用 super()._run()。
+
+    Args:
+        name: 写入线程名称
+        flush_interval: 批量写入间隔（秒）
+        batch_size: 每批最多写入的记录数
+    """
+
+    def __init__(self, name: str, flush_interval: float, batch_size: int):
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.batch_size = max(1, int(batch_size))
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def put(self, item: Any) -> None:
+        self._queue.put(item)
+
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """写入剩余记录并停止写入线程，超时返回 False"""
+        self._queue.put(None)
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def _run(self) -> None:
+        closing = False
+        while not closing:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch: List[Any] = []
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    closing = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Any]) -> None:
+        raise NotImplementedError
@@ -0,0 +1,160 @@
+"""
+端到端吞吐量基准：用模拟 WebDriver 与本地服务替身驱动 run_tasks（或直接循环调用 process_single_url），
+输出 URLs/秒、各阶段 p50/p95/p99 延迟与重试率，并写入 JSON 结果文件用于跨版本对比。
+
+用法:
+    python -m benchmarks.bench_pipeline --urls 200 --workers 4 --output bench.json
+    python -m benchmarks.bench_pipeline --mode process --urls 50 --set visit.settle_mode=adaptive
+"""
+import argparse
+import copy
+import json
+import logging
+import platform
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import yaml
+
+from benchmarks.fakes import fake_driver_factory
+from benchmarks.stub_services import StubServices
+from browser_pool import BrowserPool
+from config_manager import load_config
+from run_stats import RunStats
+from task_scheduler import run_tasks
+
+
+def _apply_overrides(config: Dict[str, Any], overrides: List[str]) -> None:
+    """应用 --set section.key=value 形式的配置覆盖，值按 YAML 解析"""
+    for item in overrides:
+        key, _, raw_value = item.partition("=")
+        section = config
+        parts = key.split(".")
+        for part in parts[:-1]:
+            section = section.setdefault(part, {})
+        section[parts[-1]] = yaml.safe_load(raw_value)
+
+
+def _build_config(args: argparse.Namespace, stub: StubServices, screenshots_dir: str) -> Dict[str, Any]:
+    config = copy.deepcopy(load_config(args.config))
+    config.setdefault("pcapng", {}).update({
+        "service": stub.base_url,
+        "interface": config.get("pcapng", {}).get("interface") or "lo",
+        "port": config.get("pcapng", {}).get("port") or {"tls": 10808, "proxy": 15973},
+    })
+    config.setdefault("service", {})["resnet18_url"] = stub.predict_url
+    config.setdefault("file", {})["screenshots_dir"] = screenshots_dir
+    config.setdefault("scheduler", {})["workers"] = args.workers
+    config.setdefault("websites", {})["count"] = 1
+    _apply_overrides(config, args.set)
+    return config
+
+
+def _urls(count: int, domains: int) -> List[str]:
+    return [f"https://site{i % domains}.bench.test/page/{i}" for i in range(count)]
+
+
+def _run_process_loop(config: Dict[str, Any], urls: List[str], driver_factory) -> Dict[str, Any]:
+    """不经过调度器，单线程循环调用 process_single_url，并等待所有分类结果"""
+    from process_handler import process_single_url
+
+    pool = BrowserPool.from_config(config, driver_factory)
+    stats = RunStats(1)
+    futures = []
+    try:
+        pool.warm_up()
+        for url in urls:
+            started = time.perf_counter()
+            result = process_single_url(pool, url, config)
+            stats.record_visit(0, result["status"], time.perf_counter() - started)
+            stats.record_timings(result.get("timings") or {})
+            if result.get("future") is not None:
+                futures.append(result["future"])
+            elif result["status"] == "success":
+                stats.record_success()
+        for future in futures:
+            async_result = future.result()
+            stats.record_timings(async_result.get("timings") or {})
+            if async_result.get("is_blank"):
+                stats.record_blank()
+            else:
+                stats.record_success()
+    finally:
+        pool.close()
+        stats.finish()
+    return stats.summary()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("scheduler", "process"), default="scheduler",
+                        help="scheduler 驱动 run_tasks；process 直接循环调用 process_single_url")
+    parser.add_argument("--config", default="config.yaml", help="基础配置文件")
+    parser.add_argument("--urls", type=int, default=100, help="URL 数量")
+    parser.add_argument("--domains", type=int, default=20, help="域名数量")
+    parser.add_argument("--workers", type=int, default=1, help="浏览器 worker 数")
+    parser.add_argument("--page-load", type=float, default=0.3, help="模拟页面加载耗时（秒）")
+    parser.add_argument("--script-latency", type=float, default=0.002, help="模拟脚本执行耗时（秒）")
+    parser.add_argument("--screenshot-latency", type=float, default=0.05, help="模拟截图耗时（秒）")
+    parser.add_argument("--page-settle", type=float, default=0.3, help="模拟页面加载后持续变化的时长（秒）")
+    parser.add_argument("--launch-latency", type=float, default=1.0, help="模拟浏览器启动耗时（秒）")
+    parser.add_argument("--visit-error-rate", type=float, default=0.0, help="模拟访问失败的概率")
+    parser.add_argument("--capture-latency", type=float, default=0.01, help="抓包控制接口耗时（秒）")
+    parser.add_argument("--classify-latency", type=float, default=0.02, help="识别接口耗时（秒）")
+    parser.add_argument("--blank-rate", type=float, default=0.1, help="识别为空白页的概率")
+    parser.add_argument("--no-batch", action="store_true", help="识别服务替身不支持批量请求")
+    parser.add_argument("--no-capture-batch", action="store_true", help="抓包服务替身不支持批量控制接口")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="覆盖配置项，例如 --set visit.post_wait=0")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument("--verbose", action="store_true", help="输出 INFO 级别日志")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    stub = StubServices(capture_latency=args.capture_latency, classify_latency=args.classify_latency,
+                        blank_rate=args.blank_rate, batch=not args.no_batch,
+                        capture_batch=not args.no_capture_batch).start()
+    driver_factory = fake_driver_factory(
+        page_load=args.page_load, script=args.script_latency, screenshot=args.screenshot_latency,
+        settle=args.page_settle, launch=args.launch_latency, error_rate=args.visit_error_rate,
+    )
+    try:
+        with tempfile.TemporaryDirectory() as screenshots_dir:
+            config = _build_config(args, stub, screenshots_dir)
+            urls = _urls(args.urls, args.domains)
+            if args.mode == "scheduler":
+                summary = run_tasks(urls, config=config, driver_factory=driver_factory) or {}
+            else:
+                summary = _run_process_loop(config, urls, driver_factory)
+    finally:
+        stub.stop()
+
+    wall = summary.get("wall_time") or 0.0
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": vars(args),
+        "urls_per_sec": summary.get("succeeded", 0) / wall if wall else 0.0,
+        "visits_per_sec": summary.get("visits", 0) / wall if wall else 0.0,
+        "retry_rate": summary.get("retry_rate", 0.0),
+        "summary": summary,
+        "stub_counters": stub.counters,
+    }
+
+    print(f"模式 {args.mode}, worker {args.workers}, URL {args.urls}: 耗时 {wall:.2f}s, "
+          f"{report['urls_per_sec']:.2f} URLs/s, 重试率 {report['retry_rate']:.1%}")
+    for stage, stage_summary in sorted(summary.get("stages", {}).items()):
+        print(f"  {stage:<18} p50 {stage_summary['p50'] * 1000:8.1f}ms  p95 {stage_summary['p95'] * 1000:8.1f}ms"
+              f"  p99 {stage_summary['p99'] * 1000:8.1f}ms  (n={stage_summary['count']})")
+    print(f"  服务调用: {stub.counters}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+浏览器启动基准：分别测量驱动解析（resolve）、配置目录准备（profile）、浏览器启动（launch）、
+首次导航（navigate）与退出（quit）的耗时，对比逐项设置首选项的旧方式（legacy）与配置模板快速路径（template）。
+
+需要本机安装 Firefox；geckodriver 未配置 driver.path 时由 webdriver-manager 解析。
+legacy 模式下 Firefox 新建配置目录的开销包含在 launch 中；driver.template_dir 下还没有对应模板时，
+template 模式第一次启动的 profile 包含生成（及 prewarm）模板的开销。
+
+用法:
+    python -m benchmarks.bench_startup --launches 5
+    python -m benchmarks.bench_startup --mode template --cold --set driver.prewarm=true --output startup.json
+"""
+import argparse
+import copy
+import json
+import logging
+import platform
+import statistics
+import time
+from typing import Any, Dict, List
+
+from benchmarks.bench_pipeline import _apply_overrides
+from config_manager import load_config
+from driver import FirefoxLauncher, clear_driver_path_cache
+
+_PHASES = ("resolve", "profile", "launch", "navigate", "quit", "total")
+
+
+def _run_mode(config: Dict[str, Any], mode: str, launches: int, url: str, cold: bool) -> Dict[str, Any]:
+    config = copy.deepcopy(config)
+    config.setdefault("driver", {})["profile_template"] = mode == "template"
+    if cold:
+        clear_driver_path_cache(config["driver"])
+    launcher = FirefoxLauncher(config)
+
+    samples: List[Dict[str, float]] = []
+    errors: List[str] = []
+    for _ in range(launches):
+        try:
+            driver = launcher.launch()
+        except Exception as e:
+            errors.append(str(e))
+            break
+        sample = dict(launcher.last_timings)
+        start = time.perf_counter()
+        driver.get(url)
+        sample["navigate"] = time.perf_counter() - start
+        start = time.perf_counter()
+        driver.quit()
+        sample["quit"] = time.perf_counter() - start
+        sample["total"] = sample["resolve"] + sample["profile"] + sample["launch"] + sample["navigate"]
+        samples.append(sample)
+
+    phases = {}
+    for phase in _PHASES:
+        values = [sample[phase] for sample in samples]
+        if values:
+            phases[phase] = {
+                "first": values[0],
+                "median": statistics.median(values),
+                "mean": statistics.fmean(values),
+                "max": max(values),
+            }
+    return {"mode": mode, "launches": len(samples), "phases": phases, "samples": samples, "errors": errors}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="浏览器启动耗时基准")
+    parser.add_argument("--mode", choices=("both", "legacy", "template"), default="both")
+    parser.add_argument("--launches", type=int, default=5, help="每种模式启动次数")
+    parser.add_argument("--url", default="about:blank", help="首次导航的地址")
+    parser.add_argument("--cold", action="store_true", help="每种模式开始前清除 geckodriver 路径缓存")
+    parser.add_argument("--config", default="config.yaml", help="基础配置文件")
+    parser.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                        help="覆盖配置项，例如 --set browser.headless=true")
+    parser.add_argument("--output", help="结果 JSON 文件路径")
+    parser.add_argument("--verbose", action="store_true", help="输出 INFO 级别日志")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    config = copy.deepcopy(load_config(args.config))
+    config.setdefault("browser", {}).setdefault("headless", True)
+    _apply_overrides(config, args.set)
+    modes = ("legacy", "template") if args.mode == "both" else (args.mode,)
+
+    results = []
+    for mode in modes:
+        result = _run_mode(config, mode, args.launches, args.url, args.cold)
+        results.append(result)
+        print(f"模式 {mode}: 成功启动 {result['launches']} 次")
+        for phase, summary in result["phases"].items():
+            print(f"  {phase:<9} 首次 {summary['first'] * 1000:8.1f}ms  中位数 {summary['median'] * 1000:8.1f}ms"
+                  f"  平均 {summary['mean'] * 1000:8.1f}ms  最长 {summary['max'] * 1000:8.1f}ms")
+        for error in result["errors"]:
+            print(f"  启动失败: {error}")
+
+    if args.output:
+        report = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "params": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+对比 get_tasks_mode_1/2 与惰性版本 iter_tasks_mode_1/2 的内存占用与首个任务耗时。
+
+用法:
+    python -m benchmarks.bench_task_generators --domains 20000 --urls 5 --count 10
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable
+
+from utils import get_tasks_mode_1, get_tasks_mode_2, iter_tasks_mode_1, iter_tasks_mode_2
+
+
+def _write_websites(path: str, domains: int, urls_per_domain: int) -> None:
+    """按照真实列表的样子交错写入各域名的 url"""
+    with open(path, "w") as f:
+        for url_idx in range(urls_per_domain):
+            for domain_idx in range(domains):
+                f.write(f"https://site{domain_idx}.example.com/page/{url_idx}\n")
+
+
+def _measure(factory: Callable[[], Iterable[str]]) -> Dict[str, float]:
+    # 计时与内存分两次测量，避免 tracemalloc 的开销影响耗时
+    start = time.perf_counter()
+    tasks = iter(factory())
+    next(tasks, None)
+    first_task = time.perf_counter() - start
+    total = 1 + sum(1 for _ in tasks)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for _ in factory():
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"first_task": first_task, "total": elapsed, "peak_mb": peak / 1024 / 1024, "tasks": total}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--domains", type=int, default=20000, help="域名数量")
+    parser.add_argument("--urls", type=int, default=5, help="每个域名的 url 数量")
+    parser.add_argument("--count", type=int, default=10, help="模式一每个域名的访问次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "websites.txt")
+        _write_websites(path, args.domains, args.urls)
+
+        cases = [
+            ("mode_1 list", lambda: get_tasks_mode_1(path, args.count)),
+            ("mode_1 iter", lambda: iter_tasks_mode_1(path, args.count)),
+            ("mode_2 list", lambda: get_tasks_mode_2(path)),
+            ("mode_2 iter", lambda: iter_tasks_mode_2(path)),
+        ]
+        print(f"{'case':<14}{'tasks':>10}{'first task':>14}{'total':>10}{'peak MB':>10}")
+        for name, factory in cases:
+            result = _measure(factory)
+            print(f"{name:<14}{result['tasks']:>10}{result['first_task'] * 1000:>12.1f}ms"
+                  f"{result['total']:>9.2f}s{result['peak_mb']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
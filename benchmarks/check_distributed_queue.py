@@ -0,0 +1,166 @@
+"""
+用多个本地进程检查共享任务队列：同一任务不会被两个节点同时租用、租约过期计为一次重试、
+达到最大重试次数后放弃，并分别检查 SQLite 后端与 TCP 协调进程。输出租用吞吐量，检查失败时退出码为 1。
+
+用法:
+    python -m benchmarks.check_distributed_queue --tasks 500 --processes 4
+    python -m benchmarks.check_distributed_queue --backend tcp
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+from distributed_queue import (ABANDONED, DONE, CoordinatorServer, QueueBackend, RemoteQueueBackend,
+                               SQLiteQueueBackend)
+
+
+def _open(spec: Tuple[str, str]) -> QueueBackend:
+    kind, target = spec
+    return SQLiteQueueBackend(target) if kind == "sqlite" else RemoteQueueBackend(target)
+
+
+def _drain(spec: Tuple[str, str], node: str, batch: int, results: "multiprocessing.Queue") -> None:
+    """一个节点：不断租用并完成任务，直到没有可租用的任务，返回租用到的任务 id"""
+    backend = _open(spec)
+    leased: List[int] = []
+    try:
+        while True:
+            tasks = backend.lease(node, batch, 60.0, 2)
+            if not tasks:
+                if backend.status()["queued"] == 0:
+                    break
+                continue
+            for task in tasks:
+                leased.append(task["id"])
+                backend.complete(node, task["id"], "classified")
+    finally:
+        backend.close()
+    results.put((node, leased))
+
+
+def check_unique_leases(spec: Tuple[str, str], tasks: int, processes: int, batch: int) -> List[str]:
+    """多个进程同时租用：每个任务恰好被租用一次，全部完成"""
+    backend = _open(spec)
+    backend.seed(f"https://site{i}.bench.test/" for i in range(tasks))
+    results: "multiprocessing.Queue" = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_drain, args=(spec, f"node{i}", batch, results))
+               for i in range(processes)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    leased: Dict[str, List[int]] = dict(results.get(timeout=120) for _ in workers)
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    errors = []
+    all_ids = [task_id for ids in leased.values() for task_id in ids]
+    if len(all_ids) != len(set(all_ids)):
+        errors.append(f"有 {len(all_ids) - len(set(all_ids))} 个任务被重复租用")
+    if len(set(all_ids)) != tasks:
+        errors.append(f"租用了 {len(set(all_ids))} 个任务，应为 {tasks}")
+    status = backend.status()
+    if status[DONE] != tasks:
+        errors.append(f"完成 {status[DONE]} 个任务，应为 {tasks}")
+    backend.close()
+    print(f"  {processes} 个进程租用 {len(all_ids)} 次（唯一任务 {len(set(all_ids))} 个），"
+          f"耗时 {elapsed:.2f}s, {len(all_ids) / elapsed:.0f} 次/秒, "
+          f"各节点: {', '.join(f'{node} {len(ids)}' for node, ids in sorted(leased.items()))}")
+    return errors
+
+
+def check_lease_expiry(spec: Tuple[str, str], max_retries: int = 2) -> List[str]:
+    """租约过期后重新分配时 attempts 加一，达到 max_retries 后标记为 abandoned"""
+    backend = _open(spec)
+    backend.seed(["https://crash.bench.test/"])
+    errors = []
+    for expected in range(max_retries + 1):
+        tasks = backend.lease(f"crash{expected}", 1, 0.05, max_retries)
+        if len(tasks) != 1 or tasks[0]["attempts"] != expected:
+            errors.append(f"第 {expected + 1} 次租用结果 {tasks}，attempts 应为 {expected}")
+            break
+        time.sleep(0.1)  # 节点崩溃，不续租
+    tasks = backend.lease("crash-last", 1, 0.05, max_retries)
+    status = backend.status()
+    if tasks:
+        errors.append(f"达到最大重试次数后仍被租用: {tasks}")
+    if status[DONE] != 1 or status["outcomes"].get(ABANDONED) != 1:
+        errors.append(f"达到最大重试次数后应标记为 {ABANDONED}: {status}")
+    backend.close()
+    print(f"  租约过期 {max_retries + 1} 次后放弃: {status['outcomes']}")
+    return errors
+
+
+def check_round_trip(spec: Tuple[str, str]) -> List[str]:
+    """续租、重试与结束的往返调用"""
+    backend = _open(spec)
+    backend.seed(["https://a.bench.test/", "https://b.bench.test/"])
+    errors = []
+    first, second = backend.lease("a", 2, 60.0, 2)
+    if backend.heartbeat("a", [first["id"], second["id"]], 60.0):
+        errors.append("节点持有的任务续租失败")
+    if backend.heartbeat("b", [first["id"]], 60.0) != [first["id"]]:
+        errors.append("其他节点的任务不应续租成功")
+    if not backend.retry("a", first["id"], 1, priority=True):
+        errors.append("放回队列失败")
+    if not backend.complete("a", second["id"], "classified"):
+        errors.append("结束任务失败")
+    if backend.complete("b", second["id"], "classified"):
+        errors.append("已结束的任务不应再次结束")
+    again = backend.lease("b", 1, 60.0, 2)
+    if [task["id"] for task in again] != [first["id"]] or again[0]["attempts"] != 1:
+        errors.append(f"重试的任务应重新租出且 attempts 为 1: {again}")
+    backend.close()
+    return errors
+
+
+def _run(backend_kind: str, check: Callable[[Tuple[str, str]], List[str]]) -> List[str]:
+    """在新的 SQLite 文件（tcp 时由本进程中的协调进程托管）上执行一项检查"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "queue.db")
+        if backend_kind == "sqlite":
+            return check(("sqlite", path))
+        store = SQLiteQueueBackend(path)
+        server = CoordinatorServer(("127.0.0.1", 0), store)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            return check(("tcp", f"127.0.0.1:{server.server_address[1]}"))
+        finally:
+            server.shutdown()
+            server.server_close()
+            store.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=("sqlite", "tcp", "all"), default="all")
+    parser.add_argument("--tasks", type=int, default=500, help="多进程检查的任务数")
+    parser.add_argument("--processes", type=int, default=4, help="节点进程数")
+    parser.add_argument("--batch", type=int, default=4, help="每次租用的任务数")
+    args = parser.parse_args()
+
+    checks: List[Tuple[str, Callable[[Tuple[str, str]], List[str]]]] = [
+        ("多进程租用", lambda spec: check_unique_leases(spec, args.tasks, args.processes, args.batch)),
+        ("租约过期", check_lease_expiry),
+        ("往返调用", check_round_trip),
+    ]
+    failed = False
+    for backend_kind in (("sqlite", "tcp") if args.backend == "all" else (args.backend,)):
+        for name, check in checks:
+            print(f"[{backend_kind}] {name}")
+            errors = _run(backend_kind, check)
+            for error in errors:
+                print(f"  失败: {error}")
+            failed = failed or bool(errors)
+    print("检查失败" if failed else "全部通过")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+基准测试用的模拟 WebDriver：按配置的延迟模拟页面加载、脚本执行与截图，不需要真实的 Firefox。
+"""
+import random
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Optional
+
+from selenium.common.exceptions import WebDriverException
+
+
+def make_png(width: int = 320, height: int = 200, blank: bool = False, seed: int = 0) -> bytes:
+    """生成一张 PNG：blank 为纯白图，否则为随机色块，供预筛与感知哈希使用"""
+    rng = random.Random(seed)
+    pixels = [bytearray(b"\xff" * (width * 3)) for _ in range(height)]
+    if not blank:
+        for _ in range(40):
+            x, y = rng.randrange(width), rng.randrange(height)
+            w, h = rng.randint(8, width // 3), rng.randint(4, height // 4)
+            color = bytes(rng.randrange(256) for _ in range(3))
+            for row in pixels[y:y + h]:
+                end = min(width, x + w)
+                row[x * 3:end * 3] = color * (end - x)
+
+    raw = b"".join(b"\x00" + bytes(row) for row in pixels)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(raw, 6)) + chunk(b"IEND", b"")
+
+
+class _FakeSwitchTo:
+    def window(self, handle: str) -> None:
+        pass
+
+
+class FakeWebDriver:
+    """
+    模拟 WebDriver，只实现访问流程与浏览器池用到的接口。
+
+    Args:
+        page_load: driver.get 的耗时（秒）
+        script: 每次 execute_script 的耗时（秒）
+        screenshot: 每次截图的耗时（秒）
+        settle: 页面加载后持续变化的时长（秒），自适应等待据此判断稳定
+        launch: 创建驱动（启动浏览器）的耗时（秒）
+        error_rate: 访问抛出 WebDriverException 的概率
+    """
+
+    CONTEXT_CHROME = None
+
+    def __init__(self, page_load: float = 0.5, script: float = 0.002, screenshot: float = 0.05,
+                 settle: float = 0.3, launch: float = 0.0, error_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.page_load = page_load
+        self.script = script
+        self.screenshot = screenshot
+        self.settle = settle
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._loaded_at = time.perf_counter()
+        self._png = make_png(seed=self._rng.randrange(1 << 30))
+        self.window_handles = ["main"]
+        self.switch_to = _FakeSwitchTo()
+        self.current_url = "about:blank"
+        if launch > 0:
+            time.sleep(launch)
+
+    def set_page_load_timeout(self, timeout: float) -> None:
+        pass
+
+    def get(self, url: str) -> None:
+        if url != "about:blank":
+            time.sleep(self.page_load)
+            if self._rng.random() < self.error_rate:
+                raise WebDriverException(f"模拟访问失败: {url}")
+        self.current_url = url
+        self._loaded_at = time.perf_counter()
+
+    def execute_script(self, script: str, *args: Any) -> Any:
+        if self.script > 0:
+            time.sleep(self.script)
+        if "pendingImages" in script:
+            quiet = time.perf_counter() - self._loaded_at - self.settle
+            return {
+                "readyState": "complete",
+                "installed": True,
+                "resources": 10,
+                "quietMs": max(0.0, quiet) * 1000,
+                "pendingImages": 0,
+            }
+        if "readyState" in script:
+            return "complete"
+        return None
+
+    def delete_all_cookies(self) -> None:
+        pass
+
+    def get_screenshot_as_png(self) -> bytes:
+        if self.screenshot > 0:
+            time.sleep(self.screenshot)
+        return self._png
+
+    def save_screenshot(self, path: str) -> bool:
+        png = self.get_screenshot_as_png()
+        with open(path, "wb") as f:
+            f.write(png)
+        return True
+
+    def close(self) -> None:
+        pass
+
+    def quit(self) -> None:
+        pass
+
+
+def fake_driver_factory(**kwargs: Any) -> Callable[..., FakeWebDriver]:
+    """返回供 BrowserPool 使用的模拟驱动创建函数，每个驱动使用不同的随机种子（忽略代理端口）"""
+    counter = [0]
+    lock = threading.Lock()
+
+    def factory(proxy_port: Optional[int] = None) -> FakeWebDriver:
+        with lock:
+            counter[0] += 1
+            seed = counter[0]
+        return FakeWebDriver(seed=seed, **kwargs)
+
+    return factory
@@ -0,0 +1,199 @@
+"""
+抓包服务与 resnet18 识别服务的本地替身，用于离线基准测试。
+
+抓包服务: POST api/start_task, api/stop_task, api/delete_files，以及批量接口 api/batch
+    （请求 {"items": [{"domain", "idx", "op": "start" | "stop" | "delete", ...}]}，
+    响应 {"results": [{"domain", "idx", "op", "ok"}, ...]}，与请求逐项对应）
+识别服务: POST predict（单张 JSON / multipart / 二进制，或批量 {"image_paths": [...]})
+
+单独运行:
+    python -m benchmarks.stub_services --port 5000 --blank-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class StubServices:
+    """
+    在一个本地 HTTP 服务中同时模拟抓包服务与识别服务。
+
+    Args:
+        capture_latency: 抓包控制接口的响应耗时（秒）
+        classify_latency: 识别接口每个请求的固定耗时（秒）
+        classify_per_image: 批量识别时每张图片额外的耗时（秒）
+        blank_rate: 识别结果为空白页的概率
+        blank_label: 空白页标签
+        batch: 是否支持批量识别，不支持时批量请求返回 404
+        capture_batch: 是否支持批量抓包控制接口 api/batch，不支持时返回 404
+    """
+
+    def __init__(self, capture_latency: float = 0.01, classify_latency: float = 0.02,
+                 classify_per_image: float = 0.002, blank_rate: float = 0.1, blank_label: int = 0,
+                 batch: bool = True, capture_batch: bool = True, host: str = "127.0.0.1", port: int = 0,
+                 seed: Optional[int] = None):
+        self.capture_latency = capture_latency
+        self.classify_latency = classify_latency
+        self.classify_per_image = classify_per_image
+        self.blank_rate = blank_rate
+        self.blank_label = blank_label
+        self.batch = batch
+        self.capture_batch = capture_batch
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def predict_url(self) -> str:
+        return self.base_url + "predict"
+
+    def start(self) -> "StubServices":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-services", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def predict(self) -> int:
+        with self._lock:
+            blank = self._rng.random() < self.blank_rate
+        return self.blank_label if blank else self.blank_label + 1
+
+    def handle(self, path: str, content_type: str, body: bytes):
+        """返回 (状态码, 响应对象)；响应对象为 None 时返回空响应体"""
+        path = path.rstrip("/")
+        if path in ("/api/start_task", "/api/stop_task", "/api/delete_files"):
+            self.count(path.rsplit("/", 1)[-1])
+            time.sleep(self.capture_latency)
+            return 200, {"status": "ok"}
+
+        if path == "/api/batch":
+            return self._capture_batch(body)
+
+        if path == "/predict":
+            image_count = self._batch_size(content_type, body)
+            if image_count is None:
+                self.count("predict")
+                time.sleep(self.classify_latency + self.classify_per_image)
+                return 200, {"prediction": self.predict()}
+            if not self.batch:
+                self.count("predict_batch_rejected")
+                return 404, None
+            self.count("predict_batch")
+            self.count("predict_batch_images", image_count)
+            time.sleep(self.classify_latency + self.classify_per_image * image_count)
+            return 200, {"predictions": [self.predict() for _ in range(image_count)]}
+
+        return 404, None
+
+    def _capture_batch(self, body: bytes):
+        """批量抓包控制参考实现：逐项校验并执行，返回与请求顺序一致的结果列表"""
+        if not self.capture_batch:
+            self.count("capture_batch_rejected")
+            return 404, None
+        try:
+            items = json.loads(body or b"{}").get("items")
+        except (ValueError, AttributeError):
+            return 400, {"error": "invalid json"}
+        if not isinstance(items, list):
+            return 400, {"error": "items must be a list"}
+
+        self.count("capture_batch")
+        self.count("capture_batch_items", len(items))
+        time.sleep(self.capture_latency)
+        results = []
+        for item in items:
+            op = item.get("op") if isinstance(item, dict) else None
+            endpoint = self._CAPTURE_OPS.get(op)
+            ok = endpoint is not None and bool(item.get("domain")) and item.get("idx") not in (None, "")
+            if ok:
+                self.count(endpoint)
+            results.append({"domain": item.get("domain") if isinstance(item, dict) else None,
+                            "idx": item.get("idx") if isinstance(item, dict) else None,
+                            "op": op, "ok": ok})
+        return 200, {"results": results}
+
+    # 批量操作名与单独接口计数名的对应关系
+    _CAPTURE_OPS = {"start": "start_task", "stop": "stop_task", "delete": "delete_files"}
+
+    @staticmethod
+    def _batch_size(content_type: str, body: bytes) -> Optional[int]:
+        """批量请求返回图片数量，单张请求返回 None"""
+        if content_type.startswith("application/json"):
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                return None
+            paths = payload.get("image_paths") if isinstance(payload, dict) else None
+            return len(paths) if isinstance(paths, list) else None
+        if content_type.startswith("multipart/form-data"):
+            images = body.count(b'name="images"')
+            return images or None
+        return None
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length", 0) or 0)
+                body = self.rfile.read(length) if length else b""
+                status, payload = stub.handle(self.path, self.headers.get("Content-Type", ""), body)
+                data = json.dumps(payload).encode("utf-8") if payload is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--capture-latency", type=float, default=0.01)
+    parser.add_argument("--classify-latency", type=float, default=0.02)
+    parser.add_argument("--blank-rate", type=float, default=0.1)
+    parser.add_argument("--no-batch", action="store_true", help="不支持批量识别")
+    parser.add_argument("--no-capture-batch", action="store_true", help="不支持批量抓包控制")
+    args = parser.parse_args()
+
+    stub = StubServices(capture_latency=args.capture_latency, classify_latency=args.classify_latency,
+                        blank_rate=args.blank_rate, batch=not args.no_batch,
+                        capture_batch=not args.no_capture_batch, host=args.host, port=args.port)
+    print(f"抓包服务: {stub.base_url}  识别服务: {stub.predict_url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.common.exceptions import WebDriverException
+
+from driver import get_firefox_driver
+
+logger = logging.getLogger(__name__)
+
+
+class BrowserSession:
+    """浏览器池中的单个会话，记录驱动实例、使用次数与最近一次资源采样"""
+
+    def __init__(self, session_id: int, driver: WebDriver, launch_time: float, proxy_port: Optional[int] = None):
+        self.session_id = session_id
+        self.driver = driver
+        self.launch_time = launch_time
+        self.proxy_port = proxy_port  # 浏览器使用的 SOCKS 代理端口，None 为 proxy.port
+        self.visits = 0
+        self.rss_mb: Optional[float] = None
+        self.cpu_percent: Optional[float] = None
+        # 使用中被要求回收时记录原因，归还时回收
+        self.retire_reason: Optional[str] = None
+        self.retire_kind = ""
+
+
+class BrowserPool:
+    """
+    常驻浏览器池：保持 N 个已启动的 Firefox 会话，访问之间重置状态而不是退出浏览器。
+
+    会话在达到 max_visits 次访问后、被资源监控要求回收（内存超限）、或重置过程中出现任何错误时
+    被回收并重新启动。resize 调整会话数上限，缩小时多余的会话在空闲或归还时退出。
+
+    每个 worker 使用独立代理入口时，acquire 指定 SOCKS 代理端口，只借出使用该端口的会话；
+    没有匹配的空闲会话且池已满时退出一个使用其他端口的空闲会话，再按该端口启动新浏览器。
+    """
+
+    def __init__(self, size: int = 1, max_visits: int = 50,
+                 driver_factory: Optional[Callable[..., WebDriver]] = None):
+        self.size = max(1, int(size))
+        self.max_visits = max(1, int(max_visits))
+        self._driver_factory = driver_factory or get_firefox_driver
+        self._cond = threading.Condition()
+        self._idle: List[BrowserSession] = []
+        self._sessions: Dict[int, BrowserSession] = {}  # 已启动的会话（空闲与借出）
+        self._live = 0  # 已启动或正在启动的会话数
+        self._next_id = 0
+        self._closed = False
+
+        self._launch_times: List[float] = []
+        self._reset_times: List[float] = []
+        self._recycled = 0
+        self._recycled_by: Dict[str, int] = {}
+        self._shrunk = 0
+        # 回收回调 (原因类别)，类别为 visits / rss / discard / reset_failed / proxy_port
+        self.on_recycle: Optional[Callable[[str], None]] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any],
+                    driver_factory: Optional[Callable[..., WebDriver]] = None) -> "BrowserPool":
+        """根据配置中的 browser_pool 段创建浏览器池"""
+        pool_cfg = config.get("browser_pool", {}) or {}
+        if driver_factory is None:
+            # 使用本次运行的配置启动浏览器，首选项与驱动路径只解析一次
+            driver_factory = lambda proxy_port=None: get_firefox_driver(config, proxy_port)
+        return cls(
+            size=int(pool_cfg.get("size", 1)),
+            max_visits=int(pool_cfg.get("max_visits", 50)),
+            driver_factory=driver_factory,
+        )
+
+    def warm_up(self, proxy_ports: Optional[Sequence[Optional[int]]] = None) -> None:
+        """
+        预先启动全部会话，避免首次访问时等待浏览器启动。
+        proxy_ports 为每个 worker 的 SOCKS 代理端口时，第 i 个会话使用 proxy_ports[i]
+        """
+        sessions = []
+        try:
+            for i in range(self.size):
+                sessions.append(self.acquire(proxy_ports[i % len(proxy_ports)] if proxy_ports else None))
+        finally:
+            for session in sessions:
+                self._put_idle(session)
+
+    def acquire(self, proxy_port: Optional[int] = None) -> BrowserSession:
+        """
+        借出一个可用会话。没有空闲会话且未达到上限时启动新浏览器，否则阻塞等待归还。
+
+        Args:
+            proxy_port: 浏览器需要使用的 SOCKS 代理端口，None 表示 proxy.port
+        """
+        stale: Optional[BrowserSession] = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("浏览器池已关闭")
+                session = self._take_idle(proxy_port)
+                if session is not None:
+                    return session
+                if self._live >= self.size and self._idle:
+                    # 空闲会话都使用其他代理端口：退出最久未用的一个，为本次借出启动新浏览器
+                    stale = self._idle.pop(0)
+                    self._detach(stale)
+                    self._recycled += 1
+                    self._recycled_by["proxy_port"] = self._recycled_by.get("proxy_port", 0) + 1
+                if self._live < self.size:
+                    self._live += 1
+                    session_id = self._next_id
+                    self._next_id += 1
+                    break
+                self._cond.wait()
+
+        if stale is not None:
+            logger.info(f"回收浏览器会话 #{stale.session_id} (代理端口 {stale.proxy_port} 与需要的 {proxy_port} 不同)")
+            self._quit(stale)
+            if self.on_recycle is not None:
+                self.on_recycle("proxy_port")
+        try:
+            return self._launch(session_id, proxy_port)
+        except Exception:
+            with self._cond:
+                self._live -= 1
+                self._cond.notify()
+            raise
+
+    def release(self, session: BrowserSession, discard: bool = False) -> None:
+        """
+        归还会话。达到访问上限、调用方要求丢弃或重置失败时回收该会话。
+
+        Args:
+            session: 借出的会话
+            discard: 为 True 时直接回收，不再复用
+        """
+        session.visits += 1
+        if discard:
+            self._recycle(session, "调用方要求丢弃", "discard")
+            return
+        if session.retire_reason is not None:
+            self._recycle(session, session.retire_reason, session.retire_kind)
+            return
+        if session.visits >= self.max_visits:
+            self._recycle(session, f"已访问 {session.visits} 次", "visits")
+            return
+        if self._shrink(session):
+            return
+
+        try:
+            self._reset(session)
+        except Exception as e:
+            # geckodriver 退出时 Selenium 抛出的是 urllib3/ConnectionError 而不是 WebDriverException，
+            # 任何重置失败都必须回收会话，否则会话计数泄漏，池满后 acquire 永久阻塞
+            self._recycle(session, f"重置失败: {e}", "reset_failed")
+            return
+
+        self._put_idle(session)
+
+    def reuse(self, session: BrowserSession) -> bool:
+        """
+        结束一次访问但继续借用会话（同一 worker 紧接着访问下一个 URL）：计入访问次数并重置状态。
+        会话需要回收（达到访问上限、被要求回收、池已缩小或已关闭）时改为 release，重置失败时回收，
+        这两种情况返回 False，调用方此后不再持有该会话。
+        """
+        with self._cond:
+            keep = (not self._closed and session.retire_reason is None
+                    and session.visits + 1 < self.max_visits and self._live <= self.size)
+        if not keep:
+            self.release(session)
+            return False
+        session.visits += 1
+        try:
+            self._reset(session)
+        except Exception as e:
+            self._recycle(session, f"重置失败: {e}", "reset_failed")
+            return False
+        return True
+
+    @contextmanager
+    def session(self) -> Iterator[BrowserSession]:
+        """以上下文管理器的方式借出并归还会话"""
+        browser = self.acquire()
+        try:
+            yield browser
+        finally:
+            self.release(browser)
+
+    def sessions(self) -> List[BrowserSession]:
+        """返回当前已启动的全部会话（包括借出中的），供资源监控采样"""
+        with self._cond:
+            return list(self._sessions.values())
+
+    def retire(self, session: BrowserSession, reason: str, kind: str = "rss") -> bool:
+        """
+        要求回收会话：空闲会话立即回收，借出中的会话在归还时回收。
+
+        Returns:
+            本次调用是否新安排了回收（会话已退出或已在等待回收时返回 False）
+        """
+        with self._cond:
+            if session.session_id not in self._sessions or session.retire_reason is not None:
+                return False
+            session.retire_reason, session.retire_kind = reason, kind
+            if session not in self._idle:
+                return True
+            self._idle.remove(session)
+        self._recycle(session, reason, kind)
+        return True
+
+    def resize(self, size: int) -> None:
+        """调整会话数上限；缩小时立即退出多余的空闲会话（优先退出访问次数多的），借出中的在归还时退出"""
+        with self._cond:
+            self.size = max(1, int(size))
+            self._idle.sort(key=lambda s: s.visits)
+            excess = []
+            while self._live > self.size and self._idle:
+                session = self._idle.pop()
+                self._detach(session)
+                self._shrunk += 1
+                excess.append(session)
+            self._cond.notify_all()
+        for session in excess:
+            logger.info(f"浏览器池缩小到 {self.size} 个会话，退出空闲会话 #{session.session_id}")
+            self._quit(session)
+
+    def close(self) -> None:
+        """关闭浏览器池并退出所有空闲会话"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            for session in idle:
+                self._detach(session)
+            self._cond.notify_all()
+        for session in idle:
+            self._quit(session)
+        logger.info(f"浏览器池已关闭: {self.format_stats()}")
+
+    def stats(self) -> Dict[str, Any]:
+        """返回启动与重置耗时的统计信息"""
+        with self._cond:
+            launches = list(self._launch_times)
+            resets = list(self._reset_times)
+            recycled = self._recycled
+            recycled_by = dict(self._recycled_by)
+            shrunk = self._shrunk
+        return {
+            "launches": len(launches),
+            "launch_avg": sum(launches) / len(launches) if launches else 0.0,
+            "launch_max": max(launches) if launches else 0.0,
+            "resets": len(resets),
+            "reset_avg": sum(resets) / len(resets) if resets else 0.0,
+            "reset_max": max(resets) if resets else 0.0,
+            "recycled": recycled,
+            "recycled_by": recycled_by,
+            "shrunk": shrunk,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"启动 {stats['launches']} 次 (平均 {stats['launch_avg']:.2f}s, 最长 {stats['launch_max']:.2f}s), "
+            f"重置 {stats['resets']} 次 (平均 {stats['reset_avg']:.3f}s, 最长 {stats['reset_max']:.3f}s), "
+            f"回收 {stats['recycled']} 次, 缩容退出 {stats['shrunk']} 次"
+        )
+
+    def _take_idle(self, proxy_port: Optional[int]) -> Optional[BrowserSession]:
+        """取出最近归还的、使用指定代理端口的空闲会话（调用方持有 _cond）"""
+        for i in range(len(self._idle) - 1, -1, -1):
+            if self._idle[i].proxy_port == proxy_port:
+                return self._idle.pop(i)
+        return None
+
+    def _launch(self, session_id: int, proxy_port: Optional[int] = None) -> BrowserSession:
+        start = time.perf_counter()
+        # 未指定端口时按无参数调用，兼容只接受无参数的驱动创建函数
+        driver = self._driver_factory() if proxy_port is None else self._driver_factory(proxy_port=proxy_port)
+        elapsed = time.perf_counter() - start
+        session = BrowserSession(session_id, driver, elapsed, proxy_port)
+        with self._cond:
+            self._launch_times.append(elapsed)
+            self._sessions[session_id] = session
+        logger.info(f"浏览器会话 #{session_id} 启动完成，耗时 {elapsed:.2f}s")
+        return session
+
+    def _reset(self, session: BrowserSession) -> None:
+        """清理 Cookie、存储与多余标签页，并回到 about:blank"""
+        start = time.perf_counter()
+        driver = session.driver
+
+        handles = driver.window_handles
+        for handle in handles[1:]:
+            driver.switch_to.window(handle)
+            driver.close()
+        driver.switch_to.window(handles[0])
+
+        # 存储只能在所属源下清理，因此需要在离开页面之前执行
+        driver.execute_script(
+            "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+        )
+        driver.delete_all_cookies()
+        _clear_all_cookies(driver)
+        driver.get("about:blank")
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._reset_times.append(elapsed)
+        logger.debug(f"浏览器会话 #{session.session_id} 重置完成，耗时 {elapsed:.3f}s")
+
+    def _recycle(self, session: BrowserSession, reason: str, kind: str) -> None:
+        logger.info(f"回收浏览器会话 #{session.session_id} ({reason})")
+        # 先退出再减少计数，避免旧浏览器退出前就启动新的浏览器
+        self._quit(session)
+        with self._cond:
+            self._detach(session)
+            self._recycled += 1
+            self._recycled_by[kind] = self._recycled_by.get(kind, 0) + 1
+        if self.on_recycle is not None:
+            self.on_recycle(kind)
+
+    def _shrink(self, session: BrowserSession) -> bool:
+        """会话数超过上限时退出归还的会话"""
+        with self._cond:
+            if self._live <= self.size:
+                return False
+            self._detach(session)
+            self._shrunk += 1
+        logger.info(f"浏览器池缩小到 {self.size} 个会话，退出会话 #{session.session_id}")
+        self._quit(session)
+        return True
+
+    def _detach(self, session: BrowserSession) -> None:
+        """从池中移除会话（调用方持有 _cond）"""
+        self._sessions.pop(session.session_id, None)
+        self._live -= 1
+        self._cond.notify()
+
+    def _put_idle(self, session: BrowserSession) -> None:
+        with self._cond:
+            if self._closed:
+                self._detach(session)
+            else:
+                self._idle.append(session)
+                self._cond.notify()
+                return
+        self._quit(session)
+
+    @staticmethod
+    def _quit(session: BrowserSession) -> None:
+        try:
+            session.driver.quit()
+        except Exception as e:
+            logger.warning(f"退出浏览器会话 #{session.session_id} 失败: {e}")
+
+
+def _clear_all_cookies(driver: WebDriver) -> None:
+    """
+    尝试在 Firefox 特权上下文中清空所有域的 Cookie。
+
+    delete_all_cookies 只作用于当前页面所属的域，跨站点残留的 Cookie 需要通过特权上下文清理；
+    当前环境不支持时静默跳过。
+    """
+    context = getattr(driver, "context", None)
+    chrome_context = getattr(driver, "CONTEXT_CHROME", None)
+    if context is None or chrome_context is None:
+        return
+    try:
+        with context(chrome_context):
+            driver.execute_script("Services.cookies.removeAll();")
+    except WebDriverException as e:
+        logger.debug(f"特权上下文清理 Cookie 失败，跳过: {e}")
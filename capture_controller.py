@@ -0,0 +1,180 @@
+import logging
+import threading
+import time
+from functools import partial
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Optional, Set
+
+from circuit_breaker import backoff_delay
+from metrics import STAGE_SECONDS
+from pcap_service import (delete_capture_files, get_batch_capture_client, get_capture_breaker, start_capture_task,
+                          stop_capture_task)
+
+logger = logging.getLogger(__name__)
+
+
+class CaptureController:
+    """
+    流水线化的抓包控制：start/stop/delete 请求在后台线程中发送，访问流程只在需要时等待结果。
+
+    - start: 可以指定 after（上一次抓包的 stop Future），确认上一次抓包停止后才启动，避免流量混在一起；
+      start 在访问流程的关键路径上，使用独立的线程池，不会排在 stop/delete 之后
+    - stop / delete: 异步发送，失败时按带抖动的指数退避重试，抓包服务熔断期间等到可以探测时再重试；
+      重试由定时器重新提交，等待期间不占用线程；delete 排在同一抓包的 stop 之后
+
+    Args:
+        pcap_config: pcapng 配置段
+        workers: 发送控制请求的线程数（start 与 stop/delete 各自的线程池）
+        retries: stop/delete 失败后的重试次数
+        backoff: 首次重试前的等待时间（秒），之后每次翻倍（带随机抖动）
+    """
+
+    _MAX_BACKOFF = 30.0
+
+    def __init__(self, pcap_config: dict, workers: int = 2, retries: int = 2, backoff: float = 0.5):
+        self.pcap_config = pcap_config
+        self.retries = max(0, int(retries))
+        self.backoff = max(0.0, float(backoff))
+        workers = max(1, int(workers))
+        self._start_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture-start")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture-control")
+        self._lock = threading.Lock()
+        self._pending: Set[Future] = set()
+        self._counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_config(cls, pcap_config: dict) -> "CaptureController":
+        workers = int(pcap_config.get("control_workers", 2))
+        batch_client = get_batch_capture_client(pcap_config)
+        if batch_client is not None:
+            workers = max(workers, batch_client.min_concurrency(batch_client.batch_size))
+        return cls(
+            pcap_config,
+            workers=workers,
+            retries=int(pcap_config.get("control_retries", 2)),
+            backoff=float(pcap_config.get("control_retry_backoff", 0.5)),
+        )
+
+    def start(self, domain: str, idx: str, after: Optional[Future] = None,
+              ports: Optional[Dict[str, int]] = None) -> Future:
+        """
+        提交 start_task，结果为是否启动成功；不重试，失败由调度器按 capture_start_failed 重试任务。
+        ports 为该 worker 独立的过滤端口（pcapng.worker_ports 中的一项），缺省时使用 pcapng.port
+        """
+        func = start_capture_task if ports is None else partial(start_capture_task, ports=ports)
+        return self._submit("start", func, domain, idx, after, retry=False)
+
+    def stop(self, domain: str, idx: str, after: Optional[Future] = None) -> Future:
+        """异步提交 stop_task，失败时重试；after 为同一抓包的 start Future"""
+        return self._submit("stop", stop_capture_task, domain, idx, after, retry=True)
+
+    def delete(self, domain: str, idx: str, after: Optional[Future] = None) -> Future:
+        """异步提交 delete_files，after 为同一抓包的 stop Future"""
+        return self._submit("delete", delete_capture_files, domain, idx, after, retry=True)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的控制请求全部完成，超时返回 False"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                pending = set(self._pending)
+            if not pending:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            wait(pending, timeout=remaining)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return ", ".join(f"{key} {value}" for key, value in sorted(stats.items()))
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._counts[key] = self._counts.get(key, 0) + 1
+
+    def _submit(self, op: str, func: Callable[[dict, str, str], bool], domain: str, idx: str,
+                after: Optional[Future], retry: bool) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+        executor = self._start_executor if op == "start" else self._executor
+        attempts = self.retries + 1 if retry else 1
+        started = time.perf_counter()
+
+        def run(attempt: int) -> None:
+            try:
+                if attempt:
+                    self._count(f"{op}_retry")
+                ok = func(self.pcap_config, domain, idx)
+            except Exception as e:
+                future.set_exception(e)
+                return
+            if not ok and attempt + 1 < attempts:
+                self._later(backoff_delay(attempt + 1, self.backoff, self._MAX_BACKOFF),
+                            lambda: schedule(attempt + 1))
+                return
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage=f"capture_{op}")
+            self._count(op if ok else f"{op}_failed")
+            if not ok and retry:
+                logger.error(f"抓包控制请求 {op} 重试 {attempts} 次后仍失败: {domain} #{idx}")
+            future.set_result(ok)
+
+        def schedule(attempt: int = 0, waited: float = 0.0) -> None:
+            if attempt:
+                # 熔断期间等到可以探测时再重试，最多等待一个最长熔断时长
+                breaker = get_capture_breaker(self.pcap_config)
+                wait_for = breaker.retry_after() if breaker is not None else 0.0
+                if wait_for > 0 and waited < breaker.max_reset_timeout:
+                    wait_for = min(wait_for, breaker.max_reset_timeout - waited)
+                    self._later(wait_for, lambda: schedule(attempt, waited + wait_for))
+                    return
+            try:
+                executor.submit(run, attempt)
+            except RuntimeError as e:
+                # 线程池已关闭
+                future.set_exception(e)
+
+        if after is None:
+            schedule()
+        else:
+            after.add_done_callback(lambda _: schedule())
+        return future
+
+    @staticmethod
+    def _later(delay: float, func: Callable[[], None]) -> None:
+        """delay 秒后在定时器线程中调用 func（只负责重新提交，不占用线程池）"""
+        timer = threading.Timer(delay, func)
+        timer.daemon = True
+        timer.start()
+
+    def _discard(self, future: Future) -> None:
+        with self._lock:
+            self._pending.discard(future)
+
+
+_controller: Optional[CaptureController] = None
+_controller_lock = threading.Lock()
+
+
+def get_capture_controller(pcap_config: dict) -> Optional[CaptureController]:
+    """配置了抓包服务地址时返回进程内共享的抓包控制器，否则返回 None"""
+    global _controller
+    if not pcap_config.get("service"):
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = CaptureController.from_config(pcap_config)
+        return _controller
+
+
+def flush_capture_controller(timeout: Optional[float] = None) -> bool:
+    """等待共享控制器中的 stop/delete 请求全部完成；未启用时直接返回 True"""
+    with _controller_lock:
+        controller = _controller
+    return controller.flush(timeout) if controller is not None else True
@@ -0,0 +1,193 @@
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# 熔断器状态
+CLOSED = "closed"        # 正常调用
+OPEN = "open"            # 熔断中，调用直接失败
+HALF_OPEN = "half-open"  # 熔断时间已到，放行少量探测请求
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """
+    带随机抖动的指数退避时间：第 attempt 次（从 1 开始）重试前等待 [d/2, d] 秒，
+    d = min(cap, base * 2^(attempt-1))。抖动避免多个 worker 同时重试再次打满服务。
+    """
+    if base <= 0:
+        return 0.0
+    delay = min(cap, base * (2 ** max(0, attempt - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class CircuitBreaker:
+    """
+    服务熔断器：连续失败 failure_threshold 次后熔断，reset_timeout 秒内的调用直接失败（不再等待超时）；
+    之后进入半开状态，最多放行 half_open_max 个探测请求，探测成功则恢复，失败则再次熔断，
+    熔断时间每次翻倍（带抖动）直到 max_reset_timeout。
+
+    只有连接失败、超时和 5xx 等说明服务本身不可用的错误应当调用 record_failure，
+    4xx 等请求本身的错误视为服务可用。
+
+    Args:
+        name: 服务名称，用于日志
+        failure_threshold: 连续失败多少次后熔断
+        reset_timeout: 首次熔断时长（秒）
+        max_reset_timeout: 熔断时长上限（秒）
+        half_open_max: 半开状态下同时放行的探测请求数
+    """
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 5.0,
+                 max_reset_timeout: float = 60.0, half_open_max: int = 1):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = max(0.0, float(reset_timeout))
+        self.max_reset_timeout = max(self.reset_timeout, float(max_reset_timeout))
+        self.half_open_max = max(1, int(half_open_max))
+
+        self._cond = threading.Condition()
+        self._state = CLOSED
+        self._failures = 0
+        self._trips = 0          # 连续熔断次数，决定下一次熔断时长
+        self._open_until = 0.0
+        self._probes = 0         # 半开状态下已放行、尚未返回的探测请求数
+        self._probe_deadline = 0.0
+
+        self._rejected = 0
+        self._opened = 0
+
+    @classmethod
+    def from_config(cls, name: str, section: Dict[str, Any]) -> Optional["CircuitBreaker"]:
+        breaker_cfg = section.get("breaker", {}) or {}
+        if not breaker_cfg.get("enabled", True):
+            return None
+        return cls(
+            name,
+            failure_threshold=int(breaker_cfg.get("failure_threshold", 5)),
+            reset_timeout=float(breaker_cfg.get("reset_timeout", 5.0)),
+            max_reset_timeout=float(breaker_cfg.get("max_reset_timeout", 60.0)),
+            half_open_max=int(breaker_cfg.get("half_open_max", 1)),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._cond:
+            self._refresh()
+            return self._state
+
+    def allow(self) -> bool:
+        """是否允许发送一次请求；返回 True 后必须调用 record_success 或 record_failure"""
+        with self._cond:
+            self._refresh()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._probes < self.half_open_max:
+                self._probes += 1
+                self._probe_deadline = time.monotonic() + self.max_reset_timeout
+                return True
+            self._rejected += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._cond:
+            if self._state != CLOSED:
+                logger.info(f"{self.name} 服务已恢复，关闭熔断")
+            self._state = CLOSED
+            self._failures = 0
+            self._trips = 0
+            self._probes = 0
+            self._cond.notify_all()
+
+    def record_failure(self) -> None:
+        with self._cond:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+                self._trip()
+            elif self._state == CLOSED:
+                self._failures += 1
+                if self._failures >= self.failure_threshold:
+                    self._trip()
+
+    def wait_until_available(self, timeout: Optional[float] = None) -> bool:
+        """
+        阻塞到服务可用（已关闭熔断，或半开状态下还能放行探测请求），用于熔断期间暂停分发任务。
+
+        Returns:
+            超时仍不可用时返回 False
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refresh()
+                if self._state == CLOSED or (self._state == HALF_OPEN and self._probes < self.half_open_max):
+                    return True
+                now = time.monotonic()
+                wait = (self._open_until if self._state == OPEN else self._probe_deadline) - now
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+
+    def retry_after(self) -> float:
+        """距离服务可用（可以放行请求）还需等待的秒数，当前可用时为 0；不阻塞"""
+        with self._cond:
+            self._refresh()
+            if self._state == CLOSED or (self._state == HALF_OPEN and self._probes < self.half_open_max):
+                return 0.0
+            until = self._open_until if self._state == OPEN else self._probe_deadline
+            return max(0.0, until - time.monotonic())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refresh()
+            return {"state": self._state, "opened": self._opened, "rejected": self._rejected}
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return f"{self.name}: 状态 {stats['state']}, 熔断 {stats['opened']} 次, 快速失败 {stats['rejected']} 次"
+
+    def _trip(self) -> None:
+        self._trips += 1
+        self._opened += 1
+        duration = min(self.max_reset_timeout, self.reset_timeout * (2 ** (self._trips - 1)))
+        duration = duration / 2 + random.uniform(0, duration / 2) if self._trips > 1 else duration
+        self._state = OPEN
+        self._failures = 0
+        self._open_until = time.monotonic() + duration
+        logger.warning(f"{self.name} 服务连续失败，熔断 {duration:.1f}s")
+        self._cond.notify_all()
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if self._state == OPEN and now >= self._open_until:
+            self._state = HALF_OPEN
+            self._probes = 0
+            self._cond.notify_all()
+        elif self._state == HALF_OPEN and self._probes and now >= self._probe_deadline:
+            # 探测请求迟迟没有报告结果，放行新的探测，避免一直停在半开状态
+            self._probes = 0
+            self._cond.notify_all()
+
+
+_breakers: Dict[str, Optional[CircuitBreaker]] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name: str, section: Dict[str, Any]) -> Optional[CircuitBreaker]:
+    """返回进程内共享的指定服务熔断器；section 为该服务的配置段，breaker.enabled 为 false 时返回 None"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker.from_config(name, section)
+        return _breakers[name]
+
+
+def is_service_failure(exc: Exception) -> bool:
+    """请求异常是否说明服务不可用（连接失败、超时、5xx），4xx 视为请求本身的错误"""
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    return status is None or status >= 500
@@ -0,0 +1,190 @@
+import io
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(source: Union[str, bytes], hash_size: int = 8) -> int:
+    """
+    计算截图的差值感知哈希（dHash）：缩小为 (hash_size + 1) x hash_size 的灰度图，
+    比较相邻像素的明暗得到 hash_size * hash_size 位整数。
+
+    Args:
+        source: 截图路径或 PNG 字节
+        hash_size: 哈希边长，默认 8 即 64 位
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.draft("L", (hash_size * 4, hash_size * 4))
+        gray = np.asarray(image.convert("L").resize((hash_size + 1, hash_size), Image.BILINEAR), dtype=np.int16)
+    bits = (gray[:, 1:] > gray[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+class ClassificationCache:
+    """
+    以感知哈希为键的分类结果缓存，汉明距离不超过 max_distance 的截图视为同一页面。
+
+    查找使用分段索引：把哈希切成 max_distance + 1 段，距离在阈值内的两个哈希至少有一段完全相同，
+    因此只需比较与查询哈希有相同分段的候选项。超过 capacity 时按 LRU 淘汰。
+    """
+
+    def __init__(self, capacity: int = 4096, max_distance: int = 4, hash_bits: int = 64,
+                 persist_path: Optional[str] = None):
+        self.capacity = max(1, int(capacity))
+        self.max_distance = max(0, int(max_distance))
+        self.hash_bits = hash_bits
+        self.persist_path = persist_path or None
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, int]" = OrderedDict()
+        self._bands: Dict[Tuple[int, int], Set[int]] = {}
+        self._band_count = min(self.max_distance + 1, hash_bits)
+        self._band_width = -(-hash_bits // self._band_count)
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if self.persist_path:
+            self.load()
+
+    def get(self, image_hash: int) -> Optional[int]:
+        """查找与 image_hash 足够接近的缓存结果，未命中返回 None"""
+        with self._lock:
+            best = None
+            best_distance = self.max_distance + 1
+            for candidate in self._candidates(image_hash):
+                distance = bin(candidate ^ image_hash).count("1")
+                if distance < best_distance:
+                    best, best_distance = candidate, distance
+                    if distance == 0:
+                        break
+            if best is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(best)
+            return self._entries[best]
+
+    def put(self, image_hash: int, prediction: int) -> None:
+        with self._lock:
+            if image_hash in self._entries:
+                self._entries[image_hash] = prediction
+                self._entries.move_to_end(image_hash)
+                return
+            self._entries[image_hash] = prediction
+            for key in self._band_keys(image_hash):
+                self._bands.setdefault(key, set()).add(image_hash)
+            while len(self._entries) > self.capacity:
+                evicted, _ = self._entries.popitem(last=False)
+                self._remove_from_bands(evicted)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"条目 {stats['entries']}, 命中 {stats['hits']}, 未命中 {stats['misses']}, "
+            f"命中率 {stats['hit_rate']:.0%}, 淘汰 {stats['evictions']}"
+        )
+
+    def load(self) -> None:
+        """从持久化文件加载缓存，文件不存在或损坏时忽略"""
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                entries: List[List[Any]] = json.load(f).get("entries", [])
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"加载分类缓存失败 ({self.persist_path}): {e}")
+            return
+        for hash_hex, prediction in entries:
+            self.put(int(hash_hex, 16), int(prediction))
+        logger.info(f"已加载分类缓存 {len(entries)} 条: {self.persist_path}")
+
+    def save(self) -> None:
+        """按 LRU 顺序写入持久化文件"""
+        if not self.persist_path:
+            return
+        with self._lock:
+            entries = [[format(image_hash, "x"), prediction] for image_hash, prediction in self._entries.items()]
+        tmp_path = f"{self.persist_path}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"hash_bits": self.hash_bits, "entries": entries}, f)
+            os.replace(tmp_path, self.persist_path)
+        except OSError as e:
+            logger.warning(f"保存分类缓存失败 ({self.persist_path}): {e}")
+
+    def _band_keys(self, image_hash: int):
+        mask = (1 << self._band_width) - 1
+        for band in range(self._band_count):
+            yield band, (image_hash >> (band * self._band_width)) & mask
+
+    def _candidates(self, image_hash: int) -> Set[int]:
+        candidates: Set[int] = set()
+        for key in self._band_keys(image_hash):
+            candidates.update(self._bands.get(key, ()))
+        return candidates
+
+    def _remove_from_bands(self, image_hash: int) -> None:
+        for key in self._band_keys(image_hash):
+            members = self._bands.get(key)
+            if members is not None:
+                members.discard(image_hash)
+                if not members:
+                    del self._bands[key]
+
+
+_cache: Optional[ClassificationCache] = None
+_cache_lock = threading.Lock()
+_missing_warned = False
+
+
+def get_classification_cache(service_config: dict) -> Optional[ClassificationCache]:
+    """service.cache.enabled 为 True 且依赖可用时返回进程内共享的缓存，否则返回 None"""
+    global _cache, _missing_warned
+    cache_cfg = service_config.get("cache", {}) or {}
+    if not cache_cfg.get("enabled", False):
+        return None
+    if np is None or Image is None:
+        if not _missing_warned:
+            logger.warning("numpy 或 Pillow 未安装，无法启用分类缓存")
+            _missing_warned = True
+        return None
+    with _cache_lock:
+        if _cache is None:
+            hash_size = int(cache_cfg.get("hash_size", 8))
+            _cache = ClassificationCache(
+                capacity=int(cache_cfg.get("capacity", 4096)),
+                max_distance=int(cache_cfg.get("max_distance", 4)),
+                hash_bits=hash_size * hash_size,
+                persist_path=cache_cfg.get("persist_file") or None,
+            )
+        return _cache
@@ -0,0 +1,597 @@
+import argparse
+import json
+import logging
+import os
+import re
+import socket
+import socketserver
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from run_journal import ABANDONED
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY,
+    url TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'queued',
+    priority INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL DEFAULT 0,
+    node TEXT,
+    lease_until REAL,
+    outcome TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_queued ON tasks (state, priority, id);
+CREATE INDEX IF NOT EXISTS idx_tasks_lease ON tasks (state, lease_until);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# 任务在共享队列中的状态
+SEEDING = "seeding"  # 正在分块写入，seed_end 之前不可租用
+QUEUED = "queued"
+LEASED = "leased"
+DONE = "done"
+
+# 分块写入任务时每块的 URL 数
+SEED_CHUNK = 1000
+# 写入中的节点超过该时间（秒）没有写入新的块时视为已崩溃，其他节点可以接管并重新写入
+SEED_STALE_SECONDS = 300.0
+
+
+def _chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class QueueBackend:
+    """
+    分布式任务队列后端接口：任务以 {"id", "url", "attempts"} 表示，节点租用任务后必须定期续租，
+    租约过期的任务可以被任何节点重新租用（至少执行一次）。
+    """
+
+    def seed(self, urls: Iterable[str], chunk_size: int = SEED_CHUNK) -> bool:
+        """
+        写入全部任务；队列已经初始化过（或其他节点正在写入）时忽略并返回 False（多个节点只有第一个生效）。
+
+        任务按 chunk_size 个一块通过 seed_begin / seed_chunk / seed_end 写入，不会把整个 URL 列表读入内存；
+        seed_end 之前写入的任务不可租用，队列也不视为已初始化。
+        """
+        token = self.seed_begin()
+        if token is None:
+            return False
+        for chunk in _chunks(urls, max(1, int(chunk_size))):
+            self.seed_chunk(token, chunk)
+        return self.seed_end(token)
+
+    def seed_begin(self) -> Optional[str]:
+        """开始写入任务，返回本次写入的标识；已初始化或其他节点正在写入时返回 None"""
+        raise NotImplementedError
+
+    def seed_chunk(self, token: str, urls: List[str]) -> int:
+        """写入一块任务（暂不可租用），返回写入的数量"""
+        raise NotImplementedError
+
+    def seed_end(self, token: str) -> bool:
+        """结束写入：所有已写入的任务同时变为可租用，并把队列标记为已初始化"""
+        raise NotImplementedError
+
+    def lease(self, node: str, count: int, lease_seconds: float,
+              max_retries: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        租用最多 count 个可执行的任务（排队中且已到重试时间，或租约已过期）。
+
+        租约过期视为一次失败的尝试：重新分配时 attempts 加一；已达到 max_retries 的任务不再分配，
+        直接标记为 abandoned 结束，避免导致节点崩溃的 URL 被无限次重新分配。max_retries 为 None 时不限制。
+        """
+        raise NotImplementedError
+
+    def heartbeat(self, node: str, task_ids: List[int], lease_seconds: float) -> List[int]:
+        """为节点持有的任务续租，返回已经不属于该节点（租约过期后被其他节点租走）的任务 id"""
+        raise NotImplementedError
+
+    def complete(self, node: str, task_id: int, outcome: str) -> bool:
+        """任务最终结束；租约已被其他节点取得时返回 False"""
+        raise NotImplementedError
+
+    def retry(self, node: str, task_id: int, attempts: int, delay: float = 0.0, priority: bool = False) -> bool:
+        """任务放回队列，delay 秒后才能再次被租用"""
+        raise NotImplementedError
+
+    def status(self) -> Dict[str, Any]:
+        """各状态的任务数与各节点持有的任务数"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteQueueBackend(QueueBackend):
+    """
+    基于 SQLite 文件的队列后端，适用于同一台机器上的多个进程：
+    租用、续租与结束都在 BEGIN IMMEDIATE 事务中完成，由 SQLite 的文件锁保证互斥。
+    也作为 TCP 协调进程的存储。
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def seed_begin(self) -> Optional[str]:
+        token = uuid.uuid4().hex
+        now = time.time()
+        with self._transaction() as conn:
+            if conn.execute("SELECT 1 FROM meta WHERE key = 'seeded'").fetchone():
+                return None
+            row = conn.execute("SELECT value FROM meta WHERE key = 'seeding_at'").fetchone()
+            if row is not None:
+                if now - float(row[0]) < SEED_STALE_SECONDS:
+                    return None
+                logger.warning("写入任务的节点已超时，接管并重新写入共享任务队列")
+                conn.execute("DELETE FROM tasks WHERE state = ?", (SEEDING,))
+            conn.executemany("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                             [("seeding", token), ("seeding_at", str(now))])
+        return token
+
+    def seed_chunk(self, token: str, urls: List[str]) -> int:
+        with self._transaction() as conn:
+            self._check_seeding(conn, token)
+            conn.executemany("INSERT INTO tasks (url, state) VALUES (?, ?)", ((url, SEEDING) for url in urls))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'seeding_at'", (str(time.time()),))
+        return len(urls)
+
+    def seed_end(self, token: str) -> bool:
+        with self._transaction() as conn:
+            self._check_seeding(conn, token)
+            conn.execute("UPDATE tasks SET state = ? WHERE state = ?", (QUEUED, SEEDING))
+            count = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            conn.execute("DELETE FROM meta WHERE key IN ('seeding', 'seeding_at')")
+            conn.execute("INSERT INTO meta (key, value) VALUES ('seeded', ?)", (str(count),))
+        logger.info(f"共享任务队列已初始化: {count} 个任务 ({self.path})")
+        return True
+
+    @staticmethod
+    def _check_seeding(conn: sqlite3.Connection, token: str) -> None:
+        row = conn.execute("SELECT value FROM meta WHERE key = 'seeding'").fetchone()
+        if row is None or row[0] != token:
+            raise RuntimeError("写入任务超时，已被其他节点接管")
+
+    def lease(self, node: str, count: int, lease_seconds: float,
+              max_retries: Optional[int] = None) -> List[Dict[str, Any]]:
+        now = time.time()
+        rows: List[tuple] = []
+        with self._transaction() as conn:
+            expired = conn.execute(
+                "SELECT id, url, attempts, node FROM tasks WHERE state = ? AND lease_until < ? ORDER BY lease_until",
+                (LEASED, now),
+            ).fetchall()
+            for task_id, url, attempts, owner in expired:
+                if max_retries is not None and attempts >= max_retries:
+                    logger.error(f"任务 {task_id} 的租约已过期（节点 {owner}），达到最大重试次数，放弃任务: {url}")
+                    conn.execute(
+                        "UPDATE tasks SET state = ?, outcome = ?, node = NULL, lease_until = NULL WHERE id = ?",
+                        (DONE, ABANDONED, task_id),
+                    )
+                elif len(rows) < count:
+                    logger.warning(f"任务 {task_id} 的租约已过期（节点 {owner}），重新分配给 {node}")
+                    rows.append((task_id, url, attempts + 1))
+            if len(rows) < count:
+                rows += conn.execute(
+                    "SELECT id, url, attempts FROM tasks WHERE state = ? AND available_at <= ? "
+                    "ORDER BY priority DESC, id LIMIT ?",
+                    (QUEUED, now, count - len(rows)),
+                ).fetchall()
+            conn.executemany(
+                "UPDATE tasks SET state = ?, node = ?, lease_until = ?, attempts = ? WHERE id = ?",
+                [(LEASED, node, now + lease_seconds, attempts, task_id) for task_id, _, attempts in rows],
+            )
+        return [{"id": task_id, "url": url, "attempts": attempts} for task_id, url, attempts in rows]
+
+    def heartbeat(self, node: str, task_ids: List[int], lease_seconds: float) -> List[int]:
+        if not task_ids:
+            return []
+        lease_until = time.time() + lease_seconds
+        lost = []
+        with self._transaction() as conn:
+            for task_id in task_ids:
+                cursor = conn.execute(
+                    "UPDATE tasks SET lease_until = ? WHERE id = ? AND state = ? AND node = ?",
+                    (lease_until, task_id, LEASED, node),
+                )
+                if cursor.rowcount == 0:
+                    lost.append(task_id)
+        return lost
+
+    def complete(self, node: str, task_id: int, outcome: str) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = ?, outcome = ?, lease_until = NULL WHERE id = ? AND state = ? AND node = ?",
+                (DONE, outcome, task_id, LEASED, node),
+            )
+        return cursor.rowcount > 0
+
+    def retry(self, node: str, task_id: int, attempts: int, delay: float = 0.0, priority: bool = False) -> bool:
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE tasks SET state = ?, attempts = ?, available_at = ?, priority = ?, node = NULL, "
+                "lease_until = NULL WHERE id = ? AND state = ? AND node = ?",
+                (QUEUED, attempts, time.time() + delay, 1 if priority else 0, task_id, LEASED, node),
+            )
+        return cursor.rowcount > 0
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            seeded = self._conn.execute("SELECT value FROM meta WHERE key = 'seeded'").fetchone()
+            counts = dict(self._conn.execute("SELECT state, COUNT(*) FROM tasks GROUP BY state").fetchall())
+            nodes = dict(self._conn.execute(
+                "SELECT node, COUNT(*) FROM tasks WHERE state = ? GROUP BY node", (LEASED,)
+            ).fetchall())
+            outcomes = dict(self._conn.execute(
+                "SELECT outcome, COUNT(*) FROM tasks WHERE state = ? GROUP BY outcome", (DONE,)
+            ).fetchall())
+        return {
+            "seeded": seeded is not None,
+            QUEUED: counts.get(QUEUED, 0),
+            LEASED: counts.get(LEASED, 0),
+            DONE: counts.get(DONE, 0),
+            "nodes": nodes,
+            "outcomes": outcomes,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# TCP 协调进程允许远程调用的方法
+_REMOTE_OPS = ("seed_begin", "seed_chunk", "seed_end", "lease", "heartbeat", "complete", "retry", "status")
+
+
+class RemoteQueueBackend(QueueBackend):
+    """
+    TCP 协调进程的客户端：每个请求为一行 JSON {"op", "args"}，响应为一行 {"ok", "result"} 或 {"ok": false, "error"}。
+    连接断开时重新连接一次。
+    """
+
+    def __init__(self, address: str, timeout: float = 30.0):
+        host, _, port = address.rpartition(":")
+        self.address = (host or "127.0.0.1", int(port))
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._file = None
+
+    def _connect(self) -> None:
+        self._sock = socket.create_connection(self.address, timeout=self.timeout)
+        self._file = self._sock.makefile("rwb")
+
+    def _disconnect(self) -> None:
+        for closable in (self._file, self._sock):
+            if closable is not None:
+                try:
+                    closable.close()
+                except OSError:
+                    pass
+        self._sock = self._file = None
+
+    def _call(self, op: str, **args: Any) -> Any:
+        request = (json.dumps({"op": op, "args": args}, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._file is None:
+                        self._connect()
+                    self._file.write(request)
+                    self._file.flush()
+                    line = self._file.readline()
+                    if not line:
+                        raise ConnectionError("协调进程关闭了连接")
+                    break
+                except OSError:
+                    self._disconnect()
+                    if attempt:
+                        raise
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise RuntimeError(f"协调进程返回错误: {response.get('error')}")
+        return response.get("result")
+
+    def seed_begin(self) -> Optional[str]:
+        return self._call("seed_begin")
+
+    def seed_chunk(self, token: str, urls: List[str]) -> int:
+        return int(self._call("seed_chunk", token=token, urls=urls))
+
+    def seed_end(self, token: str) -> bool:
+        return bool(self._call("seed_end", token=token))
+
+    def lease(self, node: str, count: int, lease_seconds: float,
+              max_retries: Optional[int] = None) -> List[Dict[str, Any]]:
+        return self._call("lease", node=node, count=count, lease_seconds=lease_seconds, max_retries=max_retries)
+
+    def heartbeat(self, node: str, task_ids: List[int], lease_seconds: float) -> List[int]:
+        return self._call("heartbeat", node=node, task_ids=task_ids, lease_seconds=lease_seconds)
+
+    def complete(self, node: str, task_id: int, outcome: str) -> bool:
+        return bool(self._call("complete", node=node, task_id=task_id, outcome=outcome))
+
+    def retry(self, node: str, task_id: int, attempts: int, delay: float = 0.0, priority: bool = False) -> bool:
+        return bool(self._call("retry", node=node, task_id=task_id, attempts=attempts, delay=delay, priority=priority))
+
+    def status(self) -> Dict[str, Any]:
+        return self._call("status")
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    """多台机器共享任务队列的 TCP 协调进程，任务存储在本机的 SQLite 文件中"""
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, backend: QueueBackend):
+        self.backend = backend
+        super().__init__(address, _CoordinatorHandler)
+
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        backend = self.server.backend  # type: ignore[attr-defined]
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                op = request.get("op")
+                if op not in _REMOTE_OPS:
+                    raise ValueError(f"未知操作: {op}")
+                response = {"ok": True, "result": getattr(backend, op)(**(request.get("args") or {}))}
+            except Exception as e:
+                logger.warning(f"处理协调请求失败: {e}")
+                response = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class DistributedTaskQueue:
+    """
+    分布式模式下替代 TaskQueue 的任务队列，接口与 TaskQueue 相同：
+    任务从共享后端租用，本节点持有的任务（访问中、等待分类结果）由后台线程定期续租，
+    节点崩溃后租约过期，任务由其他节点重新租用。
+
+    Args:
+        backend: 共享队列后端
+        node_id: 节点名称，同时用于抓包 (domain, idx) 的命名空间
+        batch: 每次租用的任务数
+        lease_seconds: 租约时长（秒）
+        heartbeat_interval: 续租间隔（秒），应明显小于 lease_seconds
+        poll_interval: 暂时没有可租用的任务时的重试间隔（秒）
+        max_retries: 最大重试次数，租约过期同样计为一次重试，达到后任务被放弃
+    """
+
+    def __init__(self, backend: QueueBackend, node_id: str, batch: int = 1, lease_seconds: float = 120.0,
+                 heartbeat_interval: float = 30.0, poll_interval: float = 1.0, max_retries: Optional[int] = None):
+        self.backend = backend
+        self.node_id = node_id
+        self.batch = max(1, int(batch))
+        self.lease_seconds = max(1.0, float(lease_seconds))
+        self.heartbeat_interval = max(0.1, min(float(heartbeat_interval), self.lease_seconds / 2))
+        self.poll_interval = max(0.05, float(poll_interval))
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._local: deque = deque()
+        self._held: Dict[int, Dict[str, Any]] = {}
+        self._closed = threading.Event()
+        self.total = 0  # 本节点租用过的任务数
+        self.lost = 0   # 租约过期后被其他节点取走的任务数
+        self._thread = threading.Thread(target=self._heartbeat_loop, name="queue-heartbeat", daemon=True)
+        self._thread.start()
+
+    @classmethod
+    def from_config(cls, backend: QueueBackend, config: Dict[str, Any]) -> "DistributedTaskQueue":
+        dist_cfg = config.get("distributed", {}) or {}
+        visit_cfg = config.get("visit", {}) or {}
+        return cls(
+            backend,
+            dist_cfg["node_id"],
+            batch=int(dist_cfg.get("batch", 1)),
+            lease_seconds=float(dist_cfg.get("lease_seconds", 120)),
+            heartbeat_interval=float(dist_cfg.get("heartbeat_interval", 30)),
+            poll_interval=float(dist_cfg.get("poll_interval", 1.0)),
+            # 与调度器的重试上限一致
+            max_retries=max(1, int(visit_cfg.get("max_retries", 2))),
+        )
+
+    def get(self, block: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        取出下一个任务；暂时没有可租用的任务时按 poll_interval 重试，共享队列中所有任务都结束时返回 None。
+
+        Args:
+            block: 为 False 时不等待，暂时没有任务直接返回 None
+        """
+        while not self._closed.is_set():
+            with self._lock:
+                if self._local:
+                    return self._local.popleft()
+            try:
+                tasks = self.backend.lease(self.node_id, self.batch, self.lease_seconds, self.max_retries)
+                if not tasks and block and self._finished():
+                    return None
+            except Exception as e:
+                logger.warning(f"租用任务失败: {e}")
+                tasks = []
+            if tasks:
+                with self._lock:
+                    for task in tasks:
+                        self._held[task["id"]] = task
+                    self.total += len(tasks)
+                    self._local.extend(tasks[1:])
+                return tasks[0]
+            if not block:
+                return None
+            self._closed.wait(self.poll_interval)
+        return None
+
+    def requeue(self, task: Dict[str, Any], priority: bool = False, delay: float = 0.0) -> None:
+        """任务放回共享队列等待重试（可能由其他节点执行）"""
+        self._forget(task)
+        try:
+            if not self.backend.retry(self.node_id, task["id"], task["attempts"], delay, priority):
+                logger.warning(f"任务 {task['id']} 的租约已失效，重试交给当前持有者: {task['url']}")
+        except Exception as e:
+            logger.warning(f"任务 {task['id']} 放回共享队列失败，租约过期后将重新分配: {e}")
+
+    def task_done(self, task: Optional[Dict[str, Any]] = None, state: Optional[str] = None) -> None:
+        """任务最终结束，在共享队列中标记为完成"""
+        if task is None:
+            return
+        self._forget(task)
+        try:
+            if not self.backend.complete(self.node_id, task["id"], state or DONE):
+                logger.warning(f"任务 {task['id']} 的租约已失效，可能已由其他节点重复执行: {task['url']}")
+        except Exception as e:
+            logger.warning(f"任务 {task['id']} 标记完成失败，租约过期后将重新分配: {e}")
+
+    def release(self, task: Dict[str, Any]) -> None:
+        """与 TaskQueue 接口一致；分布式模式不按域名限速"""
+
+    def feedback(self, task: Dict[str, Any], bad: bool) -> None:
+        """与 TaskQueue 接口一致；分布式模式不按域名限速"""
+
+    def finished(self) -> bool:
+        try:
+            return self._finished()
+        except Exception:
+            return False
+
+    def close(self) -> None:
+        """停止续租；本节点未完成的任务立即放回共享队列，其他节点无需等待租约过期"""
+        self._closed.set()
+        self._thread.join(timeout=5)
+        with self._lock:
+            held = list(self._held.values())
+            self._held.clear()
+            self._local.clear()
+        for task in held:
+            try:
+                self.backend.retry(self.node_id, task["id"], task["attempts"])
+            except Exception as e:
+                logger.warning(f"归还任务 {task['id']} 失败: {e}")
+        if held:
+            logger.info(f"已将 {len(held)} 个未完成的任务归还共享队列")
+
+    def _finished(self) -> bool:
+        status = self.backend.status()
+        # 其他节点仍在写入任务时队列尚未初始化
+        return status["seeded"] and status[QUEUED] == 0 and status[LEASED] == 0
+
+    def _forget(self, task: Dict[str, Any]) -> None:
+        with self._lock:
+            self._held.pop(task["id"], None)
+
+    def _heartbeat_loop(self) -> None:
+        while not self._closed.wait(self.heartbeat_interval):
+            with self._lock:
+                task_ids = list(self._held)
+            if not task_ids:
+                continue
+            try:
+                lost = self.backend.heartbeat(self.node_id, task_ids, self.lease_seconds)
+            except Exception as e:
+                logger.warning(f"续租失败: {e}")
+                continue
+            if lost:
+                with self._lock:
+                    self.lost += len(lost)
+                logger.warning(f"{len(lost)} 个任务的租约已被其他节点取得: {lost}")
+
+
+def resolve_node_id(dist_cfg: Dict[str, Any]) -> str:
+    """节点名称：配置的 node_id，留空时为 主机名-进程号；只保留可用于文件名的字符"""
+    node_id = str(dist_cfg.get("node_id") or f"{socket.gethostname()}-{os.getpid()}")
+    return re.sub(r"[^A-Za-z0-9._]", "_", node_id)
+
+
+def open_backend(dist_cfg: Dict[str, Any]) -> QueueBackend:
+    """按 distributed.backend 打开共享队列后端：sqlite 为本机文件，tcp 为协调进程"""
+    backend = str(dist_cfg.get("backend", "sqlite")).lower()
+    if backend == "sqlite":
+        return SQLiteQueueBackend(dist_cfg.get("sqlite_file", "task_queue.db"))
+    if backend == "tcp":
+        return RemoteQueueBackend(dist_cfg.get("coordinator", "127.0.0.1:7600"))
+    raise ValueError(f"未知的共享队列后端: {backend}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="分布式抓包的共享任务队列")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    serve = subparsers.add_parser("serve", help="启动 TCP 协调进程")
+    serve.add_argument("--db", default="task_queue.db", help="任务存储的 SQLite 文件")
+    serve.add_argument("--host", default="0.0.0.0")
+    serve.add_argument("--port", type=int, default=7600)
+
+    status = subparsers.add_parser("status", help="查看共享队列状态")
+    status.add_argument("--db", help="SQLite 文件（本机后端）")
+    status.add_argument("--coordinator", help="协调进程地址 host:port")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    if args.command == "serve":
+        backend = SQLiteQueueBackend(args.db)
+        server = CoordinatorServer((args.host, args.port), backend)
+        logger.info(f"协调进程已启动: {args.host}:{server.server_address[1]}, 存储: {args.db}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            backend.close()
+        return
+
+    if args.coordinator:
+        backend = RemoteQueueBackend(args.coordinator)
+    else:
+        backend = SQLiteQueueBackend(args.db or "task_queue.db")
+    try:
+        print(json.dumps(backend.status(), ensure_ascii=False, indent=2))
+    finally:
+        backend.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import heapq
+import logging
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from utils import parse_domain
+
+logger = logging.getLogger(__name__)
+
+
+class _Site:
+    __slots__ = ("tasks", "active", "next_allowed", "tokens", "refilled_at", "backoff", "blank_rate", "key")
+
+    def __init__(self, burst: float, now: float):
+        self.tasks: deque = deque()
+        self.active = 0
+        self.next_allowed = 0.0
+        self.tokens = burst
+        self.refilled_at = now
+        self.backoff = 0.0      # 因空白率上升额外增加的访问间隔（秒）
+        self.blank_rate = 0.0   # 空白/访问失败比例的指数移动平均
+        self.key: Optional[float] = None  # 当前有效的堆条目（可开始访问的时间），None 表示不在堆中
+
+
+class DomainDispatcher:
+    """
+    按域名限速的任务分发：同一域名同时访问的 worker 数不超过 max_concurrency，
+    两次开始访问之间至少间隔 min_interval 秒，并可用令牌桶（每秒 rate 个、容量 burst）限制平均访问频率。
+    空白率（指数移动平均）超过 blank_threshold 的域名额外退避，退避时间每次翻倍直到 backoff_max，
+    访问恢复正常后逐次减半。
+
+    有排队任务且未达到并发上限的域名放在以“可开始访问的时间”为键的最小堆中，
+    取任务只看堆顶，O(log n)；域名状态变化时压入新条目，旧条目在弹出时按 key 判断失效后丢弃。
+
+    不加锁，由 TaskQueue 在其条件变量内调用。时间均为 time.monotonic()。
+    """
+
+    def __init__(self, max_concurrency: int = 1, min_interval: float = 0.0, rate: float = 0.0,
+                 burst: float = 1.0, backoff_initial: float = 5.0, backoff_max: float = 120.0,
+                 blank_threshold: float = 0.5, smoothing: float = 0.3):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.min_interval = max(0.0, float(min_interval))
+        self.rate = max(0.0, float(rate))
+        self.burst = max(1.0, float(burst))
+        self.backoff_initial = max(0.0, float(backoff_initial))
+        self.backoff_max = max(self.backoff_initial, float(backoff_max))
+        self.blank_threshold = float(blank_threshold)
+        self.smoothing = min(1.0, max(0.0, float(smoothing)))
+        self._sites: Dict[str, _Site] = {}
+        self._heap: List[Tuple[float, int, str]] = []
+        self._seq = 0
+        self.buffered = 0  # 排队中的任务数
+
+        self._dispatched = 0
+        self._deferred = 0
+        self._backoffs = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["DomainDispatcher"]:
+        politeness_cfg = (config.get("scheduler", {}) or {}).get("politeness", {}) or {}
+        if not politeness_cfg.get("enabled", False):
+            return None
+        return cls(
+            max_concurrency=int(politeness_cfg.get("max_concurrency", 1)),
+            min_interval=float(politeness_cfg.get("min_interval", 0.0)),
+            rate=float(politeness_cfg.get("rate", 0.0)),
+            burst=float(politeness_cfg.get("burst", 1)),
+            backoff_initial=float(politeness_cfg.get("backoff_initial", 5.0)),
+            backoff_max=float(politeness_cfg.get("backoff_max", 120.0)),
+            blank_threshold=float(politeness_cfg.get("blank_threshold", 0.5)),
+        )
+
+    def push(self, task: Dict[str, Any], now: float, front: bool = False) -> None:
+        """
+        任务入队。
+
+        Args:
+            task: 任务字典
+            now: 当前时间
+            front: True 时排在该域名其他任务之前（空白页重试）
+        """
+        name = parse_domain(task["url"])
+        site = self._sites.get(name)
+        if site is None:
+            site = self._sites[name] = _Site(self.burst, now)
+        if front:
+            site.tasks.appendleft(task)
+        else:
+            site.tasks.append(task)
+        self.buffered += 1
+        self._schedule(name, site)
+
+    def pop(self, now: float) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """
+        取出最早可以开始访问的任务。
+
+        Returns:
+            (任务, None)；没有到时间的任务时返回 (None, 距最早可访问时间的秒数)；
+            没有可分发的任务（为空或都达到并发上限）时返回 (None, None)
+        """
+        while self._heap:
+            ready, _, name = self._heap[0]
+            site = self._sites.get(name)
+            if site is None or site.key != ready:
+                heapq.heappop(self._heap)  # 失效条目
+                continue
+            if ready > now:
+                self._deferred += 1
+                return None, ready - now
+            heapq.heappop(self._heap)
+            site.key = None
+            task = site.tasks.popleft()
+            self.buffered -= 1
+            site.active += 1
+            site.next_allowed = now + self.min_interval + site.backoff
+            if self.rate > 0:
+                self._refill(site, now)
+                site.tokens -= 1
+            self._dispatched += 1
+            self._schedule(name, site)
+            return task, None
+        return None, None
+
+    def release(self, task: Dict[str, Any], now: float) -> None:
+        """一次访问结束（浏览器不再访问该域名），释放并发名额"""
+        name = parse_domain(task["url"])
+        site = self._sites.get(name)
+        if site is None:
+            return
+        site.active = max(0, site.active - 1)
+        if self._idle(site, now):
+            del self._sites[name]
+            return
+        self._schedule(name, site)
+
+    def feedback(self, task: Dict[str, Any], bad: bool, now: float) -> None:
+        """
+        报告一次访问的结果，用于按空白率调整域名的退避时间。
+
+        Args:
+            task: 任务字典
+            bad: 是否为空白页或访问失败
+            now: 当前时间
+        """
+        name = parse_domain(task["url"])
+        site = self._sites.get(name)
+        if site is None:
+            if not bad:
+                return
+            site = self._sites[name] = _Site(self.burst, now)
+        site.blank_rate += self.smoothing * ((1.0 if bad else 0.0) - site.blank_rate)
+        if bad and site.blank_rate >= self.blank_threshold:
+            if site.backoff == 0:
+                logger.warning(f"域名 {name} 空白率上升 ({site.blank_rate:.0%})，开始退避")
+            site.backoff = min(self.backoff_max, max(self.backoff_initial, site.backoff * 2))
+            site.next_allowed = max(site.next_allowed, now + self.min_interval + site.backoff)
+            self._backoffs += 1
+        elif not bad and site.backoff > 0:
+            site.backoff /= 2
+            if site.backoff < self.backoff_initial / 2:
+                site.backoff = 0.0
+        self._schedule(name, site)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "dispatched": self._dispatched,
+            "deferred": self._deferred,
+            "backoffs": self._backoffs,
+            "backed_off_domains": sum(1 for site in self._sites.values() if site.backoff > 0),
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"分发 {stats['dispatched']} 次, 等待域名间隔 {stats['deferred']} 次, "
+            f"空白退避 {stats['backoffs']} 次, 当前退避域名 {stats['backed_off_domains']} 个"
+        )
+
+    def _schedule(self, name: str, site: _Site) -> None:
+        """有排队任务且未达到并发上限时，按可开始访问的时间（重新）加入堆"""
+        if not site.tasks or site.active >= self.max_concurrency:
+            site.key = None
+            return
+        ready = site.next_allowed
+        if self.rate > 0 and site.tokens < 1:
+            ready = max(ready, site.refilled_at + (1 - site.tokens) / self.rate)
+        if site.key == ready:
+            return
+        site.key = ready
+        self._seq += 1
+        heapq.heappush(self._heap, (ready, self._seq, name))
+
+    def _refill(self, site: _Site, now: float) -> None:
+        site.tokens = min(self.burst, site.tokens + (now - site.refilled_at) * self.rate)
+        site.refilled_at = now
+
+    def _idle(self, site: _Site, now: float) -> bool:
+        """域名没有需要保留的状态时可以移除，避免长时间运行时状态无限增长"""
+        if site.tasks or site.active or site.backoff > 0 or site.blank_rate > 0.01 or site.next_allowed > now:
+            return False
+        if self.rate > 0:
+            self._refill(site, now)
+            return site.tokens >= self.burst
+        return True
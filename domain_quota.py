@@ -0,0 +1,190 @@
+import logging
+import threading
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+from utils import _iter_urls, parse_domain
+
+logger = logging.getLogger(__name__)
+
+# 域名的结束原因
+MET = "met"              # 已达到目标数量
+HOPELESS = "hopeless"    # 空白/失败比例过高，提前放弃
+EXHAUSTED = "exhausted"  # 访问次数用完
+
+
+class _DomainState:
+    __slots__ = ("urls", "visits", "in_flight", "good", "bad", "done", "ready")
+
+    def __init__(self):
+        self.urls: List[str] = []
+        self.visits = 0
+        self.in_flight = 0
+        self.good = 0
+        self.bad = 0
+        self.done: Optional[str] = None
+        self.ready = False
+
+
+class DomainQuota:
+    """
+    以“每个域名 K 个非空白抓包”为目标的任务来源：只在域名尚未达到目标时继续为其产出访问，
+    空白或失败比例过高的域名提前放弃，把访问预算留给仍有希望的域名。
+
+    作为 TaskQueue 的 URL 迭代器使用：先边读文件边产出每个域名的第一次访问，
+    之后从“仍需更多访问”的域名队列中轮询产出。暂时没有可产出的访问（都在等待结果）时产出 None，
+    调度器在收到结果（report）后再次尝试。
+
+    Args:
+        filename: 网站列表文件
+        target: 每个域名需要的非空白抓包数 K
+        max_visits: 每个域名最多访问次数，默认 3 * K
+        min_samples: 至少得到多少个结果后才判断是否放弃
+        max_bad_rate: 空白/失败比例达到该值时放弃域名
+    """
+
+    def __init__(self, filename: str, target: int, max_visits: Optional[int] = None,
+                 min_samples: int = 3, max_bad_rate: float = 0.8):
+        self.target = max(1, int(target))
+        self.max_visits = max(self.target, int(max_visits or 3 * self.target))
+        self.min_samples = max(1, int(min_samples))
+        self.max_bad_rate = float(max_bad_rate)
+        self._lock = threading.Lock()
+        self._lines: Optional[Iterator[str]] = _iter_urls(filename)
+        self._domains: Dict[str, _DomainState] = {}
+        self._ready: deque = deque()
+        self._in_flight = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "DomainQuota":
+        websites_cfg = config.get("websites", {}) or {}
+        quota_cfg = (config.get("scheduler", {}) or {}).get("quota", {}) or {}
+        target = int(quota_cfg.get("target") or websites_cfg.get("count", 1))
+        return cls(
+            websites_cfg.get("file", "websites.txt"),
+            target,
+            max_visits=quota_cfg.get("max_visits"),
+            min_samples=int(quota_cfg.get("min_samples", 3)),
+            max_bad_rate=float(quota_cfg.get("max_bad_rate", 0.8)),
+        )
+
+    def __iter__(self) -> "DomainQuota":
+        return self
+
+    def __next__(self) -> Optional[str]:
+        with self._lock:
+            # 第一轮：边读文件边产出每个新域名的第一次访问
+            while self._lines is not None:
+                url = next(self._lines, None)
+                if url is None:
+                    self._lines = None
+                    break
+                domain = parse_domain(url)
+                state = self._domains.get(domain)
+                if state is None:
+                    state = self._domains[domain] = _DomainState()
+                    state.urls.append(url)
+                    url = self._issue(domain, state)
+                    self._mark_ready(domain, state)
+                    return url
+                if len(state.urls) < self.max_visits:
+                    state.urls.append(url)
+
+            # 之后：在仍需更多访问的域名之间轮询
+            while self._ready:
+                domain = self._ready.popleft()
+                state = self._domains[domain]
+                state.ready = False
+                if not self._needs_more(state):
+                    continue
+                url = self._issue(domain, state)
+                self._mark_ready(domain, state)
+                return url
+
+            if self._in_flight > 0:
+                return None  # 等待在途访问的结果
+            raise StopIteration
+
+    def report(self, url: str, good: bool) -> None:
+        """
+        报告一次访问的最终结果。
+
+        Args:
+            url: 访问的 URL
+            good: 是否得到了分类完成的非空白抓包
+        """
+        domain = parse_domain(url)
+        with self._lock:
+            state = self._domains.get(domain)
+            if state is None:
+                return
+            state.in_flight -= 1
+            self._in_flight -= 1
+            if good:
+                state.good += 1
+            else:
+                state.bad += 1
+            if state.done is None:
+                if state.good >= self.target:
+                    self._finish(domain, state, MET)
+                elif self._hopeless(state):
+                    self._finish(domain, state, HOPELESS)
+                elif state.visits >= self.max_visits and state.in_flight == 0:
+                    self._finish(domain, state, EXHAUSTED)
+            self._mark_ready(domain, state)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            outcomes: Dict[str, int] = {MET: 0, HOPELESS: 0, EXHAUSTED: 0}
+            visits = good = 0
+            for state in self._domains.values():
+                visits += state.visits
+                good += state.good
+                if state.done is not None:
+                    outcomes[state.done] += 1
+            return {
+                "domains": len(self._domains),
+                "visits": visits,
+                "good": good,
+                "visits_per_good": visits / good if good else 0.0,
+                **outcomes,
+            }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        return (
+            f"域名 {summary['domains']} 个: 达标 {summary[MET]}, 提前放弃 {summary[HOPELESS]}, "
+            f"访问次数用完 {summary[EXHAUSTED]}; 访问 {summary['visits']} 次, 非空白 {summary['good']} 个, "
+            f"每个可用样本 {summary['visits_per_good']:.2f} 次访问"
+        )
+
+    def _issue(self, domain: str, state: _DomainState) -> str:
+        url = state.urls[state.visits % len(state.urls)]
+        state.visits += 1
+        state.in_flight += 1
+        self._in_flight += 1
+        return url
+
+    def _needs_more(self, state: _DomainState) -> bool:
+        return (state.done is None and state.visits < self.max_visits
+                and state.good + state.in_flight < self.target)
+
+    def _mark_ready(self, domain: str, state: _DomainState) -> None:
+        if not state.ready and self._needs_more(state):
+            state.ready = True
+            self._ready.append(domain)
+
+    def _hopeless(self, state: _DomainState) -> bool:
+        finished = state.good + state.bad
+        if finished < self.min_samples:
+            return False
+        # 即使剩余访问全部成功也无法达标，或空白/失败比例过高
+        remaining = self.max_visits - state.visits + state.in_flight
+        return state.good + remaining < self.target or state.bad / finished >= self.max_bad_rate
+
+    def _finish(self, domain: str, state: _DomainState, reason: str) -> None:
+        state.done = reason
+        if reason == HOPELESS:
+            logger.warning(f"域名 {domain} 空白/失败过多，提前放弃: 非空白 {state.good}, 空白/失败 {state.bad}")
+        elif reason == EXHAUSTED:
+            logger.warning(f"域名 {domain} 访问次数用完仍未达标: 非空白 {state.good}/{self.target}")
@@ -1,82 +1,78 @@
-import yaml
+import hashlib
+import json
 import os
+import shutil
+import tempfile
+import threading
+import time
+import yaml
 import logging
+from typing import Any, Dict, Optional
 from selenium import webdriver
 from selenium.webdriver.firefox.service import Service
 from selenium.webdriver.firefox.options import Options as FirefoxOptions
 from webdriver_manager.firefox import GeckoDriverManager
 
 from config_manager import load_config
+from metrics import STAGE_SECONDS
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
-def get_firefox_driver():
+def build_preferences(config: Dict[str, Any]) -> Dict[str, Any]:
     """
-    根据 config.yaml 返回配置好的 Firefox WebDriver
+    根据配置生成 Firefox 首选项（写入配置模板的 user.js，或在不使用模板时逐项设置）
     """
-    config = load_config()
-    
     browser_cfg = config.get('browser', {})
     proxy_cfg = config.get('proxy', {})
-    driver_cfg = config.get('driver', {})
-
-    options = FirefoxOptions()
-    
-    # 无头模式
-    if browser_cfg.get('headless', False):
-        options.add_argument('--headless')
+    prefs: Dict[str, Any] = {}
 
     # UA 与语言
     user_agent = browser_cfg.get('user_agent')
     if user_agent:
-        options.set_preference("general.useragent.override", user_agent)
-    
+        prefs["general.useragent.override"] = user_agent
+
     accept_language = browser_cfg.get('accept_language')
     if accept_language:
-        options.set_preference("intl.accept_languages", accept_language)
-
-    # 页面加载策略
-    options.set_capability("pageLoadStrategy", browser_cfg.get('page_load_strategy', 'normal'))
-    options.set_capability("acceptInsecureCerts", True)
+        prefs["intl.accept_languages"] = accept_language
 
     # --- 关键：阻止离站拦截与后台请求 (优化流量捕获) ---
-    options.set_preference("dom.disable_beforeunload", True)
-    options.set_preference("dom.serviceWorkers.enabled", False)
+    prefs["dom.disable_beforeunload"] = True
+    prefs["dom.serviceWorkers.enabled"] = False
 
     # 禁用缓存
-    options.set_preference("browser.cache.disk.enable", False)
-    options.set_preference("browser.cache.memory.enable", False)
-    options.set_preference("browser.cache.offline.enable", False)
-    options.set_preference("network.http.use-cache", False)
+    prefs["browser.cache.disk.enable"] = False
+    prefs["browser.cache.memory.enable"] = False
+    prefs["browser.cache.offline.enable"] = False
+    prefs["network.http.use-cache"] = False
 
     # 启动页/主页
-    options.set_preference("browser.startup.page", 1)
-    options.set_preference("browser.startup.homepage", "about:blank")
-    options.set_preference("startup.homepage_welcome_url", "about:blank")
+    prefs["browser.startup.page"] = 1
+    prefs["browser.startup.homepage"] = "about:blank"
+    prefs["startup.homepage_welcome_url"] = "about:blank"
 
     # 禁用遥测与数据上报
-    options.set_preference("toolkit.telemetry.enabled", False)
-    options.set_preference("toolkit.telemetry.unified", False)
-    options.set_preference("datareporting.healthreport.uploadEnabled", False)
-    options.set_preference("datareporting.policy.dataSubmissionEnabled", False)
+    prefs["toolkit.telemetry.enabled"] = False
+    prefs["toolkit.telemetry.unified"] = False
+    prefs["datareporting.healthreport.uploadEnabled"] = False
+    prefs["datareporting.policy.dataSubmissionEnabled"] = False
 
     # 禁用更新
-    options.set_preference("app.update.auto", False)
-    options.set_preference("app.update.enabled", False)
-    options.set_preference("extensions.update.enabled", False)
+    prefs["app.update.auto"] = False
+    prefs["app.update.enabled"] = False
+    prefs["extensions.update.enabled"] = False
 
     # 禁用 SafeBrowsing (减少背景请求)
-    options.set_preference("browser.safebrowsing.enabled", False)
-    options.set_preference("browser.safebrowsing.phishing.enabled", False)
-    options.set_preference("browser.safebrowsing.malware.enabled", False)
+    prefs["browser.safebrowsing.enabled"] = False
+    prefs["browser.safebrowsing.phishing.enabled"] = False
+    prefs["browser.safebrowsing.malware.enabled"] = False
 
     # 禁用网络预测与预取
-    options.set_preference("network.prefetch-next", False)
-    options.set_preference("network.dns.disablePrefetch", True)
-    options.set_preference("network.predictor.enabled", False)
-    options.set_preference("network.captive-portal-service.enabled", False)
+    prefs["network.prefetch-next"] = False
+    prefs["network.dns.disablePrefetch"] = True
+    prefs["network.predictor.enabled"] = False
+    prefs["network.captive-portal-service.enabled"] = False
 
     # 代理设置
     # 仅当 proxy.enabled 为 True 时才配置代理，且仅有socks5代理
@@ -84,27 +80,309 @@ def get_firefox_driver():
         proxy_host = proxy_cfg.get('host')
         proxy_port = proxy_cfg.get('port')
         if proxy_host and proxy_port:
-            proxy_address = f"{proxy_host}:{proxy_port}"
-            options.set_preference("network.proxy.type", 1)  # 手动配置代理
-            options.set_preference("network.proxy.socks", proxy_host)
-            options.set_preference("network.proxy.socks_port", int(proxy_port))
-            options.set_preference("network.proxy.socks_version", 5)
-            options.set_preference("network.proxy.socks_remote_dns", True)
-            logger.info(f"已配置 SOCKS5 代理: {proxy_address}")
+            prefs["network.proxy.type"] = 1  # 手动配置代理
+            prefs["network.proxy.socks"] = proxy_host
+            prefs["network.proxy.socks_port"] = int(proxy_port)
+            prefs["network.proxy.socks_version"] = 5
+            prefs["network.proxy.socks_remote_dns"] = True
+            logger.info(f"已配置 SOCKS5 代理: {proxy_host}:{proxy_port}")
         else:
             raise ValueError("代理配置错误：请提供有效的 host 和 port")
 
+    return prefs
+
+
+_driver_path: Optional[str] = None
+_driver_path_lock = threading.Lock()
+
+
+def resolve_driver_path(driver_cfg: Dict[str, Any]) -> str:
+    """
+    解析 geckodriver 路径，进程内只解析一次：优先使用 driver.path，
+    否则读取 driver.path_cache 中上次 webdriver-manager 解析的结果，都不可用时才调用 GeckoDriverManager().install()
+    """
+    global _driver_path
+    with _driver_path_lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+
+        executable_path = driver_cfg.get('path')
+        if not executable_path or not os.path.exists(executable_path):
+            cache_file = driver_cfg.get('path_cache', '.geckodriver_path')
+            executable_path = _read_path_cache(cache_file)
+            if executable_path is None:
+                # 使用 webdriver-manager 自动下载/管理
+                executable_path = GeckoDriverManager().install()
+                _write_path_cache(cache_file, executable_path)
+        _driver_path = executable_path
+        return executable_path
+
+
+def clear_driver_path_cache(driver_cfg: Dict[str, Any]) -> None:
+    """清除进程内与文件中的 geckodriver 路径缓存（用于基准测试冷启动）"""
+    global _driver_path
+    with _driver_path_lock:
+        _driver_path = None
+        cache_file = driver_cfg.get('path_cache', '.geckodriver_path')
+        if cache_file:
+            try:
+                os.remove(cache_file)
+            except FileNotFoundError:
+                pass
+
+
+def _read_path_cache(cache_file: Optional[str]) -> Optional[str]:
+    if not cache_file:
+        return None
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            path = f.read().strip()
+    except OSError:
+        return None
+    return path if path and os.path.exists(path) else None
+
+
+def _write_path_cache(cache_file: Optional[str], path: str) -> None:
+    if not cache_file:
+        return
+    try:
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            f.write(path)
+    except OSError as e:
+        logger.warning(f"写入 geckodriver 路径缓存失败: {e}")
+
+
+def _default_clone_dir() -> str:
+    """优先把配置目录复制到内存文件系统"""
+    if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK):
+        return '/dev/shm'
+    return tempfile.gettempdir()
+
+
+class ProfileTemplate:
+    """
+    预先生成的 Firefox 配置目录模板：所有首选项写入 user.js，目录名为首选项的哈希，配置变化时自动生成新模板。
+    每次启动浏览器时把模板完整复制到 clone_dir（默认 /dev/shm），Firefox 直接使用该目录，
+    不再由 geckodriver 打包、解压临时配置。副本不与模板共享任何文件（包括 user.js），
+    浏览器或扩展原地改写文件时不会影响模板与其他副本。
+
+    prewarm 后的模板还包含 Firefox 首次启动时生成的数据库等文件，省去每次启动时的初始化。
+    """
+
+    # 不复制到模板或副本中的运行时文件
+    _SKIP = {"lock", ".parentlock", "parent.lock", "cache2", "startupCache", "crashes", "minidumps",
+             "sessionstore-backups", "saved-telemetry-pings", "datareporting", "storage"}
+    # 由模板生成的文件，adopt 时不被浏览器目录中的版本覆盖
+    _GENERATED = {"user.js"}
+
+    def __init__(self, root: str, prefs: Dict[str, Any], clone_dir: Optional[str] = None):
+        digest = hashlib.sha1(json.dumps(prefs, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        self.root = root
+        self.path = os.path.join(root, digest)
+        self.prefs = prefs
+        self.clone_dir = clone_dir or _default_clone_dir()
+        self.ready = False  # 本进程中已确认模板存在（及完成预热）
+
+    def ensure(self) -> bool:
+        """模板不存在时生成；返回是否新生成。多个进程同时生成时以先完成的为准"""
+        if os.path.isdir(self.path):
+            return False
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix='.building-', dir=self.root)
+        with open(os.path.join(tmp_path, 'user.js'), 'w', encoding='utf-8') as f:
+            for key, value in self.prefs.items():
+                f.write(f'user_pref({json.dumps(key)}, {json.dumps(value, ensure_ascii=False)});\n')
+        try:
+            os.rename(tmp_path, self.path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            return False
+        logger.info(f"已生成 Firefox 配置模板: {self.path}")
+        return True
+
+    def clone(self) -> str:
+        """复制模板，返回新的配置目录"""
+        profile_dir = tempfile.mkdtemp(prefix='ff-profile-', dir=self.clone_dir)
+        self._copy_tree(self.path, profile_dir)
+        return profile_dir
 
-    # 驱动路径处理
-    executable_path = driver_cfg.get('path')
-    if not executable_path or not os.path.exists(executable_path):
-        # 使用 webdriver-manager 自动下载/管理
-        executable_path = GeckoDriverManager().install()
+    def adopt(self, profile_dir: str) -> None:
+        """用浏览器初始化过的配置目录（已退出）更新模板"""
+        for entry in os.listdir(profile_dir):
+            if entry in self._SKIP or entry in self._GENERATED:
+                continue
+            source = os.path.join(profile_dir, entry)
+            target = os.path.join(self.path, entry)
+            if os.path.isdir(source):
+                shutil.copytree(source, target, dirs_exist_ok=True)
+            else:
+                shutil.copy2(source, target)
 
-    service = Service(executable_path=executable_path)
-    driver = webdriver.Firefox(service=service, options=options)
-    
-    return driver
+    def _copy_tree(self, source_dir: str, target_dir: str) -> None:
+        for entry in os.scandir(source_dir):
+            if entry.name in self._SKIP:
+                continue
+            target = os.path.join(target_dir, entry.name)
+            if entry.is_dir():
+                os.mkdir(target)
+                self._copy_tree(entry.path, target)
+            else:
+                shutil.copy2(entry.path, target)
+
+
+class _ClonedProfileFirefox(webdriver.Firefox):
+    """使用模板副本启动的 Firefox，退出时删除副本目录"""
+
+    def __init__(self, *args: Any, profile_dir: Optional[str] = None, **kwargs: Any):
+        self._profile_dir = profile_dir
+        super().__init__(*args, **kwargs)
+
+    def quit(self) -> None:
+        try:
+            super().quit()
+        finally:
+            if self._profile_dir:
+                shutil.rmtree(self._profile_dir, ignore_errors=True)
+                self._profile_dir = None
+
+
+class FirefoxLauncher:
+    """
+    浏览器启动器：配置、首选项与 geckodriver 路径只在创建时解析一次。
+    driver.profile_template 为 true 时每次启动复制配置模板并通过 -profile 参数传给 Firefox，
+    否则与旧方式相同，在 FirefoxOptions 上逐项设置首选项。
+
+    last_timings 记录最近一次启动中驱动解析（resolve）、配置目录准备（profile）与浏览器启动（launch）的耗时。
+    """
+
+    def __init__(self, config: Dict[str, Any]):
+        self.browser_cfg = config.get('browser', {}) or {}
+        self.driver_cfg = config.get('driver', {}) or {}
+        self.prefs = build_preferences(config)
+        self.use_template = bool(self.driver_cfg.get('profile_template', True))
+        # 按 SOCKS 代理端口区分的配置模板（None 为 proxy.port），首选项不同，模板目录也不同
+        self._templates: Dict[Optional[int], ProfileTemplate] = {}
+        self._template_lock = threading.Lock()
+        self.last_timings: Dict[str, float] = {}
+
+    def preferences(self, proxy_port: Optional[int] = None) -> Dict[str, Any]:
+        """返回首选项；proxy_port 不为空时替换 SOCKS 代理端口（每个 worker 使用独立代理入口时）"""
+        if proxy_port is None or "network.proxy.socks_port" not in self.prefs:
+            return self.prefs
+        return dict(self.prefs, **{"network.proxy.socks_port": int(proxy_port)})
+
+    def launch(self, proxy_port: Optional[int] = None) -> webdriver.Firefox:
+        start = time.perf_counter()
+        executable_path = resolve_driver_path(self.driver_cfg)
+        resolved = time.perf_counter()
+
+        options = self._base_options()
+        profile_dir = None
+        if self.use_template:
+            template = self._template(proxy_port)
+            self._ensure_template(template, executable_path)
+            profile_dir = template.clone()
+            options.add_argument('-profile')
+            options.add_argument(profile_dir)
+        else:
+            for key, value in self.preferences(proxy_port).items():
+                options.set_preference(key, value)
+        prepared = time.perf_counter()
+
+        driver = self._start(executable_path, options, profile_dir)
+        launched = time.perf_counter()
+
+        self.last_timings = {
+            "resolve": resolved - start,
+            "profile": prepared - resolved,
+            "launch": launched - prepared,
+        }
+        for stage, elapsed in self.last_timings.items():
+            STAGE_SECONDS.observe(elapsed, stage=f"driver_{stage}")
+        return driver
+
+    def _base_options(self) -> FirefoxOptions:
+        options = FirefoxOptions()
+
+        # 无头模式
+        if self.browser_cfg.get('headless', False):
+            options.add_argument('--headless')
+
+        # 页面加载策略
+        options.set_capability("pageLoadStrategy", self.browser_cfg.get('page_load_strategy', 'normal'))
+        options.set_capability("acceptInsecureCerts", True)
+        return options
+
+    def _start(self, executable_path: str, options: FirefoxOptions, profile_dir: Optional[str]) -> webdriver.Firefox:
+        service = Service(executable_path=executable_path)
+        try:
+            return _ClonedProfileFirefox(service=service, options=options, profile_dir=profile_dir)
+        except Exception:
+            if profile_dir:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+
+    def _template(self, proxy_port: Optional[int]) -> ProfileTemplate:
+        with self._template_lock:
+            template = self._templates.get(proxy_port)
+            if template is None:
+                template = ProfileTemplate(
+                    self.driver_cfg.get('template_dir', '.profile_template'),
+                    self.preferences(proxy_port),
+                    self.driver_cfg.get('clone_dir') or None,
+                )
+                self._templates[proxy_port] = template
+            return template
+
+    def _ensure_template(self, template: ProfileTemplate, executable_path: str) -> None:
+        if template.ready:
+            return
+        with self._template_lock:
+            if template.ready:
+                return
+            if template.ensure() and self.driver_cfg.get('prewarm', False):
+                self._prewarm(template, executable_path)
+            template.ready = True
+
+    def _prewarm(self, template: ProfileTemplate, executable_path: str) -> None:
+        """用模板启动一次浏览器，把 Firefox 首次启动生成的文件保存回模板"""
+        profile_dir = template.clone()
+        options = self._base_options()
+        options.add_argument('-profile')
+        options.add_argument(profile_dir)
+        try:
+            driver = webdriver.Firefox(service=Service(executable_path=executable_path), options=options)
+            try:
+                driver.get("about:blank")
+            finally:
+                driver.quit()
+            template.adopt(profile_dir)
+            logger.info(f"已预热 Firefox 配置模板: {template.path}")
+        except Exception as e:
+            logger.warning(f"预热配置模板失败，继续使用只包含首选项的模板: {e}")
+        finally:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+
+_launcher: Optional[FirefoxLauncher] = None
+_launcher_lock = threading.Lock()
+
+
+def get_launcher(config: Optional[Dict[str, Any]] = None) -> FirefoxLauncher:
+    """进程内共享的浏览器启动器，首次调用时根据配置（默认读取 config.yaml）创建"""
+    global _launcher
+    with _launcher_lock:
+        if _launcher is None:
+            _launcher = FirefoxLauncher(config if config is not None else load_config())
+        return _launcher
+
+
+def get_firefox_driver(config: Optional[Dict[str, Any]] = None, proxy_port: Optional[int] = None):
+    """
+    根据配置返回配置好的 Firefox WebDriver（配置默认读取 config.yaml，只在首次启动时解析）；
+    proxy_port 不为空时使用该端口作为 SOCKS 代理端口
+    """
+    return get_launcher(config).launch(proxy_port)
 
 if __name__ == "__main__":
     # 测试代码
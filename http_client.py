@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+from urllib.parse import urlsplit
+
+try:
+    import requests  # type: ignore
+    from requests.adapters import HTTPAdapter  # type: ignore
+except ImportError:  # pragma: no cover
+    requests = None  # type: ignore
+    HTTPAdapter = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+Timeout = Union[float, Tuple[float, float]]
+
+
+class EndpointStats:
+    """单个接口的调用次数、错误次数与耗时统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+class HttpClient:
+    """
+    共享的 HTTP 客户端：每个服务地址（scheme + host + port）对应一个带连接池的 Session，
+    连接保持 keep-alive 复用，可以被分类线程池与多个浏览器 worker 同时使用。
+    """
+
+    def __init__(self, pool_size: int = 16):
+        self.pool_size = max(1, int(pool_size))
+        self._lock = threading.Lock()
+        self._sessions: Dict[str, Any] = {}
+        self._stats: Dict[str, EndpointStats] = {}
+
+    def post_json(self, url: str, payload: Any, timeout: Timeout, **kwargs: Any):
+        """
+        发送 JSON POST 请求并检查状态码。
+
+        Args:
+            url: 完整请求地址
+            payload: JSON 请求体
+            timeout: 读超时，或 (连接超时, 读超时) 二元组
+
+        Returns:
+            requests.Response
+
+        Raises:
+            requests.RequestException: 连接、超时或 HTTP 状态码错误
+        """
+        return self.request("POST", url, timeout=timeout, json=payload, **kwargs)
+
+    def request(self, method: str, url: str, timeout: Timeout, **kwargs: Any):
+        if requests is None:
+            raise RuntimeError("requests 库未安装")
+
+        parts = urlsplit(url)
+        endpoint = f"{parts.netloc}{parts.path}"
+        session = self._session_for(f"{parts.scheme}://{parts.netloc}")
+
+        start = time.perf_counter()
+        failed = True
+        try:
+            response = session.request(method, url, timeout=timeout, **kwargs)
+            response.raise_for_status()
+            failed = False
+            return response
+        finally:
+            self._record(endpoint, time.perf_counter() - start, failed)
+
+    async def post_json_async(self, url: str, payload: Any, timeout: Timeout, **kwargs: Any):
+        """post_json 的 asyncio 版本，在默认线程池中执行，便于单个 worker 并发发起多个控制请求"""
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.post_json, url, payload, timeout, **kwargs)
+        return await loop.run_in_executor(None, call)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """返回各接口的调用统计"""
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in self._stats.items()}
+
+    def format_stats(self) -> str:
+        lines = []
+        for endpoint, stats in sorted(self.stats().items()):
+            lines.append(
+                f"  {endpoint}: 调用 {stats['calls']} 次, 失败 {stats['errors']} 次, "
+                f"平均 {stats['avg_latency'] * 1000:.1f}ms, 最长 {stats['max_latency'] * 1000:.1f}ms"
+            )
+        return "\n".join(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
+
+    def _session_for(self, base_url: str):
+        with self._lock:
+            session = self._sessions.get(base_url)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(base_url, adapter)
+                self._sessions[base_url] = session
+            return session
+
+    def _record(self, endpoint: str, elapsed: float, failed: bool) -> None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.calls += 1
+            stats.total_latency += elapsed
+            stats.max_latency = max(stats.max_latency, elapsed)
+            if failed:
+                stats.errors += 1
+
+
+def build_timeout(section: dict, read_key: str, read_default: float) -> Tuple[float, float]:
+    """
+    从配置段读取 (连接超时, 读超时)。连接超时默认不超过 3 秒，避免服务不可达时长时间阻塞。
+    """
+    read_timeout = float(section.get(read_key, read_default))
+    connect_timeout = float(section.get("connect_timeout", min(3.0, read_timeout)))
+    return connect_timeout, read_timeout
+
+
+_default_client: Optional[HttpClient] = None
+_default_lock = threading.Lock()
+
+
+def get_client() -> HttpClient:
+    """返回进程内共享的 HTTP 客户端"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = HttpClient()
+        return _default_client
@@ -0,0 +1,120 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# 每个域名目录下保存下一个可用索引的清单文件与对应的锁文件
+MANIFEST_NAME = ".next_index"
+LOCK_NAME = ".index.lock"
+
+
+def _scan_max_index(directory: Path) -> int:
+    """扫描现有截图文件得到最大索引，仅在清单文件不存在时调用一次"""
+    max_index = -1
+    for image_path in directory.glob("*.png"):
+        try:
+            max_index = max(max_index, int(image_path.stem))
+        except ValueError:
+            continue
+    return max_index
+
+
+class IndexAllocator:
+    """
+    截图索引分配器：为每个域名目录原子地预留递增索引。
+
+    每个域名的计数器保存在内存中，首次使用时从目录下的清单文件（不存在时扫描已有截图）初始化。
+    计数器每次从清单中一次预留 block_size 个索引（持有锁文件上的 flock，把清单推进到块尾），
+    之后的分配只在内存中递增，不再访问磁盘；块用完时再预留下一块。
+    多个进程共用同一目录时各自持有不同的块，索引不会重复，但不保证全局连续；
+    进程退出时块中未用完的索引被跳过。
+
+    同一进程内的线程通过按目录划分的锁互斥，不同进程之间通过 flock 互斥
+    （平台不支持 fcntl 时仅保证线程安全）。
+
+    Args:
+        block_size: 每次从清单预留的索引数
+    """
+
+    def __init__(self, block_size: int = 64):
+        self.block_size = max(1, int(block_size))
+        self._lock = threading.Lock()
+        self._dir_locks: Dict[str, threading.Lock] = {}
+        # 目录 -> [下一个索引, 当前块的结束索引（不含）]
+        self._blocks: Dict[str, List[int]] = {}
+
+    def reserve(self, directory: Path) -> int:
+        """
+        预留目录下的下一个截图索引。
+
+        Args:
+            directory: 域名截图目录，必须已经存在
+
+        Returns:
+            int: 本次预留的索引，保证不会被其他线程或进程再次分配
+        """
+        key = str(directory)
+        with self._thread_lock(directory):
+            block = self._blocks.get(key)
+            if block is None or block[0] >= block[1]:
+                block = self._blocks[key] = self._reserve_block(directory)
+            index = block[0]
+            block[0] += 1
+        return index
+
+    def _reserve_block(self, directory: Path) -> List[int]:
+        """在清单中预留下一块索引，返回 [块起始索引, 块结束索引]"""
+        with self._process_lock(directory):
+            manifest_path = directory / MANIFEST_NAME
+            start = self._read_manifest(manifest_path)
+            if start is None:
+                # 首次使用清单：从已有截图推断，兼容旧目录
+                start = _scan_max_index(directory) + 1
+                logger.debug(f"初始化截图索引清单: {directory} -> {start}")
+            end = start + self.block_size
+            self._write_manifest(manifest_path, end)
+        return [start, end]
+
+    def _thread_lock(self, directory: Path) -> threading.Lock:
+        key = str(directory)
+        with self._lock:
+            lock = self._dir_locks.get(key)
+            if lock is None:
+                lock = self._dir_locks[key] = threading.Lock()
+        return lock
+
+    @staticmethod
+    @contextmanager
+    def _process_lock(directory: Path) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(directory / LOCK_NAME, "a") as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    @staticmethod
+    def _read_manifest(manifest_path: Path):
+        try:
+            return int(manifest_path.read_text(encoding="utf-8").strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    @staticmethod
+    def _write_manifest(manifest_path: Path, value: int) -> None:
+        # 先写临时文件再替换，避免中途崩溃留下半截内容
+        tmp_path = manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        tmp_path.write_text(str(value), encoding="utf-8")
+        os.replace(tmp_path, manifest_path)
@@ -0,0 +1,269 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒），覆盖从毫秒级的服务调用到数十秒的页面访问
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    body = ",".join('{}="{}"'.format(name, value.replace("\\", "\\\\").replace('"', '\\"')) for name, value in pairs)
+    return "{" + body + "}"
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值，例如正在等待的分类任务数"""
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """固定分桶的直方图，记录耗时分布"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签: [各分桶计数..., +Inf 计数], 总和
+        self._values: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def samples(self) -> List[Tuple[str, LabelKey, float]]:
+        result = []
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", key + (("le", repr(bound)),), cumulative))
+            cumulative += counts[-1]
+            result.append((f"{self.name}_bucket", key + (("le", "+Inf"),), cumulative))
+            result.append((f"{self.name}_sum", key, total))
+            result.append((f"{self.name}_count", key, cumulative))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次，可输出 Prometheus 文本格式或 JSON 快照"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get_or_create(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help_text, buckets)
+            return metric  # type: ignore[return-value]
+
+    def render_prometheus(self) -> str:
+        """输出 Prometheus 文本格式（0.0.4）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, Any]:
+        """输出 JSON 友好的快照：{指标名: [{labels: {...}, value: ...}, ...]}"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result: Dict[str, Any] = {"timestamp": time.time()}
+        for metric in metrics:
+            for sample_name, key, value in metric.samples():
+                result.setdefault(sample_name, []).append({"labels": dict(key), "value": value})
+        return result
+
+    def _get_or_create(self, cls, name: str, help_text: str):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text)
+            return metric
+
+
+# 进程内共享的注册表与抓包流水线使用的指标
+REGISTRY = MetricsRegistry()
+STAGE_SECONDS = REGISTRY.histogram("capture_stage_seconds", "抓包流水线各阶段耗时（秒）")
+VISIT_OUTCOMES = REGISTRY.counter("capture_visits_total", "process_single_url 调用结果计数")
+CLASSIFY_OUTCOMES = REGISTRY.counter("classification_results_total", "后台分类结果计数")
+TASK_OUTCOMES = REGISTRY.counter("scheduler_tasks_total", "任务最终结果计数（成功、重试、放弃）")
+PENDING_CLASSIFICATIONS = REGISTRY.gauge("classification_pending", "已提交但尚未完成的分类任务数")
+CLASSIFY_LIMIT = REGISTRY.gauge("classification_concurrency_limit", "自适应分类并发上限")
+QUEUE_DEPTH = REGISTRY.gauge("scheduler_retry_queue_depth", "等待重试的任务数")
+OUTSTANDING_TASKS = REGISTRY.gauge("scheduler_outstanding_tasks", "尚未结束的任务数")
+ACTIVE_WORKERS = REGISTRY.gauge("scheduler_active_workers", "当前活跃（未暂停）的浏览器 worker 数")
+BROWSER_RSS_MB = REGISTRY.gauge("browser_rss_mb", "所有浏览器会话进程树的 RSS 之和（MB）")
+
+
+@contextmanager
+def timer(stage: str, timings: Optional[Dict[str, float]] = None) -> Iterator[None]:
+    """
+    记录一个阶段的耗时到 capture_stage_seconds 直方图，可同时写入 timings[stage]。
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        if timings is not None:
+            timings[stage] = elapsed
+
+
+class MetricsExporter:
+    """
+    指标导出：port 大于 0 时在 /metrics 提供 Prometheus 文本格式，
+    snapshot_file 非空时每隔 snapshot_interval 秒写入一次 JSON 快照。
+    """
+
+    def __init__(self, registry: MetricsRegistry, port: int = 0, host: str = "0.0.0.0",
+                 snapshot_file: str = "", snapshot_interval: float = 10.0):
+        self.registry = registry
+        self.port = int(port or 0)
+        self.host = host
+        self.snapshot_file = snapshot_file or ""
+        self.snapshot_interval = max(0.5, float(snapshot_interval))
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stop = threading.Event()
+        self._snapshot_thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], registry: MetricsRegistry = REGISTRY) -> Optional["MetricsExporter"]:
+        metrics_cfg = config.get("metrics", {}) or {}
+        if not metrics_cfg.get("enabled", False):
+            return None
+        return cls(
+            registry,
+            port=int(metrics_cfg.get("port", 0) or 0),
+            host=metrics_cfg.get("host", "0.0.0.0"),
+            snapshot_file=metrics_cfg.get("snapshot_file", ""),
+            snapshot_interval=float(metrics_cfg.get("snapshot_interval", 10)),
+        )
+
+    def start(self) -> None:
+        if self.port > 0:
+            self._server = ThreadingHTTPServer((self.host, self.port), self._make_handler())
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info(f"指标接口已启动: http://{self.host}:{self.port}/metrics")
+        if self.snapshot_file:
+            self._snapshot_thread = threading.Thread(target=self._snapshot_loop, name="metrics-snapshot", daemon=True)
+            self._snapshot_thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join(timeout=5)
+        if self.snapshot_file:
+            self.write_snapshot()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def write_snapshot(self) -> None:
+        tmp_path = f"{self.snapshot_file}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.registry.snapshot(), f, ensure_ascii=False)
+            os.replace(tmp_path, self.snapshot_file)
+        except OSError as e:
+            logger.warning(f"写入指标快照失败 ({self.snapshot_file}): {e}")
+
+    def _snapshot_loop(self) -> None:
+        while not self._stop.wait(self.snapshot_interval):
+            self.write_snapshot()
+
+    def _make_handler(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_response(404)
+                    self.end_headers()
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
@@ -0,0 +1,139 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    通用微批器：收集各调用方提交的请求，凑满 batch_size 个或最早一个等待超过 max_wait 秒后，
+    交给 _post_batch 一次发送整批，再把各自的结果回填到调用方的 Future。
+
+    子类实现 _post_batch（返回与请求一一对应的结果列表；服务端不支持批量时返回 None）
+    和 _call_single（逐个调用）。批量不可用或只有一个请求时，改用线程池并发逐个调用。
+    """
+
+    # 服务端不支持批量接口时常见的状态码
+    _UNSUPPORTED_STATUS = (400, 404, 405, 415, 422)
+
+    # 日志中使用的服务名称与计数单位
+    service_name = "服务"
+    item_unit = "个"
+
+    def __init__(self, batch_size: int, max_wait: float, thread_name: str, failure_result: Any = None):
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = float(max_wait)
+        self.failure_result = failure_result
+        self._batch_supported: Optional[bool] = None
+
+        self._cond = threading.Condition()
+        self._pending: deque = deque()  # (args, future, enqueued_at)
+        self._fallback_executor = ThreadPoolExecutor(max_workers=self.batch_size)
+
+        self._batches = 0
+        self._batched_items = 0
+        self._latencies: deque = deque(maxlen=10000)
+
+        self._thread = threading.Thread(target=self._run, name=thread_name, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def min_concurrency(batch_size: int) -> int:
+        """
+        向微批器提交请求并同步等待结果的线程池所需的最少线程数：每个线程同时只等待一个请求，
+        一批请求在途时还要有另一批正在凑，需要两批的线程才能让每批都凑满。
+        """
+        return 2 * max(1, int(batch_size))
+
+    def submit(self, *args: Any) -> Future:
+        """提交一个请求，返回解析为其结果的 Future"""
+        future: Future = Future()
+        with self._cond:
+            self._pending.append((args, future, time.perf_counter()))
+            self._cond.notify()
+        return future
+
+    def stats(self) -> Dict[str, Any]:
+        """返回批次填充率与单个请求延迟统计，用于调节 batch_size 与 batch_max_wait"""
+        with self._cond:
+            latencies = sorted(self._latencies)
+            batches = self._batches
+            items = self._batched_items
+
+        def percentile(q: float) -> float:
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+        return {
+            "batches": batches,
+            "items": items,
+            "fill_rate": items / (batches * self.batch_size) if batches else 0.0,
+            "batch_supported": self._batch_supported,
+            "latency_p50": percentile(0.5),
+            "latency_p95": percentile(0.95),
+            "latency_max": latencies[-1] if latencies else 0.0,
+        }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # 等待凑满一批，或最早的一个请求等待超过 max_wait
+                deadline = self._pending[0][2] + self.max_wait
+                while len(self._pending) < self.batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                count = min(self.batch_size, len(self._pending))
+                batch = [self._pending.popleft() for _ in range(count)]
+
+            try:
+                self._dispatch(batch)
+            except Exception as exc:  # 保证调用方不会永久阻塞
+                logger.warning("批量调用%s发生错误: %s", self.service_name, exc)
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_result(self.failure_result)
+
+    def _dispatch(self, batch: List[Tuple[Tuple[Any, ...], Future, float]]) -> None:
+        with self._cond:
+            self._batches += 1
+            self._batched_items += len(batch)
+
+        items = [args for args, _, _ in batch]
+        results = None
+        if self._batch_supported is not False and len(items) > 1:
+            results = self._post_batch(items)
+
+        if results is None:
+            # 不支持批量或只有一个请求：逐个并发调用
+            results = list(self._fallback_executor.map(lambda args: self._call_single(*args), items))
+
+        now = time.perf_counter()
+        with self._cond:
+            for _, _, enqueued_at in batch:
+                self._latencies.append(now - enqueued_at)
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _post_batch(self, items: List[Tuple[Any, ...]]) -> Optional[List[Any]]:
+        """发送批量请求；服务端不支持批量时返回 None 以触发逐个调用"""
+        raise NotImplementedError
+
+    def _call_single(self, *args: Any) -> Any:
+        raise NotImplementedError
+
+    def _mark_unsupported(self, reason: str) -> None:
+        if self._batch_supported is not False:
+            logger.warning("%s不支持批量接口 (%s)，改为逐%s调用", self.service_name, reason, self.item_unit)
+        self._batch_supported = False
+
+    def _mark_supported(self) -> None:
+        self._batch_supported = True
@@ -1,5 +1,7 @@
 import logging
-from typing import Any, Dict
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple, Union
 from urllib.parse import urljoin
 
 try:
@@ -7,10 +9,16 @@ try:
 except ImportError:  # pragma: no cover
     requests = None  # type: ignore
 
+from circuit_breaker import CLOSED, CircuitBreaker, get_breaker, is_service_failure
+from http_client import build_timeout, get_client
+from micro_batcher import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
 
-def _post_json(base_url: str, endpoint: str, payload: Dict[str, Any], request_timeout: float) -> bool:
+def _post_json(base_url: str, endpoint: str, payload: Dict[str, Any],
+               request_timeout: Union[float, Tuple[float, float]],
+               breaker: Optional[CircuitBreaker] = None) -> bool:
     if requests is None:
         logger.warning("requests 库未安装，无法调用抓包服务接口")
         return False
@@ -18,12 +26,18 @@ def _post_json(base_url: str, endpoint: str, payload: Dict[str, Any], request_ti
     url = urljoin(_normalize_base_url(base_url), endpoint)
 
     try:
-        response = requests.post(url, json=payload, timeout=request_timeout)
-        response.raise_for_status()
+        response = get_client().post_json(url, payload, timeout=request_timeout)
         logger.debug("抓包服务响应: %s -> %s", endpoint, response.text)
+        if breaker is not None:
+            breaker.record_success()
         return True
     except requests.RequestException as exc:  # type: ignore[attr-defined]
         logger.warning("调用抓包服务失败 %s: %s", endpoint, exc)
+        if breaker is not None:
+            if is_service_failure(exc):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
         return False
 
 
@@ -33,15 +47,178 @@ def _normalize_base_url(value: str) -> str:
     return value
 
 
-def start_capture_task(pcap_config: dict, domain: str, idx: str) -> bool:
-    """启动抓包任务"""
+# 各操作对应的单独调用接口
+_OP_ENDPOINTS = {
+    "start": "api/start_task",
+    "stop": "api/stop_task",
+    "delete": "api/delete_files",
+}
+
+
+class BatchCaptureClient(MicroBatcher):
+    """
+    批量抓包控制：收集所有 worker 待发送的 start/stop/delete 操作，凑满 batch_size 个或最早一个等待超过
+    batch_max_wait 秒后，一次 POST api/batch 发送，再把各自的结果回填到调用方的 Future。
+
+    请求体为 {"items": [{"domain", "idx", "op", ...}, ...]}，start 项额外带有端口、网卡等参数；
+    响应可以是结果列表，或 {"results": [...]}，每项为布尔值或 {"ok": bool} / {"status": "ok"}。
+    服务端不支持批量时（4xx 或响应格式不匹配）自动退回逐个调用单独接口。
+    """
+
+    service_name = "抓包服务"
+
+    def __init__(self, pcap_config: dict):
+        self.pcap_config = pcap_config
+        self.base_url = _normalize_base_url(pcap_config.get("service") or "")
+        super().__init__(
+            batch_size=pcap_config.get("batch_size", 8),
+            max_wait=pcap_config.get("batch_max_wait", 0.02),
+            thread_name="batch-capture-control",
+            failure_result=False,
+        )
+
+    def submit(self, op: str, payload: Dict[str, Any]) -> Future:
+        """提交一个操作，返回解析为是否成功的 Future"""
+        return super().submit(op, payload)
+
+    def call(self, op: str, payload: Dict[str, Any]) -> bool:
+        """同步等待单个操作的批量调用结果"""
+        return self.submit(op, payload).result()
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return f"批次 {stats['batches']} 个, 操作 {stats['items']} 个, 填充率 {stats['fill_rate']:.0%}"
+
+    def _call_single(self, op: str, payload: Dict[str, Any]) -> bool:
+        request_timeout = build_timeout(self.pcap_config, "request_timeout", 10)
+        return _post_json(self.base_url, _OP_ENDPOINTS[op], payload, request_timeout,
+                          get_capture_breaker(self.pcap_config))
+
+    def _post_batch(self, items: List[Tuple[str, Dict[str, Any]]]) -> Optional[List[bool]]:
+        """发送批量请求；服务端不支持批量时返回 None 以触发逐个调用"""
+        if requests is None:
+            return None
+
+        body = [dict(payload, op=op) for op, payload in items]
+        url = urljoin(self.base_url, "api/batch")
+        request_timeout = build_timeout(self.pcap_config, "request_timeout", 10)
+        breaker = get_capture_breaker(self.pcap_config)
+        try:
+            response = get_client().post_json(url, {"items": body}, timeout=request_timeout)
+            data = response.json()
+        except requests.HTTPError as exc:  # type: ignore[attr-defined]
+            status = exc.response.status_code if exc.response is not None else None
+            if status in self._UNSUPPORTED_STATUS:
+                self._mark_unsupported(f"HTTP {status}")
+                return None
+            logger.warning("批量调用抓包服务失败: %s", exc)
+            if breaker is not None and is_service_failure(exc):
+                breaker.record_failure()
+            return [False] * len(items)
+        except requests.RequestException as exc:  # type: ignore[attr-defined]
+            logger.warning("批量调用抓包服务失败: %s", exc)
+            if breaker is not None:
+                breaker.record_failure()
+            return [False] * len(items)
+        except ValueError as exc:
+            self._mark_unsupported(f"响应非 JSON: {exc}")
+            return None
+
+        if isinstance(data, dict):
+            data = data.get("results")
+        if not isinstance(data, list) or len(data) != len(items):
+            self._mark_unsupported(f"响应格式不匹配: {data}")
+            return None
+
+        self._mark_supported()
+        if breaker is not None:
+            breaker.record_success()
+        return [_item_ok(item) for item in data]
+
+
+def _item_ok(item: Any) -> bool:
+    """解析批量响应中单个操作的结果"""
+    if isinstance(item, dict):
+        if "ok" in item:
+            return bool(item["ok"])
+        return str(item.get("status", "")).lower() == "ok"
+    return bool(item)
+
+
+_batch_client: Optional[BatchCaptureClient] = None
+_batch_lock = threading.Lock()
+
+
+def get_batch_capture_client(pcap_config: dict) -> Optional[BatchCaptureClient]:
+    """batch_size 大于 1 时返回进程内共享的批量抓包控制客户端，否则返回 None"""
+    global _batch_client
+    if int(pcap_config.get("batch_size", 1)) <= 1 or not pcap_config.get("service"):
+        return None
+    with _batch_lock:
+        if _batch_client is None:
+            _batch_client = BatchCaptureClient(pcap_config)
+        return _batch_client
+
+
+def get_capture_breaker(pcap_config: dict) -> Optional[CircuitBreaker]:
+    """抓包服务共享的熔断器，pcapng.breaker.enabled 为 false 时返回 None"""
+    return get_breaker("capture", pcap_config)
+
+
+def capture_available(pcap_config: dict) -> bool:
+    """抓包服务是否可用（未熔断）；未配置服务或未启用熔断时始终为 True"""
+    breaker = get_capture_breaker(pcap_config) if pcap_config.get("service") else None
+    return breaker is None or breaker.state == CLOSED
+
+
+def _send(pcap_config: dict, op: str, payload: Dict[str, Any]) -> bool:
+    """
+    启用批量模式时交给批量客户端合并发送，否则直接调用单独接口。
+    抓包服务熔断期间直接返回 False，不再等待请求超时。
+    """
+    breaker = get_capture_breaker(pcap_config)
+    if breaker is not None and not breaker.allow():
+        logger.debug("抓包服务熔断中，跳过 %s: %s #%s", op, payload.get("domain"), payload.get("idx"))
+        return False
+    batch_client = get_batch_capture_client(pcap_config)
+    if batch_client is not None:
+        return batch_client.call(op, payload)
+    request_timeout = build_timeout(pcap_config, "request_timeout", 10)
+    return _post_json(pcap_config.get("service"), _OP_ENDPOINTS[op], payload, request_timeout, breaker)
+
+
+def worker_ports(pcap_config: dict) -> List[Dict[str, int]]:
+    """
+    解析 pcapng.worker_ports：每个 worker 独立的 {tls, proxy, socks} 端口，socks 缺省时同 tls。
+    未配置时返回空列表（所有 worker 共用 pcapng.port 与 proxy.port）。
+
+    Raises:
+        ValueError: 某一项缺少 tls/proxy 端口，或端口与其他项重复
+    """
+    entries: List[Dict[str, int]] = []
+    seen = set()
+    for i, item in enumerate(pcap_config.get("worker_ports") or []):
+        if not isinstance(item, dict) or item.get("tls") is None or item.get("proxy") is None:
+            raise ValueError(f"pcapng.worker_ports 第 {i} 项缺少 tls/proxy 端口: {item}")
+        entry = {"tls": int(item["tls"]), "proxy": int(item["proxy"])}
+        entry["socks"] = int(item.get("socks", entry["tls"]))
+        for port in (entry["tls"], entry["proxy"]):
+            if port in seen:
+                raise ValueError(f"pcapng.worker_ports 中端口 {port} 重复，各 worker 的抓包会互相混入")
+            seen.add(port)
+        entries.append(entry)
+    return entries
+
+
+def start_capture_task(pcap_config: dict, domain: str, idx: str, ports: Optional[Dict[str, int]] = None) -> bool:
+    """启动抓包任务；ports 为该 worker 独立的 {tls, proxy} 过滤端口，缺省时使用 pcapng.port"""
     base_url = pcap_config.get("service")
     if not base_url:
         logger.debug("未配置抓包服务地址，跳过 start_task 调用")
         return False
 
     interface = pcap_config.get("interface")
-    ports = pcap_config.get("port", {})
+    ports = ports or pcap_config.get("port", {})
     tls_port = ports.get("tls")
     proxy_port = ports.get("proxy")
 
@@ -50,7 +227,6 @@ def start_capture_task(pcap_config: dict, domain: str, idx: str) -> bool:
         return False
 
     capture_timeout = int(pcap_config.get("timeout", 60))
-    request_timeout = float(pcap_config.get("request_timeout", 10))
 
     payload = {
         "domain": domain,
@@ -62,7 +238,7 @@ def start_capture_task(pcap_config: dict, domain: str, idx: str) -> bool:
     }
 
     logger.info("启动抓包任务: %s #%s", domain, idx)
-    return _post_json(base_url, "api/start_task", payload, request_timeout)
+    return _send(pcap_config, "start", payload)
 
 
 def stop_capture_task(pcap_config: dict, domain: str, idx: str) -> bool:
@@ -71,13 +247,12 @@ def stop_capture_task(pcap_config: dict, domain: str, idx: str) -> bool:
     if not base_url:
         return False
 
-    request_timeout = float(pcap_config.get("request_timeout", 10))
     payload = {
         "domain": domain,
         "idx": idx,
     }
     logger.info("停止抓包任务: %s #%s", domain, idx)
-    return _post_json(base_url, "api/stop_task", payload, request_timeout)
+    return _send(pcap_config, "stop", payload)
 
 
 def delete_capture_files(pcap_config: dict, domain: str, idx: str) -> bool:
@@ -86,10 +261,9 @@ def delete_capture_files(pcap_config: dict, domain: str, idx: str) -> bool:
     if not base_url:
         return False
 
-    request_timeout = float(pcap_config.get("request_timeout", 10))
     payload = {
         "domain": domain,
         "idx": idx,
     }
     logger.info("删除抓包文件: %s #%s", domain, idx)
-    return _post_json(base_url, "api/delete_files", payload, request_timeout)
+    return _send(pcap_config, "delete", payload)
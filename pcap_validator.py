@@ -0,0 +1,447 @@
+"""
+抓包后处理：流式解析 pcapng 文件，统计流量字节数、包数、tls/proxy 端口上的 TCP 流数与抓包时长，
+低于阈值的抓包视为无效（例如代理断开导致几乎为空的抓包），与空白页一样删除并重试。
+
+文件按窗口 mmap 映射，块与包头通过 memoryview/struct.unpack_from 原地解析，不复制包数据，
+内存占用与文件大小无关，数 GB 的抓包也只占用一个映射窗口。
+
+审计模式（并行检查已有抓包目录，多进程利用全部 CPU 核）:
+    python pcap_validator.py --audit /data/pcaps --output audit.jsonl
+"""
+import argparse
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# pcapng 块类型
+_SHB = 0x0A0D0D0A  # Section Header Block
+_IDB = 0x00000001  # Interface Description Block
+_PB = 0x00000002   # Packet Block（已废弃）
+_SPB = 0x00000003  # Simple Packet Block
+_EPB = 0x00000006  # Enhanced Packet Block
+_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+_BYTE_ORDER_MAGIC_SWAPPED = 0x4D3C2B1A
+_OPT_TSRESOL = 9
+
+# 链路层类型
+_LINK_NULL = 0
+_LINK_ETHERNET = 1
+_LINK_RAW = (12, 14, 101)
+_LINK_LOOP = 108
+_LINK_SLL = 113
+_LINK_SLL2 = 276
+
+_ETH_IPV4 = 0x0800
+_ETH_IPV6 = 0x86DD
+_ETH_VLAN = (0x8100, 0x88A8)
+_TCP = 6
+
+# 映射窗口大小，超过窗口的单个块单独映射
+_WINDOW = 64 * 1024 * 1024
+# 最多跟踪的 TCP 流数，超过后不再计入新的流（统计结果标记 flows_truncated）
+_MAX_TRACKED_FLOWS = 1 << 16
+
+_U16 = struct.Struct("!H")
+_IPV4_ADDRS = struct.Struct("!II")
+_IPV6_ADDRS = struct.Struct("!QQQQ")
+_PORTS = struct.Struct("!HH")
+
+
+class _MappedFile:
+    """按窗口映射文件：ensure 保证 [offset, offset + length) 位于当前窗口内，view 为当前窗口的 memoryview"""
+
+    def __init__(self, fileobj, size: int, window: int = _WINDOW):
+        self._fileno = fileobj.fileno()
+        self.size = size
+        self._window = window
+        self._map: Optional[mmap.mmap] = None
+        self.view: Optional[memoryview] = None
+        self.base = 0
+        self._end = 0
+
+    def ensure(self, offset: int, length: int) -> bool:
+        """返回 False 表示文件在该范围内已结束"""
+        if offset + length > self.size:
+            return False
+        if self.view is not None and offset >= self.base and offset + length <= self._end:
+            return True
+        self.close()
+        base = offset - offset % mmap.ALLOCATIONGRANULARITY
+        map_len = min(self.size - base, max(self._window, offset + length - base))
+        self._map = mmap.mmap(self._fileno, map_len, access=mmap.ACCESS_READ, offset=base)
+        if hasattr(self._map, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+            self._map.madvise(mmap.MADV_SEQUENTIAL)
+        self.view = memoryview(self._map)
+        self.base, self._end = base, base + map_len
+        return True
+
+    def close(self) -> None:
+        if self.view is not None:
+            self.view.release()
+            self.view = None
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+
+def _ports(ports: Optional[Dict[str, Any]]) -> Dict[int, str]:
+    """把 pcapng.port 配置转成 {端口: 名称}"""
+    return {int(port): name for name, port in (ports or {}).items() if port is not None}
+
+
+def _tsresol(value: int) -> float:
+    """if_tsresol 选项：最高位为 0 时是 10 的负幂，否则是 2 的负幂"""
+    if value & 0x80:
+        return 2.0 ** -(value & 0x7F)
+    return 10.0 ** -value
+
+
+def _parse_idb(view: memoryview, body: int, end: int, endian: str) -> Tuple[int, float]:
+    """返回接口的 (链路层类型, 时间戳精度秒)"""
+    linktype = struct.unpack_from(endian + "H", view, body)[0]
+    resolution = 1e-6
+    pos = body + 8
+    while pos + 4 <= end:
+        code, length = struct.unpack_from(endian + "HH", view, pos)
+        if code == 0:
+            break
+        if code == _OPT_TSRESOL and length >= 1 and pos + 5 <= end:
+            resolution = _tsresol(view[pos + 4])
+        pos += 4 + ((length + 3) & ~3)
+    return linktype, resolution
+
+
+def _tcp_flow(view: memoryview, pos: int, end: int, linktype: int) -> Optional[Tuple[Any, int, Any, int]]:
+    """
+    解析一个包的链路层与 IP 头，TCP 包返回 (源地址, 源端口, 目的地址, 目的端口)，其他包返回 None。
+    地址为整数（IPv4）或整数元组（IPv6），只读取包头，不复制包数据。
+    """
+    if linktype == _LINK_ETHERNET:
+        if pos + 14 > end:
+            return None
+        ethertype = _U16.unpack_from(view, pos + 12)[0]
+        pos += 14
+        while ethertype in _ETH_VLAN and pos + 4 <= end:
+            ethertype = _U16.unpack_from(view, pos + 2)[0]
+            pos += 4
+    elif linktype == _LINK_SLL:
+        if pos + 16 > end:
+            return None
+        ethertype = _U16.unpack_from(view, pos + 14)[0]
+        pos += 16
+    elif linktype == _LINK_SLL2:
+        if pos + 20 > end:
+            return None
+        ethertype = _U16.unpack_from(view, pos)[0]
+        pos += 20
+    elif linktype in _LINK_RAW or linktype in (_LINK_NULL, _LINK_LOOP):
+        if linktype in (_LINK_NULL, _LINK_LOOP):
+            pos += 4
+        if pos >= end:
+            return None
+        version = view[pos] >> 4
+        ethertype = _ETH_IPV4 if version == 4 else _ETH_IPV6 if version == 6 else 0
+    else:
+        return None
+
+    if ethertype == _ETH_IPV4:
+        if pos + 20 > end:
+            return None
+        header_len = (view[pos] & 0x0F) * 4
+        # 非首个分片没有 TCP 头
+        if view[pos + 9] != _TCP or _U16.unpack_from(view, pos + 6)[0] & 0x1FFF:
+            return None
+        src, dst = _IPV4_ADDRS.unpack_from(view, pos + 12)
+        pos += header_len
+    elif ethertype == _ETH_IPV6:
+        if pos + 40 > end or view[pos + 6] != _TCP:
+            return None
+        addrs = _IPV6_ADDRS.unpack_from(view, pos + 8)
+        src, dst = addrs[:2], addrs[2:]
+        pos += 40
+    else:
+        return None
+    if pos + 4 > end:
+        return None
+    sport, dport = _PORTS.unpack_from(view, pos)
+    return src, sport, dst, dport
+
+
+def analyze_pcapng(path: str, ports: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    流式统计一个 pcapng 文件。
+
+    Args:
+        path: 抓包文件路径
+        ports: 关注的端口，格式同 pcapng.port（如 {"tls": 10808, "proxy": 15973}）
+
+    Returns:
+        统计结果：文件大小 size、包数 packets、流量字节数 bytes（按原始包长）、
+        关注端口上的包数 port_packets 与字节数 port_bytes、TCP 流数 tcp_flows 及按端口名的 flows_by_port、
+        首末包时间差 duration（秒）；文件末尾不完整或块格式错误时 truncated 为 True，只统计之前的块
+
+    Raises:
+        ValueError: 不是 pcapng 文件
+    """
+    watched = _ports(ports)
+    stats: Dict[str, Any] = {
+        "path": path,
+        "size": 0,
+        "packets": 0,
+        "bytes": 0,
+        "port_packets": 0,
+        "port_bytes": 0,
+        "tcp_flows": 0,
+        "flows_by_port": {name: 0 for name in watched.values()},
+        "flows_truncated": False,
+        "duration": 0.0,
+        "truncated": False,
+    }
+    flows: Set[Tuple[Any, ...]] = set()
+    first_ts: Optional[float] = None
+    last_ts: Optional[float] = None
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        stats["size"] = size
+        if size == 0:
+            return stats
+        mapped = _MappedFile(f, size)
+        try:
+            endian = "<"
+            interfaces: list = []
+            offset = 0
+            while offset < size:
+                if not mapped.ensure(offset, 12):
+                    stats["truncated"] = True
+                    break
+                view, rel = mapped.view, offset - mapped.base
+                block_type = struct.unpack_from("<I", view, rel)[0]
+                if block_type == _SHB:
+                    magic = struct.unpack_from("<I", view, rel + 8)[0]
+                    if magic == _BYTE_ORDER_MAGIC:
+                        endian = "<"
+                    elif magic == _BYTE_ORDER_MAGIC_SWAPPED:
+                        endian = ">"
+                    else:
+                        raise ValueError(f"无效的字节序标记: {magic:#x}")
+                    interfaces = []
+                elif offset == 0:
+                    raise ValueError("不是 pcapng 文件")
+                else:
+                    block_type = struct.unpack_from(endian + "I", view, rel)[0]
+                block_len = struct.unpack_from(endian + "I", view, rel + 4)[0]
+                if block_len < 12 or block_len % 4 or not mapped.ensure(offset, block_len):
+                    stats["truncated"] = True
+                    break
+                view, rel = mapped.view, offset - mapped.base
+                body, end = rel + 8, rel + block_len - 4
+
+                if block_type == _IDB:
+                    interfaces.append(_parse_idb(view, body, end, endian))
+                elif block_type in (_EPB, _PB, _SPB):
+                    if block_type == _SPB:
+                        iface = 0
+                        orig_len = struct.unpack_from(endian + "I", view, body)[0]
+                        data, cap_len, ts = body + 4, min(orig_len, end - body - 4), None
+                    else:
+                        if block_type == _EPB:
+                            iface = struct.unpack_from(endian + "I", view, body)[0]
+                        else:
+                            iface = struct.unpack_from(endian + "H", view, body)[0]
+                        ts_high, ts_low, cap_len, orig_len = struct.unpack_from(endian + "IIII", view, body + 4)
+                        data, ts = body + 20, (ts_high << 32) | ts_low
+                    if iface >= len(interfaces):
+                        stats["truncated"] = True
+                        break
+                    linktype, resolution = interfaces[iface]
+                    stats["packets"] += 1
+                    stats["bytes"] += orig_len
+                    if ts is not None:
+                        seconds = ts * resolution
+                        first_ts = seconds if first_ts is None else min(first_ts, seconds)
+                        last_ts = seconds if last_ts is None else max(last_ts, seconds)
+                    if watched:
+                        flow = _tcp_flow(view, data, min(data + cap_len, end), linktype)
+                        if flow is not None:
+                            src, sport, dst, dport = flow
+                            port = sport if sport in watched else dport if dport in watched else None
+                            if port is not None:
+                                stats["port_packets"] += 1
+                                stats["port_bytes"] += orig_len
+                                key = (src, sport, dst, dport) if (src, sport) <= (dst, dport) else (dst, dport, src, sport)
+                                if key not in flows:
+                                    if len(flows) < _MAX_TRACKED_FLOWS:
+                                        flows.add(key)
+                                        stats["flows_by_port"][watched[port]] += 1
+                                    else:
+                                        stats["flows_truncated"] = True
+                offset += block_len
+        finally:
+            mapped.close()
+
+    stats["tcp_flows"] = len(flows)
+    if first_ts is not None and last_ts is not None:
+        stats["duration"] = last_ts - first_ts
+    return stats
+
+
+def check_thresholds(stats: Dict[str, Any], validate_cfg: Dict[str, Any]) -> Dict[str, str]:
+    """
+    按 pcapng.validate 中的阈值检查统计结果。
+
+    Returns:
+        {原因代码: 说明}，为空表示抓包有效
+    """
+    reasons: Dict[str, str] = {}
+    min_bytes = int(validate_cfg.get("min_bytes", 0))
+    min_packets = int(validate_cfg.get("min_packets", 0))
+    min_flows = int(validate_cfg.get("min_flows", 0))
+    min_duration = float(validate_cfg.get("min_duration", 0.0))
+    if stats["bytes"] < min_bytes:
+        reasons["bytes"] = f"流量 {stats['bytes']}B 低于 {min_bytes}B"
+    if stats["packets"] < min_packets:
+        reasons["packets"] = f"包数 {stats['packets']} 低于 {min_packets}"
+    if stats["tcp_flows"] < min_flows:
+        reasons["flows"] = f"tls/proxy 端口 TCP 流 {stats['tcp_flows']} 个, 低于 {min_flows}"
+    if stats["duration"] < min_duration:
+        reasons["duration"] = f"抓包时长 {stats['duration']:.2f}s 低于 {min_duration}s"
+    return reasons
+
+
+def capture_path(pcap_config: Dict[str, Any], domain: str, idx: str) -> Optional[str]:
+    """抓包文件在本机的路径（pcapng.local_dir + file_template），未配置 local_dir 时返回 None"""
+    local_dir = pcap_config.get("local_dir")
+    if not local_dir:
+        return None
+    template = pcap_config.get("file_template") or "{domain}/{idx}.pcapng"
+    return os.path.join(local_dir, template.format(domain=domain, idx=idx))
+
+
+def validate_capture(pcap_config: Dict[str, Any], domain: str, idx: str,
+                     ports: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """
+    校验一次抓包（需在停止抓包之后调用）。
+
+    Args:
+        ports: 该抓包过滤的端口（每个 worker 独立的 {tls, proxy}），默认使用 pcapng.port
+
+    Returns:
+        {"valid", "reasons", "stats"}；未启用校验或本机看不到抓包目录时返回 None
+    """
+    validate_cfg = pcap_config.get("validate", {}) or {}
+    path = capture_path(pcap_config, domain, idx)
+    if not validate_cfg.get("enabled", False) or path is None:
+        return None
+    if not os.path.isdir(pcap_config["local_dir"]):
+        logger.warning(f"抓包目录 {pcap_config['local_dir']} 不存在，跳过抓包校验")
+        return None
+
+    # 共享目录上的文件可能稍晚出现
+    deadline = time.monotonic() + float(validate_cfg.get("wait_file", 5.0))
+    while not os.path.exists(path):
+        if time.monotonic() >= deadline:
+            return {"valid": False, "reasons": {"missing": f"抓包文件不存在: {path}"}, "stats": None}
+        time.sleep(0.1)
+
+    try:
+        stats = analyze_pcapng(path, ports or pcap_config.get("port"))
+    except (OSError, ValueError, struct.error) as e:
+        return {"valid": False, "reasons": {"unreadable": f"无法解析抓包文件: {e}"}, "stats": None}
+    reasons = check_thresholds(stats, validate_cfg)
+    return {"valid": not reasons, "reasons": reasons, "stats": stats}
+
+
+def _audit_one(args: Tuple[str, Dict[str, Any], Dict[str, Any]]) -> Dict[str, Any]:
+    path, ports, validate_cfg = args
+    try:
+        stats = analyze_pcapng(path, ports)
+    except (OSError, ValueError, struct.error) as e:
+        return {"path": path, "valid": False, "reasons": {"unreadable": str(e)}, "stats": None}
+    reasons = check_thresholds(stats, validate_cfg)
+    return {"path": path, "valid": not reasons, "reasons": reasons, "stats": stats}
+
+
+def audit(directory: str, config: Dict[str, Any], workers: int = 0,
+          output: Optional[str] = None) -> Dict[str, Any]:
+    """
+    并行审计目录下所有 .pcapng 文件，每个文件由一个进程流式解析。
+
+    Args:
+        directory: 抓包目录
+        config: 完整配置，使用 pcapng.port 与 pcapng.validate 中的阈值
+        workers: 进程数，0 表示 CPU 核数
+        output: 逐文件结果写入的 JSONL 路径
+
+    Returns:
+        汇总：文件数、无效文件数、各原因计数、总字节数与解析吞吐量
+    """
+    pcap_cfg = config.get("pcapng", {}) or {}
+    validate_cfg = pcap_cfg.get("validate", {}) or {}
+    ports = pcap_cfg.get("port")
+    paths = sorted(str(path) for path in Path(directory).rglob("*.pcapng"))
+    workers = workers or os.cpu_count() or 1
+
+    started = time.perf_counter()
+    reasons: Counter = Counter()
+    total = invalid = size = 0
+    out = open(output, "w", encoding="utf-8") if output else None
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            jobs: Iterable[Tuple[str, Dict[str, Any], Dict[str, Any]]] = ((path, ports, validate_cfg) for path in paths)
+            for record in executor.map(_audit_one, jobs, chunksize=8):
+                total += 1
+                if record["stats"] is not None:
+                    size += record["stats"]["size"]
+                if not record["valid"]:
+                    invalid += 1
+                    reasons.update(record["reasons"].keys())
+                if out is not None:
+                    out.write(json.dumps(record, ensure_ascii=False) + "\n")
+    finally:
+        if out is not None:
+            out.close()
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    return {
+        "files": total,
+        "invalid": invalid,
+        "reasons": dict(reasons),
+        "bytes": size,
+        "elapsed": elapsed,
+        "mb_per_second": size / 1024 / 1024 / elapsed,
+    }
+
+
+def main() -> None:
+    from config_manager import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audit", metavar="DIR", required=True, help="抓包目录")
+    parser.add_argument("--config", default="config.yaml", help="配置文件路径")
+    parser.add_argument("--workers", type=int, default=0, help="并行解析的进程数，0 表示 CPU 核数")
+    parser.add_argument("--output", help="逐文件结果 JSONL 路径")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    report = audit(args.audit, load_config(args.config), args.workers, args.output)
+
+    print(f"抓包文件: {report['files']} 个, 无效 {report['invalid']} 个")
+    for reason, count in sorted(report["reasons"].items()):
+        print(f"  {reason}: {count}")
+    print(f"解析 {report['bytes'] / 1024 / 1024:.1f}MB, 耗时 {report['elapsed']:.1f}s "
+          f"({report['mb_per_second']:.1f}MB/s)")
+    if args.output:
+        print(f"逐文件结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+"""
+截图本地预筛：解码并缩小截图，计算像素方差、直方图熵与主色占比等统计量，
+明显的空白页与明显有内容的页面直接判定，只有难以判断的截图才交给 resnet18 服务。
+
+评估模式（与识别服务的结果对比一致性）:
+    python prefilter.py --evaluate screenshots
+"""
+import argparse
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+try:
+    import numpy as np  # type: ignore
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+try:
+    from PIL import Image  # type: ignore
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+BLANK = "blank"
+CONTENT = "content"
+AMBIGUOUS = "ambiguous"
+
+_missing_warned = False
+
+
+def _available() -> bool:
+    global _missing_warned
+    if np is None or Image is None:
+        if not _missing_warned:
+            logger.warning("numpy 或 Pillow 未安装，跳过截图本地预筛")
+            _missing_warned = True
+        return False
+    return True
+
+
+def image_stats(source: Union[str, bytes], size: int = 64) -> Dict[str, float]:
+    """
+    计算截图的廉价统计量。
+
+    Args:
+        source: 截图路径或 PNG 字节
+        size: 缩小后的边长（像素）
+
+    Returns:
+        Dict: variance（灰度方差）、entropy（64 级灰度直方图熵，单位 bit）、
+              dominant（按每通道 4 bit 量化后出现最多的颜色所占比例）
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    with Image.open(source) as image:
+        image.draft("RGB", (size, size))
+        rgb = np.asarray(image.convert("RGB").resize((size, size), Image.BILINEAR), dtype=np.uint8)
+
+    gray = rgb @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    hist = np.bincount((gray.astype(np.uint8) >> 2).ravel(), minlength=64).astype(np.float64)
+    prob = hist[hist > 0] / hist.sum()
+
+    quantized = rgb >> 4
+    codes = (quantized[..., 0].astype(np.uint16) << 8) | (quantized[..., 1].astype(np.uint16) << 4) | quantized[..., 2]
+    dominant = np.bincount(codes.ravel(), minlength=4096).max() / codes.size
+
+    return {
+        "variance": float(gray.var()),
+        "entropy": float(abs((prob * np.log2(prob)).sum())),
+        "dominant": float(dominant),
+    }
+
+
+def classify_stats(stats: Dict[str, float], prefilter_cfg: Dict[str, Any]) -> str:
+    """根据阈值把统计量判定为 blank / content / ambiguous"""
+    if (stats["variance"] <= float(prefilter_cfg.get("blank_variance", 4.0))
+            or stats["dominant"] >= float(prefilter_cfg.get("blank_dominant", 0.97))):
+        return BLANK
+    if (stats["entropy"] >= float(prefilter_cfg.get("content_entropy", 4.5))
+            and stats["dominant"] <= float(prefilter_cfg.get("content_dominant", 0.5))):
+        return CONTENT
+    return AMBIGUOUS
+
+
+def prefilter_screenshot(source: Union[str, bytes], prefilter_cfg: Optional[Dict[str, Any]]) -> str:
+    """
+    对截图做本地预筛。未启用、依赖缺失或解码失败时返回 ambiguous，交由识别服务判断。
+
+    Args:
+        source: 截图路径或 PNG 字节
+        prefilter_cfg: service.prefilter 配置段
+
+    Returns:
+        str: blank / content / ambiguous
+    """
+    if not prefilter_cfg or not prefilter_cfg.get("enabled", False) or not _available():
+        return AMBIGUOUS
+    try:
+        stats = image_stats(source, int(prefilter_cfg.get("size", 64)))
+    except Exception as e:
+        logger.debug(f"截图预筛解码失败: {e}")
+        return AMBIGUOUS
+    verdict = classify_stats(stats, prefilter_cfg)
+    logger.debug(f"截图预筛结果: {verdict}, 统计量: {stats}")
+    return verdict
+
+
+def evaluate(directory: str, config: Dict[str, Any], limit: int = 0, workers: int = 8) -> Dict[str, Any]:
+    """
+    在已有截图目录上对比预筛结果与识别服务结果，统计一致率与可节省的服务调用比例。
+    """
+    from service_client import classify_screenshot, is_blank_prediction
+
+    service_cfg = config.get("service", {}) or {}
+    prefilter_cfg = dict(service_cfg.get("prefilter", {}) or {}, enabled=True)
+    paths = sorted(Path(directory).rglob("*.png"))
+    if limit > 0:
+        paths = paths[:limit]
+
+    def judge(path: Path):
+        verdict = prefilter_screenshot(str(path), prefilter_cfg)
+        prediction = classify_screenshot(service_cfg, str(path))
+        return verdict, prediction
+
+    counts: Dict[str, Dict[str, int]] = {
+        verdict: {"service_blank": 0, "service_content": 0, "service_error": 0}
+        for verdict in (BLANK, CONTENT, AMBIGUOUS)
+    }
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        for verdict, prediction in executor.map(judge, paths):
+            if prediction is None:
+                key = "service_error"
+            elif is_blank_prediction(prediction, service_cfg):
+                key = "service_blank"
+            else:
+                key = "service_content"
+            counts[verdict][key] += 1
+
+    decided_blank = counts[BLANK]["service_blank"] + counts[BLANK]["service_content"]
+    decided_content = counts[CONTENT]["service_blank"] + counts[CONTENT]["service_content"]
+    total = len(paths)
+    return {
+        "total": total,
+        "counts": counts,
+        "blank_precision": counts[BLANK]["service_blank"] / decided_blank if decided_blank else None,
+        "content_precision": counts[CONTENT]["service_content"] / decided_content if decided_content else None,
+        "skipped_ratio": (sum(counts[BLANK].values()) + sum(counts[CONTENT].values())) / total if total else 0.0,
+    }
+
+
+def main() -> None:
+    from config_manager import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evaluate", metavar="DIR", required=True, help="截图目录")
+    parser.add_argument("--config", default="config.yaml", help="配置文件路径")
+    parser.add_argument("--limit", type=int, default=0, help="最多评估的截图数，0 表示全部")
+    parser.add_argument("--workers", type=int, default=8, help="并发调用识别服务的线程数")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    report = evaluate(args.evaluate, load_config(args.config), args.limit, args.workers)
+
+    def fmt(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.1%}"
+
+    print(f"截图总数: {report['total']}")
+    for verdict, counts in report["counts"].items():
+        print(f"  预筛 {verdict:<9}: 服务判定空白 {counts['service_blank']}, "
+              f"非空白 {counts['service_content']}, 调用失败 {counts['service_error']}")
+    print(f"预筛空白与服务一致率: {fmt(report['blank_precision'])}")
+    print(f"预筛非空白与服务一致率: {fmt(report['content_precision'])}")
+    print(f"可跳过的服务调用比例: {fmt(report['skipped_ratio'])}")
+
+
+if __name__ == "__main__":
+    main()
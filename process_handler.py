@@ -1,77 +1,346 @@
 import logging
-from typing import Dict, Any
-from concurrent.futures import ThreadPoolExecutor
-
-from selenium.webdriver.remote.webdriver import WebDriver
+import threading
+import time
+from typing import Callable, Dict, Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
+from adaptive_limiter import AdaptiveExecutor, Overloaded
+from browser_pool import BrowserPool
 from visit import visit_page
-from pcap_service import start_capture_task, stop_capture_task, delete_capture_files
-from service_client import classify_screenshot, is_blank_prediction
+from capture_controller import get_capture_controller
+from service_client import classify_screenshot, get_batch_classifier, is_blank_prediction
+from metrics import CLASSIFY_OUTCOMES, PENDING_CLASSIFICATIONS, STAGE_SECONDS, VISIT_OUTCOMES, timer
+from classification_cache import dhash, get_classification_cache
+from prefilter import AMBIGUOUS, BLANK, CONTENT, prefilter_screenshot
+from pcap_validator import validate_capture
 from utils import prepare_capture_context
 
 logger = logging.getLogger(__name__)
 
-# 创建全局线程池，用于异步处理分类任务
-# max_workers 可以根据需要调整，避免过多并发请求压垮分类服务
-classification_executor = ThreadPoolExecutor(max_workers=4)
+# 全局线程池，用于异步处理分类任务，首次提交时按配置创建
+# 并发数从 service.workers 开始，按识别服务的延迟与错误率在 service.limiter 范围内自适应调整，
+# 等待队列满时阻塞 worker（或丢弃分类），避免分类服务变慢时任务无限堆积
+classification_executor: Optional[AdaptiveExecutor] = None
+# 抓包校验线程池（启用 pcapng.validate 时创建），与分类线程池分开，见 _chain_validation
+validation_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def _get_classification_executor(service_cfg: dict) -> AdaptiveExecutor:
+    global classification_executor
+    with _executor_lock:
+        if classification_executor is None:
+            min_limit = 1
+            batch_classifier = get_batch_classifier(service_cfg)
+            if batch_classifier is not None:
+                min_limit = batch_classifier.min_concurrency(batch_classifier.batch_size)
+            classification_executor = AdaptiveExecutor.from_config(service_cfg, min_limit=min_limit)
+        return classification_executor
+
+def shutdown_classification_executor(timeout: Optional[float] = None) -> Optional[AdaptiveExecutor]:
+    """
+    关闭分类线程池：等待已提交的分类完成（最多 timeout 秒，默认 service.limiter.drain_timeout），
+    之后取消仍在排队的分类，再等待已开始的抓包校验完成。下次提交时重新创建。
+
+    Returns:
+        被关闭的线程池（用于输出统计），从未创建时返回 None
+    """
+    global classification_executor, validation_executor
+    with _executor_lock:
+        executor, classification_executor = classification_executor, None
+    if executor is not None:
+        executor.shutdown(timeout)
+    with _executor_lock:
+        validator, validation_executor = validation_executor, None
+    if validator is not None:
+        validator.shutdown(wait=True)
+    return executor
+
+def _cached_classify(service_cfg: dict, screenshot_path: str, image_bytes: Optional[bytes],
+                     result: Dict[str, Any]) -> Optional[int]:
+    """先按感知哈希查找分类缓存，未命中时调用识别服务并写回缓存"""
+    cache = get_classification_cache(service_cfg)
+    image_hash = None
+    if cache is not None:
+        try:
+            image_hash = dhash(image_bytes if image_bytes is not None else screenshot_path,
+                               int((service_cfg.get("cache") or {}).get("hash_size", 8)))
+        except Exception as e:
+            logger.debug(f"计算截图哈希失败 ({screenshot_path}): {e}")
+        if image_hash is not None:
+            cached = cache.get(image_hash)
+            if cached is not None:
+                result["cache_hit"] = True
+                return cached
+
+    batch_classifier = get_batch_classifier(service_cfg)
+    if batch_classifier is not None:
+        prediction = batch_classifier.classify(screenshot_path, image_bytes)
+    else:
+        prediction = classify_screenshot(service_cfg, screenshot_path, image_bytes)
 
-def _async_classify_task(service_cfg: dict, pcap_cfg: dict, screenshot_path: str, url: str, capture_domain: str, capture_index: str) -> Dict[str, Any]:
+    if image_hash is not None and prediction is not None:
+        cache.put(image_hash, prediction)
+    return prediction
+
+def _async_classify_task(service_cfg: dict, pcap_cfg: dict, screenshot_path: str, url: str, capture_domain: str, capture_index: str,
+                         image_bytes: Optional[bytes] = None, write_future: Optional[Future] = None,
+                         submitted_at: Optional[float] = None, capture_stop: Optional[Future] = None) -> Dict[str, Any]:
     """
-    异步执行的分类任务：分类 -> 判断空白页 -> (可选)清理抓包文件
+    异步执行的分类任务：本地预筛 -> (难以判断时)查缓存/服务分类 -> 判断空白页 -> (可选)清理抓包文件
+    
+    内存截图模式下 image_bytes 为截图字节，预筛与上传直接使用内存数据；
+    若识别服务仍按路径读取截图，则先等待 write_future 对应的后台写盘完成。
+    空白页的抓包文件通过抓包控制器异步删除，排在 capture_stop 对应的 stop 请求之后。
+    抓包校验不在这里进行，见 _chain_validation。
     
     Returns:
-        Dict: 包含 prediction 和 is_blank 的结果字典
+        Dict: 包含 prediction、is_blank、capture_invalid、预筛结论 prefilter 与各阶段耗时 timings 的结果字典
     """
-    result = {"prediction": None, "is_blank": False, "error": None}
+    timings: Dict[str, float] = {}
+    if submitted_at is not None:
+        timings["classify_queue"] = time.perf_counter() - submitted_at
+        STAGE_SECONDS.observe(timings["classify_queue"], stage="classify_queue")
+    result = {"prediction": None, "is_blank": False, "capture_invalid": False, "prefilter": AMBIGUOUS,
+              "cache_hit": False, "error": None, "timings": timings}
+    started = time.perf_counter()
     try:
-        prediction = classify_screenshot(service_cfg, screenshot_path)
+        verdict = prefilter_screenshot(image_bytes if image_bytes is not None else screenshot_path,
+                                       service_cfg.get("prefilter"))
+        result["prefilter"] = verdict
+        if verdict == BLANK:
+            # 明显的空白页，直接按空白标签处理
+            prediction = service_cfg.get("blank_label", 0)
+        elif verdict == CONTENT:
+            # 明显有内容，无需调用识别服务；记为配置的非空白标签（为 null 时预测结果为空，以 prefilter 字段区分）
+            prediction = (service_cfg.get("prefilter") or {}).get("content_label")
+        else:
+            if str(service_cfg.get("upload", "path")).lower() == "path":
+                # 识别服务从磁盘读取截图，需要等待后台写盘完成
+                image_bytes = None
+                if write_future is not None and not write_future.result():
+                    # 写盘失败时服务端读不到截图，不能把不存在的路径交给识别服务
+                    raise RuntimeError(f"截图写盘失败，无法按路径分类: {screenshot_path}")
+            service_started = time.monotonic()
+            with timer("classify_service", timings):
+                prediction = _cached_classify(service_cfg, screenshot_path, image_bytes, result)
+            if not result["cache_hit"]:
+                # 向并发控制报告识别服务的延迟与结果（失败时预测结果为空）
+                _get_classification_executor(service_cfg).record(
+                    service_started, time.monotonic() - service_started, prediction is not None)
         result["prediction"] = prediction
         
         if is_blank_prediction(prediction, service_cfg):
             logger.warning(f"检测到空白页 ({url}), 预测结果: {prediction}")
             result["is_blank"] = True
-            
-            pcap_enabled = bool(pcap_cfg.get("service"))
-            cleanup_on_failure = bool(pcap_cfg.get("delete_on_failure", True))
-            
-            if pcap_enabled and cleanup_on_failure:
-                logger.info(f"空白页清理抓包文件: {url}")
-                delete_capture_files(pcap_cfg, capture_domain, capture_index)
+            _cleanup_capture(pcap_cfg, capture_domain, capture_index, capture_stop, f"空白页清理抓包文件: {url}")
+        elif has_content_verdict(result):
+            logger.info(f"后台分类完成: {url}, 结果: {prediction}, 预筛: {verdict}")
         else:
-            logger.info(f"后台分类完成: {url}, 结果: {prediction}")
+            # 识别服务失败、熔断或未配置，没有分类结论
+            logger.warning(f"识别服务未返回分类结果: {url}")
             
     except Exception as e:
         logger.error(f"后台分类任务发生错误 ({url}): {e}")
         result["error"] = str(e)
-        
+    timings["classify"] = time.perf_counter() - started
+    STAGE_SECONDS.observe(timings["classify"], stage="classify")
+
+    if result["error"] is not None:
+        outcome = "error"
+    elif result["is_blank"]:
+        outcome = "blank"
+    else:
+        outcome = "content" if has_content_verdict(result) else "unclassified"
+    if result["prefilter"] != AMBIGUOUS:
+        source = "prefilter"
+    else:
+        source = "cache" if result["cache_hit"] else "service"
+    CLASSIFY_OUTCOMES.inc(outcome=outcome, source=source)
+
+    return result
+
+def has_content_verdict(classification: Dict[str, Any]) -> bool:
+    """
+    分类结果是否确认截图有内容：识别服务或缓存给出了非空白标签，或本地预筛明确判定有内容。
+    识别服务失败、熔断、分类被跳过以及出错时为 False（预测结果同样为空，但没有结论）。
+    """
+    if classification.get("error") is not None or classification.get("is_blank"):
+        return False
+    return classification.get("prediction") is not None or classification.get("prefilter") == CONTENT
+
+def _validation_enabled(pcap_cfg: dict) -> bool:
+    return bool((pcap_cfg.get("validate") or {}).get("enabled", False))
+
+def _get_validation_executor(pcap_cfg: dict) -> ThreadPoolExecutor:
+    global validation_executor
+    with _executor_lock:
+        if validation_executor is None:
+            workers = max(1, int((pcap_cfg.get("validate") or {}).get("workers", 2)))
+            validation_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="capture-validate")
+        return validation_executor
+
+def _chain_validation(classify_future: Future, pcap_cfg: dict, capture_domain: str, capture_index: str,
+                      capture_stop: Future, url: str, ports: Optional[Dict[str, int]] = None) -> Future:
+    """
+    分类完成且不是空白页时，等 capture_stop 完成后在校验线程池中校验抓包文件，返回合并了校验结果的 Future。
+    校验读取整个抓包文件，不占用分类线程池的自适应并发名额，也不在等待 stop 时占用分类线程。
+    """
+    combined: Future = Future()
+
+    def validate(result: Dict[str, Any]) -> None:
+        try:
+            _apply_validation(result, pcap_cfg, capture_domain, capture_index, capture_stop, url, ports)
+        except Exception as e:
+            logger.error(f"抓包校验发生错误 ({url}): {e}")
+        finally:
+            combined.set_result(result)
+
+    def on_stopped(result: Dict[str, Any]) -> None:
+        try:
+            _get_validation_executor(pcap_cfg).submit(validate, result)
+        except RuntimeError as e:
+            # 运行结束时校验线程池已关闭
+            logger.warning(f"校验线程池已关闭，跳过抓包校验 ({url}): {e}")
+            combined.set_result(result)
+
+    def on_classified(future: Future) -> None:
+        try:
+            result = future.result()
+        except BaseException as e:
+            combined.set_exception(e)
+            return
+        if result.get("error") is not None or result.get("is_blank"):
+            combined.set_result(result)
+            return
+        capture_stop.add_done_callback(lambda _: on_stopped(result))
+
+    classify_future.add_done_callback(on_classified)
+    return combined
+
+def _apply_validation(result: Dict[str, Any], pcap_cfg: dict, capture_domain: str, capture_index: str,
+                      capture_stop: Future, url: str, ports: Optional[Dict[str, int]]) -> None:
+    """校验抓包内容：几乎为空或停止失败（不完整）的抓包与空白页一样删除并标记 capture_invalid"""
+    with timer("validate_capture", result["timings"]):
+        validation = _validate_capture(pcap_cfg, capture_domain, capture_index, capture_stop, ports)
+    if validation is None:
+        return
+    result["capture_stats"] = validation["stats"]
+    if not validation["valid"]:
+        reasons = "; ".join(validation["reasons"].values())
+        logger.warning(f"抓包无效 ({url}): {reasons}")
+        result["capture_invalid"] = True
+        # 写入结果索引的 error，使其不计入可用抓包
+        result["error"] = f"抓包无效: {reasons}"
+        _cleanup_capture(pcap_cfg, capture_domain, capture_index, capture_stop, f"无效抓包清理抓包文件: {url}")
+
+def _validate_capture(pcap_cfg: dict, capture_domain: str, capture_index: str, capture_stop: Future,
+                      ports: Optional[Dict[str, int]] = None) -> Optional[Dict[str, Any]]:
+    """
+    在停止抓包完成后校验抓包文件；本机看不到抓包目录时返回 None。
+    停止失败时抓包可能仍在写入或不完整，视为无效。
+    """
+    try:
+        stopped = capture_stop.result()
+    except Exception as e:
+        stopped, error = False, str(e)
+    else:
+        error = "抓包服务返回失败"
+    if not stopped:
+        return {"valid": False, "reasons": {"stop": f"停止抓包失败，抓包可能不完整: {error}"}, "stats": None}
+    watched = {"tls": ports["tls"], "proxy": ports["proxy"]} if ports else None
+    return validate_capture(pcap_cfg, capture_domain, capture_index, watched)
+
+def _cleanup_capture(pcap_cfg: dict, capture_domain: str, capture_index: str, capture_stop: Optional[Future],
+                     message: str) -> None:
+    """通过抓包控制器异步删除抓包文件，排在 stop 请求之后"""
+    controller = get_capture_controller(pcap_cfg)
+    if controller is not None and bool(pcap_cfg.get("delete_on_failure", True)):
+        logger.info(message)
+        controller.delete(capture_domain, capture_index, after=capture_stop)
+
+# 每个 worker 线程上一次抓包的 stop Future：同一浏览器的下一次抓包需等待它完成后才能启动
+_worker_state = threading.local()
+
+def _abandon_capture(pool: BrowserPool, pcap_cfg: dict, capture: Dict[str, Any]) -> None:
+    """停止并删除一个提前启动但不再使用的抓包，并归还为它继续借用的浏览器会话"""
+    controller = get_capture_controller(pcap_cfg)
+    if controller is not None:
+        ctx = capture["context"]
+        stop_future = controller.stop(ctx["domain"], ctx["index_str"], after=capture["start"])
+        controller.delete(ctx["domain"], ctx["index_str"], after=stop_future)
+    session = capture.pop("session", None)
+    if session is not None:
+        pool.release(session)
+
+def process_single_url(pool: BrowserPool, url: str, config: Dict[str, Any],
+                       capture: Optional[Dict[str, Any]] = None,
+                       prefetch: Optional[Callable[[], Optional[str]]] = None,
+                       on_capture: Optional[Callable[..., None]] = None,
+                       ports: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """
+    处理单个 URL，并按结果状态计数，详见 _process_single_url。
+    """
+    result = _process_single_url(pool, url, config, capture, prefetch, on_capture, ports)
+    VISIT_OUTCOMES.inc(status=result["status"])
     return result
 
-def process_single_url(driver: WebDriver, url: str, config: Dict[str, Any]) -> Dict[str, Any]:
+def _process_single_url(pool: BrowserPool, url: str, config: Dict[str, Any],
+                        capture: Optional[Dict[str, Any]] = None,
+                        prefetch: Optional[Callable[[], Optional[str]]] = None,
+                        on_capture: Optional[Callable[..., None]] = None,
+                        ports: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
     """
-    处理单个 URL 的完整流程：抓包 -> 访问 -> 截图 -> 停止抓包 -> (异步)分类。
+    处理单个 URL 的完整流程：借出浏览器 -> 抓包 -> 访问 -> 截图 -> 停止抓包 -> 归还浏览器 -> (异步)分类。
+
+    stop/delete 通过抓包控制器异步发送。启用 pcapng.pipeline 时，停止抓包后通过 prefetch 取得下一个 URL，
+    继续借用本次的浏览器会话：先重置浏览器，再为下一个 URL 启动抓包（等本次 stop 确认后才发送 start），
+    抓包与会话放在 next_capture 中，下一次调用直接使用。会话需要回收时不提前启动抓包，
+    避免重置流量或新浏览器的启动流量混入下一次抓包。
     
     Args:
-        driver: WebDriver 实例
+        pool: 浏览器池，访问期间从中借出一个会话
         url: 目标 URL
         config: 全局配置
+        capture: 上一次调用提前启动的抓包（上一次结果中的 next_capture）
+        prefetch: 可选回调，返回下一个要处理的 URL，没有时返回 None
+        on_capture: 可选回调，为本次访问预留 (domain, idx) 后、启动抓包前调用（用于运行日志）；
+            为预先取出的下一个 URL 提前启动抓包前同样调用，此时第三个参数 prefetched 为 True
+        ports: 当前 worker 独立的代理与抓包过滤端口（pcapng.worker_ports 中的一项），
+            借出使用 ports["socks"] 代理端口的浏览器，抓包按 ports 中的 tls/proxy 端口过滤
         
     Returns:
-        Dict: 处理结果，包含 status, screenshot_path, future 等信息。
+        Dict: 处理结果，包含 status, screenshot_path, future, next_capture 以及各阶段耗时 timings 等信息。
     """
     service_cfg = config.get("service", {}) or {}
     pcap_cfg = config.get("pcapng", {}) or {}
-    pcap_enabled = bool(pcap_cfg.get("service"))
-    cleanup_on_failure = bool(pcap_cfg.get("delete_on_failure", True))
+    controller = get_capture_controller(pcap_cfg)
+    pipeline = controller is not None and prefetch is not None and bool(pcap_cfg.get("pipeline", True))
     
-    # 1. 准备上下文（路径、ID等）
-    try:
-        capture_ctx = prepare_capture_context(url, config)
-    except Exception as e:
-        logger.error(f"准备上下文失败 ({url}): {e}")
-        return {"status": "error", "error": str(e)}
+    timings: Dict[str, float] = {}
+
+    # 1. 准备上下文（路径、ID等），提前启动过抓包时直接使用其上下文与会话
+    start_future: Optional[Future] = None
+    session = None
+    if capture is not None and capture["url"] == url:
+        capture_ctx = capture["context"]
+        start_future = capture["start"]
+        session = capture.pop("session", None)
+        timings.update(capture.get("timings") or {})
+    else:
+        if capture is not None:
+            _abandon_capture(pool, pcap_cfg, capture)
+        try:
+            with timer("prepare", timings):
+                capture_ctx = prepare_capture_context(url, config)
+        except Exception as e:
+            logger.error(f"准备上下文失败 ({url}): {e}")
+            return {"status": "error", "error": str(e), "timings": timings}
 
     capture_domain = capture_ctx["domain"]
     capture_index = capture_ctx["index_str"]
+    if on_capture is not None and start_future is None:
+        on_capture(capture_domain, capture_index)
     screenshot_path = str(capture_ctx["screenshot_path"])
     
     result = {
@@ -82,46 +351,152 @@ def process_single_url(driver: WebDriver, url: str, config: Dict[str, Any]) -> D
         "status": "unknown",
         "prediction": "pending", # 标记为处理中
         "is_blank": False,
-        "future": None
+        "visit_info": {},
+        "timings": timings,
+        "future": None,
+        "next_capture": None
     }
 
-    # 2. 启动抓包
-    if pcap_enabled:
-        if not start_capture_task(pcap_cfg, capture_domain, capture_index):
-            logger.error(f"启动抓包失败: {url}")
-            result["status"] = "capture_start_failed"
+    # 2. 借出浏览器会话（在抓包开始前完成，避免浏览器启动流量混入抓包）
+    if session is None:
+        try:
+            with timer("acquire", timings):
+                session = pool.acquire(ports["socks"] if ports else None)
+        except Exception as e:
+            logger.error(f"获取浏览器会话失败 ({url}): {e}")
+            if start_future is not None:
+                _abandon_capture(pool, pcap_cfg, capture)
+            result["status"] = "browser_unavailable"
             return result
 
-    # 3. 执行访问
-    visit_success = visit_page(driver, url, screenshot_path, config)
-    
-    # 4. 停止抓包
-    if pcap_enabled:
-        if not stop_capture_task(pcap_cfg, capture_domain, capture_index):
-            logger.error(f"停止抓包失败: {url}")
-            # 即使停止失败，如果访问成功了，也可能算部分成功
-            pass
+    capture_stop: Optional[Future] = None
+    handed_off = False
+    try:
+        # 3. 启动抓包（提前启动时只需等待确认），同一 worker 上一次抓包停止后才发送 start
+        if controller is not None:
+            with timer("start_capture", timings):
+                if start_future is None:
+                    start_future = controller.start(capture_domain, capture_index,
+                                                    after=getattr(_worker_state, "last_stop", None), ports=ports)
+                start_timeout = float(pcap_cfg.get("start_timeout", 30))
+                try:
+                    capture_started = start_future.result(timeout=start_timeout)
+                except FutureTimeoutError:
+                    logger.error(f"等待启动抓包确认超时 ({start_timeout}s): {url}")
+                    # start 稍后仍可能成功：排在其后停止并删除，同一 worker 的下一次抓包等待这次停止
+                    stop_future = controller.stop(capture_domain, capture_index, after=start_future)
+                    controller.delete(capture_domain, capture_index, after=stop_future)
+                    _worker_state.last_stop = stop_future
+                    capture_started = False
+            if not capture_started:
+                logger.error(f"启动抓包失败: {url}")
+                result["status"] = "capture_start_failed"
+                return result
+
+        # 4. 执行访问
+        visit_info: Dict[str, Any] = {}
+        with timer("visit", timings):
+            visit_success = visit_page(session.driver, url, screenshot_path, config, visit_info)
+        result["visit_info"] = visit_info
 
+        # 5. 停止抓包（异步发送，失败时由控制器重试）
+        if controller is not None:
+            with timer("stop_capture", timings):
+                capture_stop = controller.stop(capture_domain, capture_index)
+            _worker_state.last_stop = capture_stop
+
+        # 6. 继续借用会话访问下一个 URL：浏览器重置完成后才为其启动抓包
+        if pipeline:
+            next_url = prefetch()
+            if next_url is not None:
+                next_timings: Dict[str, float] = {}
+                try:
+                    with timer("prepare", next_timings):
+                        next_ctx = prepare_capture_context(next_url, config)
+                except Exception as e:
+                    # 下一个任务仍由调度器按普通流程处理
+                    logger.error(f"预先准备下一个 URL 失败 ({next_url}): {e}")
+                else:
+                    handed_off = True
+                    with timer("release", timings):
+                        reused = pool.reuse(session)
+                    if reused:
+                        if on_capture is not None:
+                            on_capture(next_ctx["domain"], next_ctx["index_str"], True)
+                        result["next_capture"] = {
+                            "url": next_url,
+                            "context": next_ctx,
+                            "session": session,
+                            "timings": next_timings,
+                            "start": controller.start(next_ctx["domain"], next_ctx["index_str"],
+                                                      after=capture_stop, ports=ports),
+                        }
+    finally:
+        if not handed_off:
+            # 归还会话，由浏览器池负责重置或回收
+            with timer("release", timings):
+                pool.release(session)
+
+    try:
+        return _submit_classification(result, service_cfg, pcap_cfg, visit_success, visit_info, capture_stop, ports)
+    except BaseException:
+        # 提前启动的抓包随结果一起丢失时无人停止，这里停止并删除，并归还继续借用的会话
+        if result["next_capture"] is not None:
+            _abandon_capture(pool, pcap_cfg, result["next_capture"])
+            result["next_capture"] = None
+        raise
+
+def _submit_classification(result: Dict[str, Any], service_cfg: dict, pcap_cfg: dict, visit_success: bool,
+                           visit_info: Dict[str, Any], capture_stop: Optional[Future],
+                           ports: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """访问结束后：访问失败时清理抓包，成功时提交异步分类任务（启用 pcapng.validate 时随后校验抓包）"""
+    url = result["url"]
+    capture_domain = result["domain"]
+    capture_index = result["index"]
+    controller = get_capture_controller(pcap_cfg)
     if not visit_success:
         result["status"] = "visit_failed"
-        if pcap_enabled and cleanup_on_failure:
+        if controller is not None and bool(pcap_cfg.get("delete_on_failure", True)):
             logger.info(f"访问失败，清理抓包文件: {url}")
-            delete_capture_files(pcap_cfg, capture_domain, capture_index)
+            controller.delete(capture_domain, capture_index, after=capture_stop)
         return result
 
-    # 5. 提交异步分类任务
+    # 7. 提交异步分类任务
     # 只要访问成功，就认为本轮任务成功，分类结果在后台处理
     result["status"] = "success"
     
-    future = classification_executor.submit(
-        _async_classify_task,
-        service_cfg,
-        pcap_cfg,
-        screenshot_path,
-        url,
-        capture_domain,
-        capture_index
-    )
+    try:
+        # 分类队列已满时在此阻塞，worker 暂停访问新页面
+        with timer("classify_submit", result["timings"]):
+            future = _get_classification_executor(service_cfg).submit(
+                _async_classify_task,
+                service_cfg,
+                pcap_cfg,
+                result["screenshot_path"],
+                url,
+                capture_domain,
+                capture_index,
+                # 截图字节只交给分类任务，不随结果返回给调度器
+                visit_info.pop("screenshot_png", None),
+                visit_info.pop("screenshot_write", None),
+                time.perf_counter(),
+                capture_stop
+            )
+    except Overloaded as e:
+        # 丢弃本次分类：没有分类结论的抓包不可用，删除抓包，由调度器延后重新访问
+        logger.warning(f"分类队列已满，跳过分类 ({url}): {e}")
+        CLASSIFY_OUTCOMES.inc(outcome="shed", source="limiter")
+        visit_info.pop("screenshot_png", None)
+        visit_info.pop("screenshot_write", None)
+        result["status"] = "classify_shed"
+        result["error"] = str(e)
+        _cleanup_capture(pcap_cfg, capture_domain, capture_index, capture_stop, f"分类被丢弃，清理抓包文件: {url}")
+        return result
+    PENDING_CLASSIFICATIONS.inc()
+    future.add_done_callback(lambda _: PENDING_CLASSIFICATIONS.dec())
+    if capture_stop is not None and _validation_enabled(pcap_cfg):
+        # 截图正常时再校验抓包内容，几乎为空的抓包与空白页一样删除并重试
+        future = _chain_validation(future, pcap_cfg, capture_domain, capture_index, capture_stop, url, ports)
     result["future"] = future
     
     logger.info(f"访问成功，已提交后台分类: {url}")
@@ -0,0 +1,321 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from browser_pool import BrowserPool
+from metrics import ACTIVE_WORKERS, BROWSER_RSS_MB
+
+logger = logging.getLogger(__name__)
+
+try:
+    _CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    # 非 Linux 平台没有 /proc，监控自动停用
+    _CLOCK_TICKS = 100
+    _PAGE_SIZE = 4096
+
+_MB = 1024 * 1024
+
+
+def read_process_table(proc_dir: str = "/proc") -> Dict[int, Tuple[int, int, int]]:
+    """
+    读取所有进程的 (ppid, CPU 时间 ticks, RSS 字节数)，每个进程只读一次 /proc/<pid>/stat。
+
+    Returns:
+        {pid: (ppid, utime + stime, rss)}，没有 /proc 时返回空字典
+    """
+    table: Dict[int, Tuple[int, int, int]] = {}
+    try:
+        entries = os.listdir(proc_dir)
+    except OSError:
+        return table
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"{proc_dir}/{entry}/stat", "rb") as f:
+                data = f.read()
+        except OSError:
+            continue  # 进程已退出
+        # 进程名可能包含空格和括号，从最后一个 ')' 之后开始解析
+        fields = data[data.rfind(b")") + 2:].split()
+        try:
+            table[int(entry)] = (int(fields[1]), int(fields[11]) + int(fields[12]), int(fields[21]) * _PAGE_SIZE)
+        except (IndexError, ValueError):
+            continue
+    return table
+
+
+def process_tree(table: Dict[int, Tuple[int, int, int]], root: int) -> List[int]:
+    """返回 root 及其全部子孙进程的 pid，root 不存在时返回空列表"""
+    if root not in table:
+        return []
+    children: Dict[int, List[int]] = {}
+    for pid, (ppid, _, _) in table.items():
+        children.setdefault(ppid, []).append(pid)
+    tree = [root]
+    for pid in tree:
+        tree.extend(children.get(pid, ()))
+    return tree
+
+
+def read_host_stats(proc_dir: str = "/proc") -> Optional[Dict[str, float]]:
+    """读取主机可用内存（MemAvailable）与 1 分钟平均负载，无法读取时返回 None"""
+    try:
+        meminfo = {}
+        with open(f"{proc_dir}/meminfo") as f:
+            for line in f:
+                key, _, value = line.partition(":")
+                meminfo[key] = int(value.split()[0])  # kB
+        with open(f"{proc_dir}/loadavg") as f:
+            load1 = float(f.read().split()[0])
+        return {
+            "mem_total_mb": meminfo["MemTotal"] / 1024,
+            "mem_available_mb": meminfo["MemAvailable"] / 1024,
+            "load1": load1,
+            "cpus": float(os.cpu_count() or 1),
+        }
+    except (OSError, KeyError, IndexError, ValueError):
+        return None
+
+
+def driver_pid(driver: Any) -> Optional[int]:
+    """返回 geckodriver 进程的 pid（Firefox 及其内容进程都是它的子进程），远程驱动等无法获取时返回 None"""
+    process = getattr(getattr(driver, "service", None), "process", None)
+    pid = getattr(process, "pid", None)
+    return pid if isinstance(pid, int) else None
+
+
+class ResourceMonitor:
+    """
+    浏览器资源监控：后台线程每 interval 秒从 /proc 采样每个浏览器会话进程树的 RSS 与 CPU 占用，
+    超过 max_rss_mb 的会话交给浏览器池回收（空闲时立即回收，使用中则在归还时回收）。
+
+    启用 autoscale 时根据主机可用内存与平均负载调整活跃 worker 数（min_workers 到 max_workers 之间）：
+    可用内存低于 min_free_mb 时立即缩容，负载超过 max_load 时在 cooldown 秒后缩容；
+    可用内存扣除一个浏览器的内存后仍高于 min_free_mb、且负载留有余量时每 cooldown 秒扩容一个 worker。
+    编号不小于活跃数的 worker 在取任务前暂停，浏览器池同步缩小并退出多余的空闲会话。
+
+    RSS 按进程累加，多个进程间共享的内存会被重复计算，阈值应按此留有余量。
+
+    Args:
+        pool: 浏览器池
+        max_workers: worker 线程数，即活跃 worker 数上限
+        interval: 采样间隔（秒）
+        max_rss_mb: 单个会话进程树的 RSS 上限（MB），0 表示不按内存回收
+        autoscale: 是否自动调整活跃 worker 数
+        min_workers: 活跃 worker 数下限
+        min_free_mb: 需要保留的主机可用内存（MB）
+        max_load: 1 分钟平均负载上限，0 表示 CPU 核数
+        cooldown: 两次扩缩容之间的最小间隔（秒）
+        browser_rss_mb: 还没有采样结果时估计的单个浏览器内存（MB）
+    """
+
+    def __init__(self, pool: BrowserPool, max_workers: int, interval: float = 2.0, max_rss_mb: float = 0.0,
+                 autoscale: bool = False, min_workers: int = 1, min_free_mb: float = 1024.0,
+                 max_load: float = 0.0, cooldown: float = 10.0, browser_rss_mb: float = 600.0):
+        self.pool = pool
+        self.max_workers = max(1, int(max_workers))
+        self.interval = max(0.1, float(interval))
+        self.max_rss_mb = max(0.0, float(max_rss_mb))
+        self.autoscale = bool(autoscale)
+        self.min_workers = min(self.max_workers, max(1, int(min_workers)))
+        self.min_free_mb = max(0.0, float(min_free_mb))
+        self.max_load = max(0.0, float(max_load))
+        self.cooldown = max(0.0, float(cooldown))
+        self.browser_rss_mb = max(1.0, float(browser_rss_mb))
+        # 扩缩容事件回调 (原 worker 数, 新 worker 数, 原因)，由调度器接入运行统计
+        self.on_scale: Optional[Callable[[int, int, str], None]] = None
+
+        self._cond = threading.Condition()
+        self._active = self.min_workers if self.autoscale else self.max_workers
+        self._last_scale = float("-inf")
+        self._cpu: Dict[int, Tuple[int, float]] = {}  # 会话进程树上次采样的 (CPU ticks, 时间)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._host_warned = False
+
+        self._samples = 0
+        self._peak_rss = 0.0
+        self._cpu_total = 0.0
+        self._cpu_samples = 0
+        self._rss_recycles = 0
+        self._scale_ups = 0
+        self._scale_downs = 0
+        ACTIVE_WORKERS.set(self._active)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], pool: BrowserPool, workers: int) -> Optional["ResourceMonitor"]:
+        """根据 browser_pool.max_rss_mb 与 scheduler.autoscale 创建监控，二者都未启用时返回 None"""
+        pool_cfg = config.get("browser_pool", {}) or {}
+        autoscale_cfg = (config.get("scheduler", {}) or {}).get("autoscale", {}) or {}
+        max_rss_mb = float(pool_cfg.get("max_rss_mb", 0))
+        autoscale = bool(autoscale_cfg.get("enabled", False))
+        if max_rss_mb <= 0 and not autoscale:
+            return None
+        return cls(
+            pool,
+            workers,
+            interval=float(pool_cfg.get("monitor_interval", 2.0)),
+            max_rss_mb=max_rss_mb,
+            autoscale=autoscale,
+            min_workers=int(autoscale_cfg.get("min_workers", 1)),
+            min_free_mb=float(autoscale_cfg.get("min_free_mb", 1024)),
+            max_load=float(autoscale_cfg.get("max_load", 0)),
+            cooldown=float(autoscale_cfg.get("cooldown", 10.0)),
+            browser_rss_mb=float(autoscale_cfg.get("browser_rss_mb", 600)),
+        )
+
+    @property
+    def active(self) -> int:
+        with self._cond:
+            return self._active
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="resource-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """停止采样并放行所有暂停的 worker"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 5)
+            self._thread = None
+        with self._cond:
+            self._cond.notify_all()
+
+    def wait_active(self, worker_id: int, done: Callable[[], bool], poll: float = 1.0) -> bool:
+        """
+        worker 取任务前调用：编号不小于活跃 worker 数时阻塞，直到扩容或全部任务结束。
+
+        Args:
+            worker_id: worker 编号
+            done: 返回 True 表示全部任务已结束
+            poll: 检查 done 的间隔（秒）
+
+        Returns:
+            可以继续取任务时返回 True，任务已全部结束时返回 False
+        """
+        with self._cond:
+            while worker_id >= self._active and not self._stop.is_set():
+                if done():
+                    return False
+                self._cond.wait(poll)
+        return True
+
+    def sample(self) -> None:
+        """采样一次所有会话与主机资源，按需回收会话并调整活跃 worker 数"""
+        table = read_process_table()
+        now = time.monotonic()
+        sessions = self.pool.sessions()
+        sampled: List[float] = []
+        seen = set()
+        for session in sessions:
+            pid = driver_pid(session.driver)
+            if pid is None:
+                continue
+            tree = process_tree(table, pid)
+            if not tree:
+                continue
+            seen.add(pid)
+            rss_mb = sum(table[p][2] for p in tree) / _MB
+            ticks = sum(table[p][1] for p in tree)
+            previous = self._cpu.get(pid)
+            self._cpu[pid] = (ticks, now)
+            cpu_percent = None
+            if previous is not None and now > previous[1]:
+                # 退出的子进程会让累计时间变小，按 0 处理
+                cpu_percent = max(0, ticks - previous[0]) / _CLOCK_TICKS / (now - previous[1]) * 100
+            session.rss_mb, session.cpu_percent = rss_mb, cpu_percent
+            sampled.append(rss_mb)
+
+            self._peak_rss = max(self._peak_rss, rss_mb)
+            if cpu_percent is not None:
+                self._cpu_total += cpu_percent
+                self._cpu_samples += 1
+            if self.max_rss_mb and rss_mb > self.max_rss_mb:
+                if self.pool.retire(session, f"内存 {rss_mb:.0f}MB 超过上限 {self.max_rss_mb:.0f}MB"):
+                    self._rss_recycles += 1
+        for pid in list(self._cpu):
+            if pid not in seen:
+                del self._cpu[pid]
+        self._samples += 1
+        BROWSER_RSS_MB.set(sum(sampled))
+
+        if self.autoscale:
+            host = read_host_stats()
+            if host is None:
+                if not self._host_warned:
+                    logger.warning("无法读取 /proc/meminfo 或 /proc/loadavg，不自动调整 worker 数")
+                    self._host_warned = True
+            else:
+                per_browser = max(sampled) if sampled else self.browser_rss_mb
+                self._autoscale(host, per_browser, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            active = self._active
+        return {
+            "samples": self._samples,
+            "peak_rss_mb": self._peak_rss,
+            "cpu_avg": self._cpu_total / self._cpu_samples if self._cpu_samples else 0.0,
+            "rss_recycles": self._rss_recycles,
+            "active": active,
+            "max_workers": self.max_workers,
+            "scale_ups": self._scale_ups,
+            "scale_downs": self._scale_downs,
+        }
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"采样 {stats['samples']} 次, 单个浏览器内存峰值 {stats['peak_rss_mb']:.0f}MB, "
+            f"平均 CPU {stats['cpu_avg']:.0f}%, 因内存回收 {stats['rss_recycles']} 次, "
+            f"活跃 worker {stats['active']}/{stats['max_workers']}, "
+            f"扩容 {stats['scale_ups']} 次, 缩容 {stats['scale_downs']} 次"
+        )
+
+    def _autoscale(self, host: Dict[str, float], per_browser: float, now: float) -> None:
+        max_load = self.max_load or host["cpus"]
+        available, load = host["mem_available_mb"], host["load1"]
+        with self._cond:
+            active = self._active
+        cooled = now - self._last_scale >= self.cooldown
+
+        target, reason = active, ""
+        if available < self.min_free_mb and active > self.min_workers:
+            # 内存不足可能触发 OOM，不等冷却时间
+            target, reason = active - 1, f"可用内存 {available:.0f}MB 低于 {self.min_free_mb:.0f}MB"
+        elif load > max_load and active > self.min_workers and cooled:
+            target, reason = active - 1, f"负载 {load:.1f} 超过 {max_load:.1f}"
+        elif (active < self.max_workers and cooled and available - per_browser >= self.min_free_mb
+              and load + 1 <= max_load):
+            target, reason = active + 1, f"可用内存 {available:.0f}MB, 负载 {load:.1f}"
+        if target == active:
+            return
+
+        with self._cond:
+            self._active = target
+            self._cond.notify_all()
+        self._last_scale = now
+        if target > active:
+            self._scale_ups += 1
+        else:
+            self._scale_downs += 1
+        self.pool.resize(target)
+        ACTIVE_WORKERS.set(target)
+        logger.info(f"活跃 worker 数 {active} -> {target} ({reason})")
+        if self.on_scale is not None:
+            self.on_scale(active, target, reason)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.sample()
+            except Exception as e:
+                logger.warning(f"资源采样失败: {e}", exc_info=True)
@@ -0,0 +1,328 @@
+"""
+抓包结果索引：把 process_single_url 的每次访问结果（状态、分类结果、各阶段耗时）写入本地 SQLite，
+用于统计覆盖率与导出数据集清单。
+
+用法:
+    python results_index.py coverage --min 5          # 非空白抓包少于 5 个的域名
+    python results_index.py summary                   # 按状态与预测结果汇总
+    python results_index.py export --output manifest.csv   # 导出 pcap 文件与截图标签的对应清单
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+from batch_writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS captures (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    task_id INTEGER,
+    url TEXT NOT NULL,
+    domain TEXT,
+    idx TEXT,
+    attempt INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL,
+    prediction INTEGER,
+    is_blank INTEGER NOT NULL DEFAULT 0,
+    prefilter TEXT,
+    cache_hit INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    screenshot_path TEXT,
+    timings TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_captures_domain ON captures (domain);
+CREATE INDEX IF NOT EXISTS idx_captures_status ON captures (status);
+CREATE INDEX IF NOT EXISTS idx_captures_prediction ON captures (prediction);
+"""
+
+_COLUMNS = ("run_id", "task_id", "url", "domain", "idx", "attempt", "status", "prediction", "is_blank",
+            "prefilter", "cache_hit", "error", "screenshot_path", "timings", "created_at")
+
+# 可用于数据集的抓包：访问成功、分类完成且不是空白页，并有分类结果或预过滤判定为有内容
+# （与 process_handler.has_content_verdict 一致；识别服务未返回结果的访问不可用）
+_USABLE = ("status = 'success' AND is_blank = 0 AND error IS NULL "
+           "AND (prediction IS NOT NULL OR prefilter = 'content')")
+
+# 按抓包序号排序：分布式模式下 idx 为 "节点-序号"（节点名称中不含 -），先按节点再按整数序号排序
+_IDX_ORDER = "substr(idx, 1, instr(idx, '-')), CAST(substr(idx, instr(idx, '-') + 1) AS INTEGER)"
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+class ResultsWriter(BatchWriter):
+    """
+    结果索引的后台写入线程：调用方只把行放入队列，由写入线程按 batch_size 行或 flush_interval 秒
+    一次 executemany 批量插入，避免 SQLite 写入拖慢访问流程。
+
+    Args:
+        path: SQLite 数据库文件
+        run_id: 本次运行的标识，默认为启动时间
+        flush_interval: 批量写入间隔（秒）
+        batch_size: 每批最多写入的行数
+    """
+
+    def __init__(self, path: str, run_id: Optional[str] = None, flush_interval: float = 0.5, batch_size: int = 256):
+        self.path = path
+        self.run_id = run_id or time.strftime("%Y%m%d-%H%M%S")
+        _connect(path).close()  # 在调用线程中建表，写入线程再打开自己的连接
+        self.written = 0
+        self._sql = f"INSERT INTO captures ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+        self._conn: Optional[sqlite3.Connection] = None
+        super().__init__("results-writer", flush_interval, batch_size)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional["ResultsWriter"]:
+        results_cfg = config.get("results", {}) or {}
+        if not results_cfg.get("enabled", False):
+            return None
+        return cls(
+            results_cfg.get("file", "results.db"),
+            flush_interval=float(results_cfg.get("flush_interval", 0.5)),
+            batch_size=int(results_cfg.get("batch_size", 256)),
+        )
+
+    def add(self, task: Dict[str, Any], result: Dict[str, Any],
+            classification: Optional[Dict[str, Any]] = None) -> None:
+        """
+        记录一次访问结果。
+
+        Args:
+            task: 调度器中的任务字典（id、url、attempts）
+            result: process_single_url 的返回值
+            classification: 异步分类结果（prediction、is_blank、prefilter、timings 等），没有时为 None
+        """
+        classification = classification or {}
+        timings = dict(result.get("timings") or {})
+        timings.update(classification.get("timings") or {})
+        prediction = classification.get("prediction")
+        row = (
+            self.run_id,
+            task.get("id"),
+            task["url"],
+            result.get("domain"),
+            result.get("index"),
+            task.get("attempts", 0),
+            result.get("status", "unknown"),
+            prediction if isinstance(prediction, int) else None,
+            int(bool(classification.get("is_blank"))),
+            classification.get("prefilter"),
+            int(bool(classification.get("cache_hit"))),
+            classification.get("error") or result.get("error"),
+            result.get("screenshot_path"),
+            json.dumps({stage: round(value, 6) for stage, value in timings.items()}),
+            time.time(),
+        )
+        self.put(row)
+
+    def close(self, timeout: Optional[float] = 30) -> None:
+        """写入剩余的行并停止写入线程"""
+        if not super().close(timeout):
+            logger.warning(f"等待结果索引写入超时: {self.path}")
+
+    def _run(self) -> None:
+        self._conn = _connect(self.path)
+        try:
+            super()._run()
+        finally:
+            self._conn.close()
+
+    def _write(self, rows: List[tuple]) -> None:
+        try:
+            with self._conn:
+                self._conn.executemany(self._sql, rows)
+            self.written += len(rows)
+        except sqlite3.Error as e:
+            logger.error(f"写入结果索引失败 ({self.path}): {e}")
+
+
+class ResultsIndex:
+    """
+    结果索引的查询接口。
+
+    Args:
+        path: SQLite 数据库文件
+        run_id: 只统计指定运行的结果，None 表示全部
+    """
+
+    def __init__(self, path: str, run_id: Optional[str] = None):
+        self.path = path
+        self.run_id = run_id
+        self._conn = _connect(path)
+        self._conn.row_factory = sqlite3.Row
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def _where(self, condition: str = "") -> tuple:
+        clauses = [condition] if condition else []
+        params: List[Any] = []
+        if self.run_id is not None:
+            clauses.append("run_id = ?")
+            params.append(self.run_id)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def runs(self) -> List[Dict[str, Any]]:
+        """列出所有运行及其记录数"""
+        rows = self._conn.execute(
+            "SELECT run_id, COUNT(*) AS visits, MIN(created_at) AS started, MAX(created_at) AS finished "
+            "FROM captures GROUP BY run_id ORDER BY started"
+        )
+        return [dict(row) for row in rows]
+
+    def summary(self) -> Dict[str, Any]:
+        """按访问状态与预测结果汇总"""
+        where, params = self._where()
+        statuses = {row["status"]: row["count"] for row in self._conn.execute(
+            f"SELECT status, COUNT(*) AS count FROM captures{where} GROUP BY status", params)}
+        where, params = self._where("status = 'success'")
+        predictions = {row["prediction"]: row["count"] for row in self._conn.execute(
+            f"SELECT prediction, COUNT(*) AS count FROM captures{where} GROUP BY prediction", params)}
+        where, params = self._where(_USABLE)
+        usable = self._conn.execute(f"SELECT COUNT(*) FROM captures{where}", params).fetchone()[0]
+        return {"statuses": statuses, "predictions": predictions, "usable": usable}
+
+    def coverage(self, min_count: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        每个域名的访问次数与可用（非空白）抓包数，按可用数升序。
+
+        Args:
+            min_count: 只返回可用抓包少于 min_count 个的域名
+        """
+        where, params = self._where()
+        sql = (
+            f"SELECT domain, COUNT(*) AS visits, SUM(CASE WHEN {_USABLE} THEN 1 ELSE 0 END) AS usable, "
+            f"SUM(is_blank) AS blank, SUM(CASE WHEN status != 'success' THEN 1 ELSE 0 END) AS failed "
+            f"FROM captures{where} GROUP BY domain"
+        )
+        if min_count is not None:
+            sql += " HAVING usable < ?"
+            params.append(int(min_count))
+        sql += " ORDER BY usable, domain"
+        return [dict(row) for row in self._conn.execute(sql, params)]
+
+    def query(self, domain: Optional[str] = None, status: Optional[str] = None,
+              prediction: Optional[int] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """按域名、状态、预测结果筛选访问记录"""
+        conditions, values = [], []
+        for column, value in (("domain", domain), ("status", status), ("prediction", prediction)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                values.append(value)
+        where, params = self._where(" AND ".join(conditions))
+        sql = f"SELECT * FROM captures{where} ORDER BY id"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        rows = []
+        for row in self._conn.execute(sql, values + params):
+            item = dict(row)
+            item["timings"] = json.loads(item["timings"] or "{}")
+            rows.append(item)
+        return rows
+
+    def manifest(self, pcap_template: str = "{domain}/{idx}.pcapng") -> Iterator[Dict[str, Any]]:
+        """
+        导出数据集清单：每个可用抓包对应一行 {domain, idx, url, pcap_file, screenshot, label}。
+
+        Args:
+            pcap_template: 抓包文件路径模板，可使用 {domain} 与 {idx}
+        """
+        where, params = self._where(_USABLE)
+        sql = (f"SELECT domain, idx, url, screenshot_path, prediction FROM captures{where} "
+               f"ORDER BY domain, {_IDX_ORDER}")
+        for row in self._conn.execute(sql, params):
+            yield {
+                "domain": row["domain"],
+                "idx": row["idx"],
+                "url": row["url"],
+                "pcap_file": pcap_template.format(domain=row["domain"], idx=row["idx"]),
+                "screenshot": row["screenshot_path"],
+                "label": row["prediction"],
+            }
+
+
+def _write_manifest(rows: Iterator[Dict[str, Any]], output: str) -> int:
+    """写入清单，.jsonl 后缀按 JSON Lines，其余按 CSV；output 为 - 时写到标准输出"""
+    f = open(output, "w", encoding="utf-8", newline="") if output != "-" else sys.stdout
+    count = 0
+    try:
+        if output.endswith(".jsonl"):
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            writer = csv.DictWriter(f, fieldnames=("domain", "idx", "url", "pcap_file", "screenshot", "label"))
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    return count
+
+
+def main() -> None:
+    from config_manager import load_config
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--config", default="config.yaml", help="配置文件路径")
+    parser.add_argument("--db", help="结果索引文件，默认使用配置中的 results.file")
+    parser.add_argument("--run", help="只统计指定 run_id 的结果")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("runs", help="列出所有运行")
+    sub.add_parser("summary", help="按状态与预测结果汇总")
+    coverage_parser = sub.add_parser("coverage", help="每个域名的可用抓包数")
+    coverage_parser.add_argument("--min", type=int, help="只列出可用抓包少于该数量的域名")
+    export_parser = sub.add_parser("export", help="导出数据集清单（.csv 或 .jsonl，- 表示标准输出）")
+    export_parser.add_argument("--output", default="-")
+    args = parser.parse_args()
+
+    results_cfg = load_config(args.config).get("results", {}) or {}
+    db_path = args.db or results_cfg.get("file", "results.db")
+    if not os.path.exists(db_path):
+        parser.error(f"结果索引不存在: {db_path}")
+    index = ResultsIndex(db_path, args.run)
+    try:
+        if args.command == "runs":
+            for run in index.runs():
+                print(f"{run['run_id']}: {run['visits']} 次访问, "
+                      f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['started']))} - "
+                      f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(run['finished']))}")
+        elif args.command == "summary":
+            summary = index.summary()
+            print(f"可用抓包: {summary['usable']}")
+            print("访问状态: " + ", ".join(f"{k} {v}" for k, v in sorted(summary["statuses"].items())))
+            print("预测结果: " + ", ".join(f"{k} {v}" for k, v in sorted(summary["predictions"].items(), key=str)))
+        elif args.command == "coverage":
+            rows = index.coverage(args.min)
+            print(f"{'域名':<40} {'访问':>6} {'可用':>6} {'空白':>6} {'失败':>6}")
+            for row in rows:
+                print(f"{row['domain']:<40} {row['visits']:>6} {row['usable']:>6} {row['blank']:>6} {row['failed']:>6}")
+            print(f"共 {len(rows)} 个域名")
+        else:
+            count = _write_manifest(index.manifest(results_cfg.get("pcap_template", "{domain}/{idx}.pcapng")),
+                                    args.output)
+            if args.output != "-":
+                print(f"已导出 {count} 条到 {args.output}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from batch_writer import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+QUEUED = "queued"
+CAPTURING = "capturing"
+VISITED = "visited"
+CLASSIFIED = "classified"
+BLANK_RETRY = "blank-retry"
+RETRY = "retry"
+ABANDONED = "abandoned"
+CLEANED = "cleaned"  # 恢复时已停止并删除的遗留抓包（只针对抓包，不改变任务状态）
+
+# 任务已结束的状态；抓包仍可能在服务端运行或等待清理的状态
+TERMINAL_STATES = (CLASSIFIED, ABANDONED)
+IN_FLIGHT_STATES = (CAPTURING, VISITED)
+
+
+class RunJournal(BatchWriter):
+    """
+    只追加的运行日志（JSONL）：每行记录一个任务的一次状态变化，
+    {"ts", "task", "url", "state", "attempts", "domain", "idx", ...}。
+
+    记录由后台线程按 batch_size 条或 flush_interval 秒批量写入并 fsync，调用方只做一次入队。
+    进程崩溃时最多丢失最后一个批次，读取时忽略写了一半的最后一行。
+    """
+
+    def __init__(self, path: str, append: bool = False, flush_interval: float = 0.5, batch_size: int = 512):
+        self.path = path
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        self._written = 0
+        super().__init__("run-journal", flush_interval, batch_size)
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], append: bool = False) -> Optional["RunJournal"]:
+        journal_cfg = config.get("journal", {}) or {}
+        if not journal_cfg.get("enabled", False) and not append:
+            return None
+        return cls(
+            journal_cfg.get("file", "run_journal.jsonl"),
+            append=append,
+            flush_interval=float(journal_cfg.get("flush_interval", 0.5)),
+            batch_size=int(journal_cfg.get("batch_size", 512)),
+        )
+
+    def record(self, task: Dict[str, Any], state: str, **fields: Any) -> None:
+        """
+        记录任务状态变化。
+
+        Args:
+            task: 调度器中的任务字典（包含 id、url、attempts，开始抓包后还有 domain、idx）
+            state: 新状态
+            fields: 额外字段，例如 status、prediction
+        """
+        entry = {
+            "ts": round(time.time(), 3),
+            "task": task.get("id"),
+            "url": task["url"],
+            "state": state,
+            "attempts": task.get("attempts", 0),
+        }
+        if task.get("domain") is not None:
+            entry["domain"] = task["domain"]
+            entry["idx"] = task["idx"]
+        entry.update(fields)
+        self.put(entry)
+
+    def record_capture(self, domain: str, idx: str, state: str) -> None:
+        """记录与任务无关的抓包状态变化，例如恢复时清理遗留抓包"""
+        self.put({"ts": round(time.time(), 3), "task": None, "state": state, "domain": domain, "idx": idx})
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """写入剩余记录并关闭文件"""
+        if not super().close(timeout):
+            logger.warning(f"等待运行日志写入超时: {self.path}")
+            return
+        self._file.close()
+
+    def _write(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            self._file.write("".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in batch))
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._written += len(batch)
+        except OSError as e:
+            logger.error(f"写入运行日志失败 ({self.path}): {e}")
+
+
+class JournalState:
+    """
+    从运行日志重建的状态：
+
+    - consumed: 已从 URL 迭代器读取的任务数，恢复时跳过这些任务
+    - pending: 未结束的任务（按任务 id 排序），恢复时重新入队
+    - orphans: 抓包可能仍在运行或未被分类的 (domain, idx)，恢复前需要停止并删除
+    - finished: 已结束的任务数
+    """
+
+    def __init__(self):
+        self.consumed = 0
+        self.pending: List[Dict[str, Any]] = []
+        self.orphans: List[Tuple[str, str]] = []
+        self.finished = 0
+
+
+def load_journal(path: str) -> JournalState:
+    """读取运行日志并重建任务状态；文件不存在时返回空状态"""
+    state = JournalState()
+    tasks: Dict[int, Dict[str, Any]] = {}
+    captures: Dict[Tuple[str, str], str] = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时写了一半的最后一行
+                    logger.warning(f"跳过运行日志中无法解析的第 {line_no} 行")
+                    continue
+                if entry.get("domain") is not None:
+                    captures[(entry["domain"], str(entry["idx"]))] = entry["state"]
+                task_id = entry.get("task")
+                if task_id is not None:
+                    tasks[task_id] = entry
+    except FileNotFoundError:
+        return state
+
+    state.consumed = max(tasks) + 1 if tasks else 0
+    for task_id in sorted(tasks):
+        entry = tasks[task_id]
+        if entry["state"] in TERMINAL_STATES:
+            state.finished += 1
+        else:
+            state.pending.append({"id": task_id, "url": entry["url"], "attempts": int(entry.get("attempts", 0))})
+    state.orphans = [capture for capture, capture_state in captures.items() if capture_state in IN_FLIGHT_STATES]
+    return state
@@ -0,0 +1,206 @@
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List
+
+# 每个阶段最多保留的耗时样本数
+_MAX_STAGE_SAMPLES = 100000
+# 摘要中最多列出的扩缩容事件数
+_MAX_SCALE_EVENTS_SHOWN = 20
+
+_RECYCLE_LABELS = {
+    "visits": "访问次数上限",
+    "rss": "内存超限",
+    "discard": "访问出错",
+    "reset_failed": "重置失败",
+    "proxy_port": "代理端口不匹配",
+}
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """对已排序的样本取 q 分位数（最近秩法），样本为空时返回 0"""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, math.ceil(q * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class WorkerStats:
+    """单个浏览器 worker 的处理统计"""
+
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.tasks = 0
+        self.busy_time = 0.0
+
+
+class RunStats:
+    """
+    记录一次运行的吞吐量统计：访问次数、结果分布与各 worker 的利用率。
+    所有方法都是线程安全的。
+    """
+
+    def __init__(self, worker_count: int):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._finished = None
+        self.workers: List[WorkerStats] = [WorkerStats(i) for i in range(worker_count)]
+        self.statuses: Dict[str, int] = {}
+        self.succeeded = 0
+        self.blank = 0
+        self.invalid_captures = 0
+        self.retries = 0
+        self.abandoned = 0
+        self.settle_visits = 0
+        self.settle_saved = 0.0
+        self.stage_samples: Dict[str, deque] = {}
+        self.recycles: Dict[str, int] = {}
+        self.scale_events: List[Dict[str, Any]] = []
+
+    def record_visit(self, worker_id: int, status: str, elapsed: float) -> None:
+        """记录一次 process_single_url 调用"""
+        with self._lock:
+            worker = self.workers[worker_id]
+            worker.tasks += 1
+            worker.busy_time += elapsed
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+
+    def record_settle(self, visit_info: Dict[str, Any]) -> None:
+        """记录自适应页面稳定等待相对固定等待节省的时间"""
+        if visit_info.get("settle_mode") != "adaptive":
+            return
+        with self._lock:
+            self.settle_visits += 1
+            self.settle_saved += float(visit_info.get("settle_saved", 0.0))
+
+    def record_timings(self, timings: Dict[str, float]) -> None:
+        """记录一次处理中各阶段的耗时（秒）"""
+        with self._lock:
+            for stage, elapsed in timings.items():
+                samples = self.stage_samples.get(stage)
+                if samples is None:
+                    samples = self.stage_samples[stage] = deque(maxlen=_MAX_STAGE_SAMPLES)
+                samples.append(elapsed)
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.succeeded += 1
+
+    def record_blank(self) -> None:
+        with self._lock:
+            self.blank += 1
+
+    def record_invalid_capture(self) -> None:
+        with self._lock:
+            self.invalid_captures += 1
+
+    def record_retry(self) -> None:
+        with self._lock:
+            self.retries += 1
+
+    def record_abandon(self) -> None:
+        with self._lock:
+            self.abandoned += 1
+
+    def record_recycle(self, kind: str) -> None:
+        """记录一次浏览器会话回收，kind 为回收原因类别"""
+        with self._lock:
+            self.recycles[kind] = self.recycles.get(kind, 0) + 1
+
+    def record_scale(self, old: int, new: int, reason: str) -> None:
+        """记录一次活跃 worker 数调整"""
+        with self._lock:
+            self.scale_events.append({
+                "time": time.perf_counter() - self._started,
+                "from": old,
+                "to": new,
+                "reason": reason,
+            })
+
+    def finish(self) -> None:
+        with self._lock:
+            self._finished = time.perf_counter()
+
+    def summary(self) -> Dict[str, Any]:
+        """返回汇总信息，可直接序列化为 JSON"""
+        with self._lock:
+            end = self._finished if self._finished is not None else time.perf_counter()
+            wall = max(end - self._started, 1e-9)
+            visits = sum(worker.tasks for worker in self.workers)
+            return {
+                "wall_time": wall,
+                "visits": visits,
+                "succeeded": self.succeeded,
+                "blank": self.blank,
+                "invalid_captures": self.invalid_captures,
+                "retries": self.retries,
+                "abandoned": self.abandoned,
+                "visits_per_min": visits * 60.0 / wall,
+                "succeeded_per_min": self.succeeded * 60.0 / wall,
+                "statuses": dict(self.statuses),
+                "settle_visits": self.settle_visits,
+                "settle_saved": self.settle_saved,
+                "retry_rate": self.retries / visits if visits else 0.0,
+                "recycles": dict(self.recycles),
+                "scale_events": list(self.scale_events),
+                "stages": {stage: _stage_summary(samples) for stage, samples in self.stage_samples.items()},
+                "workers": [
+                    {
+                        "worker": worker.worker_id,
+                        "tasks": worker.tasks,
+                        "busy_time": worker.busy_time,
+                        "utilization": worker.busy_time / wall,
+                    }
+                    for worker in self.workers
+                ],
+            }
+
+    def format_summary(self) -> str:
+        """生成便于打印的多行摘要"""
+        summary = self.summary()
+        lines = [
+            f"运行耗时 {summary['wall_time']:.1f}s, 访问 {summary['visits']} 次, "
+            f"成功 {summary['succeeded']}, 空白 {summary['blank']}, 无效抓包 {summary['invalid_captures']}, "
+            f"重试 {summary['retries']}, 放弃 {summary['abandoned']}",
+            f"吞吐量: {summary['visits_per_min']:.1f} 次访问/分钟, "
+            f"{summary['succeeded_per_min']:.1f} 个成功 URL/分钟",
+        ]
+        if summary["settle_visits"]:
+            lines.append(
+                f"自适应页面等待: {summary['settle_visits']} 次, 共节省 {summary['settle_saved']:.1f}s "
+                f"(平均 {summary['settle_saved'] / summary['settle_visits']:.2f}s/次)"
+            )
+        if summary["recycles"]:
+            reasons = ", ".join(f"{_RECYCLE_LABELS.get(kind, kind)} {count}"
+                                for kind, count in sorted(summary["recycles"].items()))
+            lines.append(f"浏览器回收 {sum(summary['recycles'].values())} 次: {reasons}")
+        events = summary["scale_events"]
+        if events:
+            shown = "" if len(events) <= _MAX_SCALE_EVENTS_SHOWN else f" (仅列出最近 {_MAX_SCALE_EVENTS_SHOWN} 次)"
+            lines.append(f"worker 扩缩容 {len(events)} 次{shown}:")
+            for event in events[-_MAX_SCALE_EVENTS_SHOWN:]:
+                lines.append(f"  {event['time']:.1f}s: {event['from']} -> {event['to']} ({event['reason']})")
+        for stage, stage_summary in sorted(summary["stages"].items()):
+            lines.append(
+                f"  阶段 {stage}: {stage_summary['count']} 次, p50 {stage_summary['p50'] * 1000:.0f}ms, "
+                f"p95 {stage_summary['p95'] * 1000:.0f}ms, p99 {stage_summary['p99'] * 1000:.0f}ms"
+            )
+        for worker in summary["workers"]:
+            lines.append(
+                f"  worker #{worker['worker']}: 处理 {worker['tasks']} 个任务, "
+                f"忙碌 {worker['busy_time']:.1f}s, 利用率 {worker['utilization']:.0%}"
+            )
+        return "\n".join(lines)
+
+
+def _stage_summary(samples: Iterable[float]) -> Dict[str, float]:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values) if values else 0.0,
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": values[-1] if values else 0.0,
+    }
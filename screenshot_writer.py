@@ -0,0 +1,101 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ScreenshotWriter:
+    """
+    后台截图写盘线程：截图以字节形式交给分类流程，文件由该线程异步写入截图目录，
+    避免慢速（如 NFS）磁盘写入阻塞访问流程。
+    """
+
+    def __init__(self):
+        self._queue: "queue.Queue" = queue.Queue()
+        self._lock = threading.Lock()
+        self._written = 0
+        self._failed = 0
+        self._bytes = 0
+        self._write_time = 0.0
+        self._thread = threading.Thread(target=self._run, name="screenshot-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, path: str, data: bytes) -> Future:
+        """
+        提交一次写盘，返回写入完成（结果为 True/False）的 Future。
+        """
+        future: Future = Future()
+        self._queue.put((path, data, future))
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """等待已提交的写盘全部完成，超时返回 False"""
+        marker: Future = Future()
+        self._queue.put((None, None, marker))
+        try:
+            marker.result(timeout=timeout)
+            return True
+        except Exception:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "written": self._written,
+                "failed": self._failed,
+                "bytes": self._bytes,
+                "avg_write": self._write_time / self._written if self._written else 0.0,
+            }
+
+    def _run(self) -> None:
+        while True:
+            path, data, future = self._queue.get()
+            if path is None:
+                future.set_result(True)
+                continue
+
+            start = time.perf_counter()
+            try:
+                # 先写临时文件再改名，读取方不会看到写了一半的截图
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                ok = True
+            except OSError as e:
+                logger.error(f"写入截图失败 ({path}): {e}")
+                ok = False
+
+            with self._lock:
+                if ok:
+                    self._written += 1
+                    self._bytes += len(data)
+                    self._write_time += time.perf_counter() - start
+                else:
+                    self._failed += 1
+            future.set_result(ok)
+
+
+_writer: Optional[ScreenshotWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_writer() -> ScreenshotWriter:
+    """返回进程内共享的截图写盘线程"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = ScreenshotWriter()
+        return _writer
+
+
+def flush_writer(timeout: Optional[float] = None) -> bool:
+    """等待共享写盘线程中的截图全部落盘；未启用时直接返回 True"""
+    with _writer_lock:
+        writer = _writer
+    return writer.flush(timeout) if writer is not None else True
@@ -1,16 +1,86 @@
+import io
 import logging
-from typing import Any, Optional
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     import requests  # type: ignore
 except ImportError:  # pragma: no cover
     requests = None  # type: ignore
 
+try:
+    from PIL import Image  # type: ignore
+except ImportError:  # pragma: no cover
+    Image = None  # type: ignore
+
+from circuit_breaker import CircuitBreaker, get_breaker, is_service_failure
+from http_client import build_timeout, get_client
+from micro_batcher import MicroBatcher
+
 logger = logging.getLogger(__name__)
 
 
-def classify_screenshot(service_config: dict, screenshot_path: str) -> Optional[int]:
-    """调用识别服务对截图进行分类"""
+def encode_for_classifier(service_config: dict, image_bytes: bytes) -> Tuple[bytes, str]:
+    """
+    按 classify_max_width / classify_format 缩小或重新编码用于分类的截图，磁盘上仍保留原图。
+
+    Returns:
+        (图片字节, Content-Type)；Pillow 未安装或无需处理时返回原始 PNG
+    """
+    max_width = int(service_config.get("classify_max_width", 0) or 0)
+    image_format = str(service_config.get("classify_format", "png")).lower()
+    if Image is None or (not max_width and image_format == "png"):
+        return image_bytes, "image/png"
+
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if max_width and image.width > max_width:
+            height = max(1, round(image.height * max_width / image.width))
+            image = image.resize((max_width, height), Image.BILINEAR)
+        output = io.BytesIO()
+        if image_format in ("jpeg", "jpg"):
+            quality = int(service_config.get("classify_quality", 85))
+            image.convert("RGB").save(output, "JPEG", quality=quality)
+            return output.getvalue(), "image/jpeg"
+        image.save(output, "PNG")
+        return output.getvalue(), "image/png"
+
+
+def _upload_mode(service_config: dict, image_bytes: Optional[bytes]) -> str:
+    """没有截图字节时只能按路径上传"""
+    if image_bytes is None:
+        return "path"
+    return str(service_config.get("upload", "path")).lower()
+
+
+def _build_request(service_config: dict, screenshot_path: str, image_bytes: Optional[bytes]) -> Dict[str, Any]:
+    """
+    构造分类请求参数。upload 为 path 时只发送截图路径；multipart 以表单文件 image 上传；
+    binary 直接以图片作为请求体，路径放在 X-Image-Path 请求头中。
+    """
+    mode = _upload_mode(service_config, image_bytes)
+    if mode == "path":
+        return {"json": {"image_path": screenshot_path}}
+
+    data, content_type = encode_for_classifier(service_config, image_bytes)
+    if mode == "binary":
+        return {"data": data, "headers": {"Content-Type": content_type, "X-Image-Path": screenshot_path}}
+    return {
+        "data": {"image_path": screenshot_path},
+        "files": {"image": (os.path.basename(screenshot_path), data, content_type)},
+    }
+
+
+def classify_screenshot(service_config: dict, screenshot_path: str, image_bytes: Optional[bytes] = None) -> Optional[int]:
+    """
+    调用识别服务对截图进行分类。
+
+    Args:
+        service_config: service 配置段
+        screenshot_path: 截图路径
+        image_bytes: 内存中的截图，提供且 upload 不为 path 时直接上传，服务端无需回读磁盘
+    """
     service_url = service_config.get("resnet18_url")
     if not service_url:
         return None
@@ -19,15 +89,21 @@ def classify_screenshot(service_config: dict, screenshot_path: str) -> Optional[
         logger.warning("requests 库未安装，无法调用识别服务")
         return None
 
-    timeout = service_config.get("timeout", 5)
-    payload = {"image_path": screenshot_path}
+    breaker = get_classifier_breaker(service_config)
+    if breaker is not None and not breaker.allow():
+        logger.debug("识别服务熔断中，跳过分类: %s", screenshot_path)
+        return None
+
+    timeout = build_timeout(service_config, "timeout", 5)
 
     try:
-        response = requests.post(service_url, json=payload, timeout=timeout)
-        response.raise_for_status()
+        request_kwargs = _build_request(service_config, screenshot_path, image_bytes)
+        response = get_client().request("POST", service_url, timeout=timeout, **request_kwargs)
     except requests.RequestException as exc:  # type: ignore[attr-defined]
         logger.warning("调用识别服务失败: %s", exc)
+        _record_result(breaker, exc)
         return None
+    _record_result(breaker, None)
 
     try:
         data = response.json()
@@ -38,6 +114,135 @@ def classify_screenshot(service_config: dict, screenshot_path: str) -> Optional[
     return _extract_prediction(data)
 
 
+def get_classifier_breaker(service_config: dict) -> Optional[CircuitBreaker]:
+    """识别服务共享的熔断器，service.breaker.enabled 为 false 时返回 None"""
+    return get_breaker("classifier", service_config)
+
+
+def _record_result(breaker: Optional[CircuitBreaker], exc: Optional[Exception]) -> None:
+    """向熔断器报告一次请求结果；exc 为 None 表示服务有响应"""
+    if breaker is None:
+        return
+    if exc is not None and is_service_failure(exc):
+        breaker.record_failure()
+    else:
+        breaker.record_success()
+
+
+class BatchClassifier(MicroBatcher):
+    """
+    微批分类器：收集待分类截图，凑满 batch_size 张或最早一张等待超过 batch_max_wait 秒后，
+    一次请求发送整批图片，再把各自的结果回填到调用方的 Future。
+
+    批量请求体为 {"image_paths": [...]}（multipart 上传模式下为多个 images 表单文件），
+    响应可以是预测结果列表，或 {"predictions": [...]}。
+    服务端不支持批量时（4xx 或响应格式不匹配）自动退回逐张调用 classify_screenshot。
+    """
+
+    service_name = "识别服务"
+    item_unit = "张"
+
+    def __init__(self, service_config: dict):
+        self.service_config = service_config
+        self.batch_url = service_config.get("batch_url") or service_config.get("resnet18_url")
+        super().__init__(
+            batch_size=service_config.get("batch_size", 8),
+            max_wait=service_config.get("batch_max_wait", 0.05),
+            thread_name="batch-classifier",
+        )
+
+    def submit(self, image_path: str, image_bytes: Optional[bytes] = None) -> Future:
+        """提交一张截图，返回解析为预测结果（或 None）的 Future"""
+        return super().submit(image_path, image_bytes)
+
+    def classify(self, image_path: str, image_bytes: Optional[bytes] = None) -> Optional[int]:
+        """同步等待单张截图的批量分类结果"""
+        return self.submit(image_path, image_bytes).result()
+
+    def format_stats(self) -> str:
+        stats = self.stats()
+        return (
+            f"批次 {stats['batches']} 个, 图片 {stats['items']} 张, 填充率 {stats['fill_rate']:.0%}, "
+            f"单张延迟 p50 {stats['latency_p50'] * 1000:.0f}ms / p95 {stats['latency_p95'] * 1000:.0f}ms"
+        )
+
+    def _call_single(self, image_path: str, image_bytes: Optional[bytes]) -> Optional[int]:
+        return classify_screenshot(self.service_config, image_path, image_bytes)
+
+    def _build_batch_request(self, items: List[Tuple[str, Optional[bytes]]]) -> Optional[Dict[str, Any]]:
+        image_paths = [image_path for image_path, _ in items]
+        modes = {_upload_mode(self.service_config, image_bytes) for _, image_bytes in items}
+        if modes == {"path"}:
+            return {"json": {"image_paths": image_paths}}
+        if modes == {"multipart"}:
+            files = []
+            for image_path, image_bytes in items:
+                data, content_type = encode_for_classifier(self.service_config, image_bytes)
+                files.append(("images", (os.path.basename(image_path), data, content_type)))
+            return {"data": {"image_paths": image_paths}, "files": files}
+        # binary 模式无法在一个请求体中放多张图片
+        return None
+
+    def _post_batch(self, items: List[Tuple[str, Optional[bytes]]]) -> Optional[List[Optional[int]]]:
+        """发送批量请求；服务端不支持批量时返回 None 以触发逐张调用"""
+        if not self.batch_url or requests is None:
+            return None
+
+        request_kwargs = self._build_batch_request(items)
+        if request_kwargs is None:
+            return None
+
+        breaker = get_classifier_breaker(self.service_config)
+        if breaker is not None and not breaker.allow():
+            return [None] * len(items)
+
+        timeout = build_timeout(self.service_config, "timeout", 5)
+        try:
+            response = get_client().request("POST", self.batch_url, timeout=timeout, **request_kwargs)
+            data = response.json()
+        except requests.HTTPError as exc:  # type: ignore[attr-defined]
+            status = exc.response.status_code if exc.response is not None else None
+            _record_result(breaker, exc)
+            if status in self._UNSUPPORTED_STATUS:
+                self._mark_unsupported(f"HTTP {status}")
+                return None
+            logger.warning("批量调用识别服务失败: %s", exc)
+            return [None] * len(items)
+        except requests.RequestException as exc:  # type: ignore[attr-defined]
+            logger.warning("批量调用识别服务失败: %s", exc)
+            _record_result(breaker, exc)
+            return [None] * len(items)
+        except ValueError as exc:
+            _record_result(breaker, None)
+            self._mark_unsupported(f"响应非 JSON: {exc}")
+            return None
+        _record_result(breaker, None)
+
+        if isinstance(data, dict):
+            data = data.get("predictions", data.get("results"))
+        if not isinstance(data, list) or len(data) != len(items):
+            self._mark_unsupported(f"响应格式不匹配: {data}")
+            return None
+
+        self._mark_supported()
+        return [_extract_prediction(item) for item in data]
+
+
+_batch_classifier: Optional[BatchClassifier] = None
+_batch_lock = threading.Lock()
+
+
+def get_batch_classifier(service_config: dict) -> Optional[BatchClassifier]:
+    """batch_size 大于 1 时返回进程内共享的微批分类器，否则返回 None"""
+    global _batch_classifier
+    if int(service_config.get("batch_size", 1)) <= 1 or not service_config.get("resnet18_url"):
+        return None
+    with _batch_lock:
+        if _batch_classifier is None:
+            _batch_classifier = BatchClassifier(service_config)
+        return _batch_classifier
+
+
 def is_blank_prediction(prediction: Optional[int], service_config: dict) -> bool:
     """根据配置判断预测结果是否为空白页"""
     if prediction is None:
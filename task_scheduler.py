@@ -1,13 +1,35 @@
+import argparse
+import heapq
+import itertools
 import logging
+import os
+import threading
 import time
 from collections import deque
-from typing import Iterable, List, Optional, Union, Dict, Any
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from concurrent.futures import Future
 
-from driver import get_firefox_driver
+from browser_pool import BrowserPool
+from http_client import get_client
+from pcap_service import (capture_available, delete_capture_files, get_batch_capture_client, get_capture_breaker,
+                          stop_capture_task, worker_ports)
+from service_client import get_batch_classifier, get_classifier_breaker
+from circuit_breaker import backoff_delay
+from classification_cache import get_classification_cache
+from screenshot_writer import flush_writer
+from capture_controller import flush_capture_controller, get_capture_controller
 from config_manager import load_config
-from utils import get_tasks_mode_1
-from process_handler import process_single_url
+from utils import iter_tasks_mode_1
+from process_handler import has_content_verdict, process_single_url, shutdown_classification_executor
+from run_stats import RunStats
+from resource_monitor import ResourceMonitor
+from results_index import ResultsWriter
+from domain_quota import DomainQuota
+from domain_dispatcher import DomainDispatcher
+from distributed_queue import DistributedTaskQueue, open_backend, resolve_node_id
+from run_journal import (ABANDONED, BLANK_RETRY, CAPTURING, CLASSIFIED, CLEANED, QUEUED, RETRY, VISITED,
+                         RunJournal, load_journal)
+from metrics import MetricsExporter, OUTSTANDING_TASKS, QUEUE_DEPTH, TASK_OUTCOMES
 
 # 配置日志
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,118 +52,651 @@ def _normalize_urls(urls: Optional[Union[str, Iterable[str]]]) -> List[str]:
             normalized.append(stripped)
     return normalized
 
-def run_tasks(urls: Optional[Union[str, Iterable[str]]] = None):
+
+# URL 迭代器已耗尽的标记
+_EXHAUSTED = object()
+
+
+class TaskQueue:
+    """
+    多个 worker 共享的线程安全任务队列。
+
+    取任务顺序：优先重试（空白页等分类完成后才发现的重试）> 新任务 > 普通重试（访问失败等）。
+    新任务从 URL 迭代器中惰性读取，迭代器产出 None 表示暂时没有新任务（例如按目标调度时都在等待结果）。
+    除了排队中的任务，还记录尚未结束的任务数
+    （排队、访问中、等待分类结果），用于判断整个运行何时完成。
+    get() 在没有可取任务时阻塞在条件变量上，直到有任务入队或整个运行结束，不做轮询。
+
+    每个新任务按读取顺序分配递增的 id，恢复运行时从运行日志中的最大 id 之后继续编号，
+    日志中未结束的任务通过 pending 优先重新入队。
+
+    传入 dispatcher 时按域名限速：所有任务先进入 DomainDispatcher（新任务最多预读 lookahead 个），
+    get() 取出最早可以访问的域名的任务，没有到时间的任务时等待到最早可访问时间或有新事件；
+    worker 在访问结束后调用 release() 释放域名的并发名额。
+
+    requeue() 可以指定延迟，延迟中的任务放在按到期时间排序的堆中，到期后再进入对应的重试队列。
+    """
+
+    def __init__(self, urls: Iterable[str], start_id: int = 0,
+                 pending: Optional[List[Dict[str, Any]]] = None, journal: Optional[RunJournal] = None,
+                 dispatcher: Optional[DomainDispatcher] = None, lookahead: int = 64):
+        self._cond = threading.Condition()
+        self._source: Optional[Iterator[str]] = iter(urls)
+        self._priority: deque = deque(pending or ())
+        self._retries: deque = deque()
+        self._delayed: List[Tuple[float, int, bool, Dict[str, Any]]] = []  # (到期时间, 序号, 是否优先, 任务)
+        self._delayed_seq = 0
+        self._outstanding = len(self._priority)
+        self._next_id = start_id
+        self._journal = journal
+        self._dispatcher = dispatcher
+        self._lookahead = max(1, int(lookahead))
+        self.total = 0  # 已从迭代器读取的新任务数
+
+    def get(self, block: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        取出下一个任务；暂时没有任务时阻塞等待，整个运行结束时返回 None。
+
+        Args:
+            block: 为 False 时不等待，暂时没有任务直接返回 None（用于为下一个任务提前启动抓包）
+        """
+        with self._cond:
+            while True:
+                wait = self._promote_delayed()
+                if self._dispatcher is not None:
+                    task, dispatch_wait = self._dispatch()
+                    if task is not None:
+                        return task
+                    if dispatch_wait is not None:
+                        wait = dispatch_wait if wait is None else min(wait, dispatch_wait)
+                elif self._priority:
+                    task = self._priority.popleft()
+                    self._update_depth()
+                    return task
+                else:
+                    task = self._next_new()
+                    if task is not None:
+                        return task
+                    if self._retries:
+                        task = self._retries.popleft()
+                        self._update_depth()
+                        return task
+                if self._outstanding <= 0:
+                    self._cond.notify_all()
+                    return None
+                if not block:
+                    return None
+                # 最多等到最早一个延迟重试到期，或按域名限速时最早一个域名可以访问
+                self._cond.wait(wait)
+
+    def release(self, task: Dict[str, Any]) -> None:
+        """一次访问结束，释放该域名的并发名额（未启用按域名限速时忽略）"""
+        if self._dispatcher is None:
+            return
+        with self._cond:
+            self._dispatcher.release(task, time.monotonic())
+            self._cond.notify()
+
+    def feedback(self, task: Dict[str, Any], bad: bool) -> None:
+        """报告访问结果（空白页或访问失败为 bad），用于按空白率调整域名退避（未启用按域名限速时忽略）"""
+        if self._dispatcher is None:
+            return
+        with self._cond:
+            self._dispatcher.feedback(task, bad, time.monotonic())
+
+    def _promote_delayed(self) -> Optional[float]:
+        """把到期的延迟重试移入重试队列，返回距下一个到期的秒数（没有延迟任务时为 None）"""
+        if not self._delayed:
+            return None
+        now = time.monotonic()
+        while self._delayed and self._delayed[0][0] <= now:
+            _, _, priority, task = heapq.heappop(self._delayed)
+            (self._priority if priority else self._retries).append(task)
+        return self._delayed[0][0] - now if self._delayed else None
+
+    def _next_new(self) -> Optional[Dict[str, Any]]:
+        """从 URL 迭代器读取一个新任务；迭代器暂时没有新任务或已耗尽时返回 None"""
+        if self._source is None:
+            return None
+        url = next(self._source, _EXHAUSTED)
+        if url is _EXHAUSTED:
+            self._source = None
+            return None
+        if url is None:
+            return None
+        self._outstanding += 1
+        self.total += 1
+        OUTSTANDING_TASKS.set(self._outstanding)
+        task = {"id": self._next_id, "url": url, "attempts": 0}
+        self._next_id += 1
+        if self._journal is not None:
+            self._journal.record(task, QUEUED)
+        return task
+
+    def _dispatch(self) -> Tuple[Optional[Dict[str, Any]], Optional[float]]:
+        """
+        按域名限速取任务：重试任务和最多 lookahead 个新任务先进入分发器，
+        再取出最早可以访问的任务。没有到时间的任务时返回需要等待的秒数。
+        """
+        dispatcher = self._dispatcher
+        now = time.monotonic()
+        while self._priority:
+            dispatcher.push(self._priority.popleft(), now, front=True)
+        while self._retries:
+            dispatcher.push(self._retries.popleft(), now)
+        self._update_depth()
+        while dispatcher.buffered < self._lookahead:
+            task = self._next_new()
+            if task is None:
+                break
+            dispatcher.push(task, now)
+        return dispatcher.pop(now)
+
+    def requeue(self, task: Dict[str, Any], priority: bool = False, delay: float = 0.0) -> None:
+        """
+        将任务放回队列等待重试，并唤醒一个等待中的 worker。
+
+        Args:
+            task: 任务字典
+            priority: True 时排在所有新任务之前（空白页重试），否则排在新任务之后
+            delay: 延迟多少秒后才能被取出（重试退避）
+        """
+        with self._cond:
+            if delay > 0:
+                self._delayed_seq += 1
+                heapq.heappush(self._delayed, (time.monotonic() + delay, self._delayed_seq, priority, task))
+            else:
+                (self._priority if priority else self._retries).append(task)
+            self._update_depth()
+            self._cond.notify()
+
+    def task_done(self, task: Optional[Dict[str, Any]] = None, state: Optional[str] = None) -> None:
+        """
+        标记一个任务最终结束（成功或放弃）。唤醒一个等待中的 worker 重新检查 URL 来源
+        （按目标调度的来源可能因此产出新的访问），最后一个任务结束时唤醒所有 worker 退出。
+        task 与 state 只有分布式队列（DistributedTaskQueue）使用。
+        """
+        with self._cond:
+            self._outstanding -= 1
+            OUTSTANDING_TASKS.set(self._outstanding)
+            if self._outstanding <= 0 and self._source is None:
+                self._cond.notify_all()
+            else:
+                self._cond.notify()
+
+    def finished(self) -> bool:
+        with self._cond:
+            return self._source is None and self._outstanding <= 0
+
+    def _update_depth(self) -> None:
+        QUEUE_DEPTH.set(len(self._priority) + len(self._retries) + len(self._delayed))
+
+
+class Scheduler:
+    """
+    多浏览器 worker 调度器：N 个 worker 线程各自从浏览器池借出会话，
+    从共享队列中取任务执行，并按 visit_failed / capture_start_failed / 空白页的语义重试。
+
+    分类结果通过 Future 完成回调处理：空白页与未通过校验的抓包在分类结束的同时以优先级重新入队，
+    worker 在队列上阻塞等待，不再轮询 pending 列表。重试按带抖动的指数退避延迟入队。
+    抓包服务熔断期间 worker 暂停取任务，因熔断而启动抓包失败的任务延后重试且不计入重试次数。
+    启用资源监控时编号不小于活跃 worker 数的 worker 暂停取任务，浏览器回收与扩缩容事件计入运行统计。
+
+    配置了 pcapng.worker_ports 时第 i 个 worker 使用其中第 i 项：浏览器通过该项的代理入口访问，
+    抓包只过滤该项的端口，并行访问的流量不会混入彼此的抓包。
+    """
+
+    def __init__(self, urls: Iterable[str], config: Dict[str, Any], pool: BrowserPool, workers: int,
+                 journal: Optional[RunJournal] = None, start_id: int = 0,
+                 pending: Optional[List[Dict[str, Any]]] = None, results: Optional[ResultsWriter] = None,
+                 quota: Optional[DomainQuota] = None, dispatcher: Optional[DomainDispatcher] = None,
+                 queue: Optional[DistributedTaskQueue] = None, monitor: Optional[ResourceMonitor] = None):
+        self.config = config
+        self.pool = pool
+        self.workers = max(1, int(workers))
+        visit_cfg = config.get("visit", {})
+        self.max_retries = max(1, int(visit_cfg.get("max_retries", 2)))
+        # 重试前带抖动的指数退避，而不是立即重新入队
+        self.retry_backoff = max(0.0, float(visit_cfg.get("retry_backoff", 1.0)))
+        self.retry_backoff_max = max(self.retry_backoff, float(visit_cfg.get("retry_backoff_max", 30.0)))
+        self.pcap_config = config.get("pcapng", {}) or {}
+        self.capture_breaker = get_capture_breaker(self.pcap_config) if self.pcap_config.get("service") else None
+        self.worker_ports = worker_ports(self.pcap_config)
+
+        self.journal = journal
+        self.results = results
+        self.quota = quota
+        self.dispatcher = dispatcher
+        politeness_cfg = (config.get("scheduler", {}) or {}).get("politeness", {}) or {}
+        # 预读足够多的新任务，避免排队的任务都属于正在限速的域名时 worker 空闲
+        lookahead = int(politeness_cfg.get("lookahead", 0)) or max(64, 16 * self.workers)
+        self.queue: Union[TaskQueue, DistributedTaskQueue] = (
+            queue if queue is not None else TaskQueue(urls, start_id, pending, journal, dispatcher, lookahead)
+        )
+        self.stats = RunStats(self.workers)
+        self.monitor = monitor
+        self.pool.on_recycle = self.stats.record_recycle
+        if monitor is not None:
+            monitor.on_scale = self.stats.record_scale
+
+    def run(self) -> None:
+        threads = [
+            threading.Thread(target=self._worker_loop, args=(worker_id,), name=f"browser-worker-{worker_id}", daemon=True)
+            for worker_id in range(self.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats.finish()
+
+    def _record(self, task: Dict[str, Any], state: str, **fields: Any) -> None:
+        """写入运行日志（未启用时忽略）"""
+        if self.journal is not None:
+            self.journal.record(task, state, **fields)
+
+    def _finish(self, task: Dict[str, Any], state: str, good: bool, **fields: Any) -> None:
+        """任务最终结束：写入运行日志，向按目标调度的来源报告结果，再结束队列中的任务"""
+        self._record(task, state, **fields)
+        if self.quota is not None:
+            self.quota.report(task["url"], good)
+        self.queue.task_done(task, state)
+
+    def _retry_or_abandon(self, task: Dict[str, Any], priority: bool = False, domain_signal: bool = False) -> None:
+        """
+        重试或放弃任务。
+
+        Args:
+            task: 任务字典
+            priority: 重试是否排在新任务之前（空白页）
+            domain_signal: 失败是否反映了域名本身（空白页、访问失败）。按目标调度时这类失败不按 URL 重试，
+                而是计入域名结果，由 DomainQuota 决定是否继续访问该域名
+        """
+        url = task["url"]
+        if domain_signal and self.quota is not None:
+            self.stats.record_abandon()
+            TASK_OUTCOMES.inc(outcome="abandoned")
+            self._finish(task, ABANDONED, False)
+            return
+        if task["attempts"] < self.max_retries:
+            logger.info(f"重新加入队列进行重试: {url}")
+            task["attempts"] += 1
+            self.stats.record_retry()
+            TASK_OUTCOMES.inc(outcome="retry")
+            self._record(task, BLANK_RETRY if priority else RETRY)
+            delay = backoff_delay(task["attempts"], self.retry_backoff, self.retry_backoff_max)
+            self.queue.requeue(task, priority=priority, delay=delay)
+        else:
+            logger.error(f"达到最大重试次数，放弃任务: {url}")
+            self.stats.record_abandon()
+            TASK_OUTCOMES.inc(outcome="abandoned")
+            self._finish(task, ABANDONED, False)
+
+    def _requeue_unavailable(self, task: Dict[str, Any], reason: str = "抓包服务不可用") -> None:
+        """抓包服务熔断、分类队列已满等与 URL 无关的失败：不消耗重试次数，延后再访问"""
+        logger.warning(f"{reason}，任务延后重试（不计入重试次数）: {task['url']}")
+        self.stats.record_retry()
+        TASK_OUTCOMES.inc(outcome="retry")
+        self._record(task, RETRY)
+        self.queue.requeue(task, delay=backoff_delay(1, self.retry_backoff, self.retry_backoff_max))
+
+    def _on_classified(self, task: Dict[str, Any], result: Dict[str, Any], future: Future) -> None:
+        """异步分类完成回调（在分类线程中执行）：空白页立即优先重新入队"""
+        url = task["url"]
+        try:
+            async_result = future.result()
+        except Exception as e:
+            logger.error(f"获取异步任务结果失败 ({url}): {e}")
+            if self.results is not None:
+                self.results.add(task, result, {"error": str(e)})
+            self._finish(task, ABANDONED, False, error=str(e))
+            return
+
+        try:
+            if self.results is not None:
+                # 在重试改变 attempts 之前记录本次访问
+                self.results.add(task, result, async_result)
+            self.stats.record_timings(async_result.get("timings") or {})
+            is_blank = async_result.get("is_blank", False)
+            capture_invalid = async_result.get("capture_invalid", False)
+            prediction = async_result.get("prediction")
+            self.queue.feedback(task, bad=is_blank or capture_invalid)
+            if is_blank:
+                logger.warning(f"异步分类检测到空白页: {url}, 预测: {prediction}")
+                self.stats.record_blank()
+                self._retry_or_abandon(task, priority=True, domain_signal=True)
+            elif capture_invalid:
+                # 抓包几乎为空（如代理断开），与空白页一样重试
+                logger.warning(f"抓包校验未通过: {url}, {async_result.get('error')}")
+                self.stats.record_invalid_capture()
+                self._retry_or_abandon(task, priority=True, domain_signal=True)
+            else:
+                logger.info(f"异步任务确认成功: {url}, 预测: {prediction}")
+                self.stats.record_success()
+                TASK_OUTCOMES.inc(outcome="success")
+                # 只有真正的分类结果或预过滤判定为有内容才计入按目标调度的非空白抓包
+                self._finish(task, CLASSIFIED, has_content_verdict(async_result), prediction=prediction)
+        except Exception as e:
+            # 回调中的异常会被 Future 吞掉，这里必须结束任务，否则运行永远无法完成
+            logger.error(f"处理异步分类结果时发生异常 ({url}): {e}", exc_info=True)
+            self._finish(task, ABANDONED, False, error=str(e))
+
+    def _worker_loop(self, worker_id: int) -> None:
+        # 上一次访问时预先取出的任务及为其提前启动的抓包
+        next_task: Optional[Dict[str, Any]] = None
+        capture: Optional[Dict[str, Any]] = None
+        while True:
+            if next_task is None and self.monitor is not None:
+                # 主机资源不足时缩容：超出活跃数的 worker 暂停，全部任务结束时退出
+                if not self.monitor.wait_active(worker_id, self.queue.finished):
+                    return
+            if next_task is None and self.capture_breaker is not None:
+                # 抓包服务熔断期间暂停取任务，避免产生没有抓包的无效访问
+                self.capture_breaker.wait_until_available()
+            # 阻塞直到有任务可取；返回 None 表示所有任务均已结束
+            task, next_task = (next_task or self.queue.get()), None
+            if task is None:
+                return
+
+            url = task["url"]
+            attempts = task["attempts"]
+            logger.info(f"[worker #{worker_id}] 开始处理任务 ({attempts + 1}/{self.max_retries + 1}): {url}")
+
+            def prefetch() -> Optional[str]:
+                nonlocal next_task
+                next_task = self.queue.get(block=False)
+                return next_task["url"] if next_task is not None else None
+
+            def on_capture(domain: str, idx: str, prefetched: bool = False, task: Dict[str, Any] = task) -> None:
+                # 提前启动的抓包属于 prefetch 取出的下一个任务，在 start 发出前记录，崩溃后恢复时才能清理
+                target = next_task if prefetched else task
+                target["domain"], target["idx"] = domain, idx
+                self._record(target, CAPTURING)
+
+            # 调用单次处理逻辑
+            started = time.perf_counter()
+            ports = self.worker_ports[worker_id] if self.worker_ports else None
+            try:
+                result = process_single_url(self.pool, url, self.config, capture, prefetch, on_capture, ports)
+            except Exception as e:
+                logger.error(f"处理任务时发生异常 ({url}): {e}", exc_info=True)
+                result = {"status": "error", "error": str(e)}
+            self.queue.release(task)
+            capture = result.get("next_capture")
+            status = result["status"]
+            self._record(task, VISITED, status=status)
+            self.stats.record_visit(worker_id, status, time.perf_counter() - started)
+            self.stats.record_settle(result.get("visit_info") or {})
+            self.stats.record_timings(result.get("timings") or {})
+
+            if self.results is not None and not (status == "success" and result.get("future")):
+                self.results.add(task, result)
+
+            if status == "success":
+                future = result.get("future")
+                if future:
+                    # 分类完成时由回调决定成功或重试；若已完成则回调立即在当前线程执行
+                    future.add_done_callback(lambda f, task=task, result=result: self._on_classified(task, result, f))
+                else:
+                    # 如果没有 future (例如分类服务未启用)，则视为直接完成
+                    logger.info(f"任务完成 (无异步分类): {url}")
+                    self.stats.record_success()
+                    TASK_OUTCOMES.inc(outcome="success")
+                    # 没有分类结果，无法确认非空白，不计入按目标调度的非空白抓包
+                    self._finish(task, CLASSIFIED, False, prediction=None)
+            else:
+                logger.warning(f"任务失败 ({status}): {url}")
+                if status == "visit_failed":
+                    self.queue.feedback(task, bad=True)
+                if status == "capture_start_failed" and not capture_available(self.pcap_config):
+                    self._requeue_unavailable(task)
+                    continue
+                if status == "classify_shed":
+                    # 分类并发已达上限时丢弃的访问，等分类积压消化后再访问
+                    self._requeue_unavailable(task, "分类队列已满")
+                    continue
+                # 同步失败的重试逻辑 (例如访问超时)，排在新任务之后
+                self._retry_or_abandon(task, domain_signal=(status == "visit_failed"))
+
+
+def run_tasks(urls: Optional[Union[str, Iterable[str]]] = None,
+              config: Optional[Dict[str, Any]] = None,
+              driver_factory: Optional[Callable[[], Any]] = None,
+              resume: bool = False, fresh: bool = False) -> Optional[Dict[str, Any]]:
     """
     启动任务队列，处理所有 URL。
-    
+
     Args:
         urls: 可选的 URL 列表。如果未提供，将从配置文件指定的网站列表中读取。
+        config: 可选的配置字典，未提供时从 config.yaml 加载
+        driver_factory: 可选的浏览器创建函数，默认启动 Firefox（基准测试中替换为模拟驱动）
+        resume: 从运行日志恢复：跳过已读取的任务，未结束的任务重新入队，并清理中断时仍在进行的抓包。
+            URL 来源必须与中断的那次运行相同。
+        fresh: 运行日志已有记录时仍从头开始并覆盖；未指定 resume 或 fresh 时拒绝覆盖已有的运行日志
+
+    Returns:
+        本次运行的吞吐量汇总；没有任务时返回 None。
     """
-    config = load_config()
-    
-    # 1. 获取 URL 列表
-    normalized_urls = _normalize_urls(urls)
-    if not normalized_urls:
+    if config is None:
+        config = load_config()
+
+    # 1. 获取 URL 列表（从文件读取时为惰性迭代器，边读边调度）
+    tasks: Iterable[str] = _normalize_urls(urls)
+    quota: Optional[DomainQuota] = None
+    if not tasks:
         websites_cfg = config.get("websites", {})
         websites_file = websites_cfg.get("file", "websites.txt")
         visit_count = int(websites_cfg.get("count", 1))
-        
-        try:
-            logger.info(f"从文件加载 URL: {websites_file}, 每个访问 {visit_count} 次")
-            normalized_urls = get_tasks_mode_1(websites_file, visit_count)
-        except FileNotFoundError:
+
+        if not os.path.exists(websites_file):
             logger.error(f"网站列表文件不存在: {websites_file}")
-            return
-            
-    if not normalized_urls:
+            return None
+        if (config.get("scheduler", {}) or {}).get("mode", "fixed") == "quota":
+            if resume:
+                logger.error("按目标调度（scheduler.mode: quota）不支持 --resume")
+                return None
+            if not (config.get("service", {}) or {}).get("resnet18_url"):
+                # 没有分类结果就无法确认非空白抓包，每个域名都只会消耗访问次数直到放弃
+                logger.error("按目标调度（scheduler.mode: quota）需要识别服务（service.resnet18_url）")
+                return None
+            quota = DomainQuota.from_config(config)
+            logger.info(f"从文件加载 URL: {websites_file}, 按目标调度: 每个域名 {quota.target} 个非空白抓包, "
+                        f"最多访问 {quota.max_visits} 次")
+            tasks = quota
+        else:
+            logger.info(f"从文件加载 URL: {websites_file}, 每个访问 {visit_count} 次")
+            tasks = iter_tasks_mode_1(websites_file, visit_count)
+
+    dist_cfg = config.get("distributed", {}) or {}
+    distributed = bool(dist_cfg.get("enabled", False))
+    if distributed and (resume or quota is not None):
+        # 共享队列本身在节点重启后继续，租约过期的任务会重新分配
+        logger.error("分布式模式（distributed.enabled）不支持 --resume 与按目标调度")
+        return None
+
+    journal_cfg = config.get("journal", {}) or {}
+    journal_file = journal_cfg.get("file", "run_journal.jsonl")
+    if journal_cfg.get("enabled", False) and not resume and not fresh and _has_entries(journal_file):
+        # 未完成的运行只能靠运行日志恢复，默认不覆盖
+        logger.error(f"运行日志已有记录: {journal_file}，请使用 --resume 恢复，或使用 --fresh 覆盖后重新开始")
+        return None
+
+    task_iter = iter(tasks)
+    start_id = 0
+    pending: List[Dict[str, Any]] = []
+    if resume:
+        journal_state = load_journal(journal_file)
+        logger.info(f"从运行日志恢复: {journal_file}, 已结束 {journal_state.finished} 个, "
+                    f"待重新入队 {len(journal_state.pending)} 个, 待清理抓包 {len(journal_state.orphans)} 个")
+        start_id = journal_state.consumed
+        pending = journal_state.pending
+        task_iter = itertools.islice(task_iter, start_id, None)
+
+    first_url = next(task_iter, None)
+    if first_url is None and not pending:
         logger.info("没有需要访问的 URL")
-        return
-
-    # 2. 初始化配置参数
-    visit_cfg = config.get("visit", {})
-    max_retries = max(1, int(visit_cfg.get("max_retries", 2)))
-    
-    # 3. 初始化任务队列
-    # 队列元素: {"url": url, "attempts": 0}
-    task_queue = deque({"url": url, "attempts": 0} for url in normalized_urls)
-    logger.info(f"总任务数: {len(task_queue)}")
-    
-    # 存储正在运行的异步任务: {future: task_info}
-    pending_futures: Dict[Future, Dict[str, Any]] = {}
-
-    # 4. 初始化浏览器
-    driver = None
+        return None
+    tasks = itertools.chain([first_url], task_iter) if first_url is not None else task_iter
+
+    # 2. 初始化 worker 与浏览器池，每个 worker 至少对应一个浏览器会话
+    scheduler_cfg = config.get("scheduler", {}) or {}
+    workers = max(1, int(scheduler_cfg.get("workers", 1)))
+    pcap_config = config.get("pcapng", {}) or {}
     try:
-        driver = get_firefox_driver()
-        
-        while task_queue or pending_futures:
-            # --- 检查异步任务结果 ---
-            # 找出已完成的 futures
-            done_futures = [f for f in pending_futures if f.done()]
-            for future in done_futures:
-                task = pending_futures.pop(future)
-                url = task["url"]
-                attempts = task["attempts"]
-                
-                try:
-                    async_result = future.result()
-                    is_blank = async_result.get("is_blank", False)
-                    prediction = async_result.get("prediction")
-                    
-                    if is_blank:
-                        logger.warning(f"异步分类检测到空白页: {url}, 预测: {prediction}")
-                        if attempts < max_retries:
-                            logger.info(f"重新加入队列进行重试: {url}")
-                            task["attempts"] += 1
-                            task_queue.append(task)
-                        else:
-                            logger.error(f"达到最大重试次数，放弃任务: {url}")
-                    else:
-                        logger.info(f"异步任务确认成功: {url}, 预测: {prediction}")
-                        
-                except Exception as e:
-                    logger.error(f"获取异步任务结果失败 ({url}): {e}")
-
-            # --- 处理下一个任务 ---
-            if task_queue:
-                task = task_queue.popleft()
-                url = task["url"]
-                attempts = task["attempts"]
-                
-                logger.info(f"开始处理任务 ({attempts + 1}/{max_retries + 1}): {url}")
-                
-                # 调用单次处理逻辑
-                result = process_single_url(driver, url, config)
-                status = result["status"]
-                
-                if status == "success":
-                    # 任务提交成功，如果有 future，加入 pending 列表
-                    future = result.get("future")
-                    if future:
-                        pending_futures[future] = task
-                    else:
-                        # 如果没有 future (例如分类服务未启用)，则视为直接完成
-                        logger.info(f"任务完成 (无异步分类): {url}")
-                else:
-                    logger.warning(f"任务失败 ({status}): {url}")
-                    # 同步失败的重试逻辑 (例如访问超时)
-                    if attempts < max_retries:
-                        logger.info(f"重新加入队列进行重试: {url}")
-                        task["attempts"] += 1
-                        task_queue.append(task)
-                    else:
-                        logger.error(f"达到最大重试次数，放弃任务: {url}")
-            
-            # 如果没有任务了，但还有 pending futures，稍微等待一下避免空转
-            elif pending_futures:
-                time.sleep(0.5)
+        ports = worker_ports(pcap_config)
+    except ValueError as e:
+        logger.error(f"抓包端口配置错误: {e}")
+        return None
+    if ports and len(ports) < workers:
+        logger.error(f"pcapng.worker_ports 只有 {len(ports)} 项，少于 worker 数 {workers}")
+        return None
+    if workers > 1 and not ports and pcap_config.get("service"):
+        # 抓包服务只按端口过滤，所有浏览器共用同一个代理入口时每个抓包都包含其他 worker 的流量
+        logger.warning(f"{workers} 个 worker 共用代理端口 {(config.get('proxy', {}) or {}).get('port')}，"
+                       f"每个抓包都会混入其他 worker 的访问流量；请为每个 worker 配置 pcapng.worker_ports")
+    pool = BrowserPool.from_config(config, driver_factory)
+    pool.size = max(pool.size, workers)
+    monitor = ResourceMonitor.from_config(config, pool, workers)
+    if monitor is not None:
+        if monitor.autoscale:
+            # 从 min_workers 个会话开始，由资源监控按主机内存与负载逐步扩容
+            pool.resize(monitor.active)
+            logger.info(f"自动调整 worker 数: {monitor.min_workers}-{monitor.max_workers}, "
+                        f"保留可用内存 {monitor.min_free_mb:.0f}MB")
+        if monitor.max_rss_mb:
+            logger.info(f"单个浏览器内存超过 {monitor.max_rss_mb:.0f}MB 时回收")
+
+    # 3. 初始化任务队列与运行日志
+    journal = RunJournal.from_config(config, append=resume)
+    results = ResultsWriter.from_config(config)
+    if resume:
+        _reconcile_orphans(config, journal_state.orphans, journal)
+    distributed_queue: Optional[DistributedTaskQueue] = None
+    if distributed:
+        # 节点名称写回配置，抓包 (domain, idx) 以此作为命名空间
+        dist_cfg["node_id"] = resolve_node_id(dist_cfg)
+        backend = open_backend(dist_cfg)
+        if not backend.seed(tasks):
+            logger.info("共享任务队列已由其他节点初始化（或正在写入），直接加入")
+        distributed_queue = DistributedTaskQueue.from_config(backend, config)
+        logger.info(f"分布式模式: 节点 {distributed_queue.node_id}, 后端 {dist_cfg.get('backend', 'sqlite')}, "
+                    f"租约 {distributed_queue.lease_seconds}s")
+    dispatcher = DomainDispatcher.from_config(config)
+    if dispatcher is not None and distributed:
+        logger.warning("分布式模式下不按域名限速，忽略 scheduler.politeness")
+        dispatcher = None
+    if dispatcher is not None:
+        logger.info(f"按域名限速: 每个域名最多 {dispatcher.max_concurrency} 个并发访问, "
+                    f"最小访问间隔 {dispatcher.min_interval}s")
+    scheduler = Scheduler(tasks, config, pool, workers, journal, start_id, pending, results, quota, dispatcher,
+                          distributed_queue, monitor)
+    logger.info(f"开始调度, worker 数: {workers}")
 
+    exporter = MetricsExporter.from_config(config)
+
+    try:
+        if exporter is not None:
+            # 端口被占用等启动失败时同样进入 finally，关闭浏览器池、运行日志与结果索引
+            exporter.start()
+        pool.warm_up([entry["socks"] for entry in ports])
+        if monitor is not None:
+            monitor.start()
+        scheduler.run()
     except Exception as e:
         logger.critical(f"任务执行过程中发生严重错误: {e}", exc_info=True)
     finally:
-        if driver:
-            logger.info("关闭浏览器")
-            driver.quit()
+        if monitor is not None:
+            monitor.stop()
+        logger.info("关闭浏览器池")
+        pool.close()
+        # 正常结束时分类均已完成；异常退出时等待排队的分类完成，超时后取消
+        classification_executor = shutdown_classification_executor()
+        if not flush_writer(timeout=60):
+            logger.warning("等待截图写盘超时")
+        if not flush_capture_controller(timeout=60):
+            logger.warning("等待抓包控制请求完成超时")
+        scheduler.stats.finish()
+        logger.info(f"总任务数: {scheduler.queue.total}")
+        logger.info("运行统计:\n" + scheduler.stats.format_summary())
+        if quota is not None:
+            logger.info(f"按目标调度统计: {quota.format_summary()}")
+        if dispatcher is not None:
+            logger.info(f"按域名限速统计: {dispatcher.format_stats()}")
+        if monitor is not None:
+            logger.info(f"资源监控统计: {monitor.format_stats()}")
+        classification_cache = get_classification_cache(config.get("service", {}) or {})
+        if classification_cache is not None:
+            classification_cache.save()
+            logger.info(f"分类缓存统计: {classification_cache.format_stats()}")
+        if classification_executor is not None:
+            logger.info(f"分类并发统计: {classification_executor.format_stats()}")
+        batch_classifier = get_batch_classifier(config.get("service", {}) or {})
+        if batch_classifier is not None:
+            logger.info(f"微批分类统计: {batch_classifier.format_stats()}")
+        capture_controller = get_capture_controller(config.get("pcapng", {}) or {})
+        if capture_controller is not None:
+            logger.info(f"抓包控制统计: {capture_controller.format_stats()}")
+        batch_capture_client = get_batch_capture_client(config.get("pcapng", {}) or {})
+        if batch_capture_client is not None:
+            logger.info(f"批量抓包控制统计: {batch_capture_client.format_stats()}")
+        for breaker in (get_capture_breaker(config.get("pcapng", {}) or {}),
+                        get_classifier_breaker(config.get("service", {}) or {})):
+            if breaker is not None:
+                logger.info(f"熔断统计: {breaker.format_stats()}")
+        http_stats = get_client().format_stats()
+        if http_stats:
+            logger.info("服务接口调用统计:\n" + http_stats)
+        if distributed_queue is not None:
+            distributed_queue.close()
+            logger.info(f"共享任务队列状态: {distributed_queue.backend.status()}")
+            if distributed_queue.lost:
+                logger.warning(f"本节点有 {distributed_queue.lost} 个任务因租约过期被其他节点重新执行")
+            distributed_queue.backend.close()
+        if journal is not None:
+            journal.close()
+        if results is not None:
+            results.close()
+            logger.info(f"结果索引已写入 {results.written} 条: {results.path} (run_id {results.run_id})")
+        if exporter is not None:
+            exporter.stop()
+
+    return scheduler.stats.summary()
+
+def _has_entries(path: str) -> bool:
+    """文件存在且非空"""
+    try:
+        return os.path.getsize(path) > 0
+    except OSError:
+        return False
+
+
+def _reconcile_orphans(config: Dict[str, Any], orphans: List[Tuple[str, str]], journal: RunJournal) -> None:
+    """停止并删除中断运行时仍在进行或尚未分类的抓包及其截图，并在运行日志中标记为已清理"""
+    pcap_config = config.get("pcapng", {}) or {}
+    screenshots_dir = (config.get("file", {}) or {}).get("screenshots_dir", "screenshots")
+    for domain, idx in orphans:
+        logger.info(f"清理中断运行遗留的抓包: {domain} #{idx}")
+        if pcap_config.get("service"):
+            stop_capture_task(pcap_config, domain, idx)
+            delete_capture_files(pcap_config, domain, idx)
+        try:
+            os.remove(os.path.join(screenshots_dir, domain, f"{idx}.png"))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"删除遗留截图失败 ({domain} #{idx}): {e}")
+        journal.record_capture(domain, idx, CLEANED)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="按配置访问网站列表并抓包")
+    parser.add_argument("--config", default="config.yaml", help="配置文件路径")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true", help="从运行日志（journal.file）恢复中断的运行")
+    mode.add_argument("--fresh", action="store_true", help="运行日志已有记录时覆盖并重新开始")
+    args = parser.parse_args()
+    run_tasks(config=load_config(args.config), resume=args.resume, fresh=args.fresh)
+
 
 if __name__ == "__main__":
-    run_tasks()
+    main()
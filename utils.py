@@ -1,16 +1,29 @@
 import os
+from collections import deque
 from pathlib import Path
 import re
-from typing import Dict, Optional
+from typing import Dict, Iterator, Optional
 
 import yaml
 from urllib.parse import urlparse
 from config_manager import load_config
+from index_allocator import IndexAllocator
+
+# 进程内共享的截图索引分配器
+_index_allocator = IndexAllocator()
 
 def parse_domain(url: str) -> str:
     """提取 URL 的域名部分"""
     return urlparse(url).netloc
     
+def _iter_urls(filename: str) -> Iterator[str]:
+    """逐行读取网站列表文件，跳过空行"""
+    with open(filename, 'r') as f:
+        for line in f:
+            url = line.strip()
+            if url:
+                yield url
+
 def load_websites(filename: str, count: int) -> tuple[dict, int]:
     """
     返回的数据格式
@@ -19,14 +32,9 @@ def load_websites(filename: str, count: int) -> tuple[dict, int]:
     }
     total 总访问次数
     """
-    with open(filename, 'r') as f:
-        lines = f.readlines()
     websites = {}
     total = 0
-    for line in lines:
-        url = line.strip()
-        if not url:
-            continue
+    for url in _iter_urls(filename):
         domain = parse_domain(url)
         if domain not in websites:
             websites[domain] = {"url": [], "count": count}
@@ -42,14 +50,9 @@ def load_websites_simple(filename: str) -> tuple[dict, int]:
     }
     total 总访问次数
     """
-    with open(filename, 'r') as f:
-        lines = f.readlines()
     websites = {}
     total = 0
-    for line in lines:
-        url = line.strip()
-        if not url:
-            continue
+    for url in _iter_urls(filename):
         domain = parse_domain(url)
         if domain not in websites:
             websites[domain] = {"url": [], "count": 0}
@@ -96,7 +99,56 @@ def get_tasks_mode_2(filename="websites.txt"):
                 total -= 1
     return tasks
 
+def iter_tasks_mode_1(filename="websites.txt", count=1) -> Iterator[str]:
+    """
+    模式一的惰性版本，产出顺序与 get_tasks_mode_1 完全一致。
+
+    第一轮在读取文件的同时产出（每个域名第一次出现时即产出其第一个 url），
+    之后只在仍有剩余次数的域名之间轮询，每个任务 O(1)。
+    由于第 r 轮使用 urls[r % len(urls)]，每个域名最多只需保留前 count 个 url。
+    """
+    if count <= 0:
+        return
+    websites: Dict[str, list] = {}
+    for url in _iter_urls(filename):
+        domain = parse_domain(url)
+        urls = websites.get(domain)
+        if urls is None:
+            websites[domain] = [url]
+            yield url
+        elif len(urls) < count:
+            urls.append(url)
+
+    for round_idx in range(1, count):
+        for urls in websites.values():
+            yield urls[round_idx % len(urls)]
+
+def iter_tasks_mode_2(filename="websites.txt") -> Iterator[str]:
+    """
+    模式二的惰性版本，产出顺序与 get_tasks_mode_2 完全一致。
 
+    第一轮在读取文件的同时产出，之后用活跃域名队列轮询，每个域名只保存 url 列表与读取位置，
+    url 已经取完的域名直接移出队列，每个任务 O(1)。
+    """
+    websites: Dict[str, list] = {}
+    for url in _iter_urls(filename):
+        domain = parse_domain(url)
+        urls = websites.get(domain)
+        if urls is None:
+            websites[domain] = []
+            yield url
+        else:
+            urls.append(url)
+
+    active = deque([urls, 0] for urls in websites.values() if urls)
+    websites.clear()
+    while active:
+        entry = active.popleft()
+        urls, pos = entry
+        yield urls[pos]
+        if pos + 1 < len(urls):
+            entry[1] = pos + 1
+            active.append(entry)
 
 
 def _sanitize_domain(domain: str) -> str:
@@ -106,17 +158,6 @@ def _sanitize_domain(domain: str) -> str:
     return re.sub(r"[^A-Za-z0-9._-]", "_", domain)
 
 
-def _next_screenshot_index(directory: Path) -> int:
-    """基于现有截图文件推断下一个索引"""
-    max_index = -1
-    for image_path in directory.glob("*.png"):
-        try:
-            max_index = max(max_index, int(image_path.stem))
-        except ValueError:
-            continue
-    return max_index + 1
-
-
 def gen_screenshot(url: str, config: Optional[dict] = None) -> str:
     """生成截图文件路径，并确保目录存在"""
     return prepare_capture_context(url, config)["screenshot_path"]
@@ -133,13 +174,18 @@ def prepare_capture_context(url: str, config: Optional[dict] = None) -> Dict[str
     domain_dir = Path(root_dir) / domain
     domain_dir.mkdir(parents=True, exist_ok=True)
 
-    index = _next_screenshot_index(domain_dir)
-    screenshot_path = domain_dir / f"{index}.png"
+    index = _index_allocator.reserve(domain_dir)
+    index_str = str(index)
+    dist_cfg = config.get("distributed", {}) or {}
+    if dist_cfg.get("enabled") and dist_cfg.get("node_id"):
+        # 分布式模式：以节点名称作为命名空间，多个节点的抓包文件在抓包服务上不会冲突
+        index_str = f"{dist_cfg['node_id']}-{index}"
+    screenshot_path = domain_dir / f"{index_str}.png"
 
     return {
         "domain": domain,
         "index": index,
-        "index_str": str(index),
+        "index_str": index_str,
         "screenshot_path": str(screenshot_path),
         "directory": str(domain_dir),
     }
\ No newline at end of file
@@ -1,9 +1,13 @@
 import time
 import logging
+from typing import Any, Dict, Optional
+
 from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.common.exceptions import TimeoutException, WebDriverException
 
+from screenshot_writer import get_writer
+
 # 配置日志
 logger = logging.getLogger(__name__)
 
@@ -22,7 +26,108 @@ def _wait_for_ready_state(driver: WebDriver, timeout: int) -> None:
     except TimeoutException:
         logger.warning("等待页面 readyState complete 超时")
 
-def _simulate_user_scroll(driver: WebDriver, steps: int, distance: int, pause: float) -> None:
+# 在页面中注册资源加载与 DOM 变化的观察器，记录最后一次变化的时间。
+# 属性变化只关注图片地址（src/srcset），轮播、CSS 动画等持续修改 style/class 的页面不会因此永远不静默
+_SETTLE_OBSERVER_SCRIPT = """
+if (!window.__captureSettle) {
+    var state = {resources: 0, lastChange: performance.now(), decoded: new WeakMap()};
+    window.__captureSettle = state;
+    try {
+        new PerformanceObserver(function (list) {
+            state.resources += list.getEntries().length;
+            state.lastChange = performance.now();
+        }).observe({type: 'resource', buffered: true});
+    } catch (e) {}
+    try {
+        new MutationObserver(function () {
+            state.lastChange = performance.now();
+        }).observe(document, {childList: true, subtree: true, characterData: true,
+                              attributes: true, attributeFilter: ['src', 'srcset']});
+    } catch (e) {}
+}
+"""
+
+# 读取页面当前的稳定信号：readyState、资源数、静默时长、视口内尚未解码完成的图片数。
+# 图片通过 img.decode() 确认解码完成（失败的图片同样视为完成），不支持时退回 complete 与 naturalWidth
+_SETTLE_PROBE_SCRIPT = """
+var state = window.__captureSettle;
+var pending = 0;
+var height = window.innerHeight;
+for (var i = 0; i < document.images.length; i++) {
+    var img = document.images[i];
+    var rect = img.getBoundingClientRect();
+    if (rect.bottom <= 0 || rect.top >= height) continue;
+    if (state && typeof img.decode === 'function') {
+        var src = img.currentSrc || img.src;
+        if (!src) continue;
+        var entry = state.decoded.get(img);
+        if (!entry || entry.src !== src) {
+            entry = {src: src, done: false};
+            state.decoded.set(img, entry);
+            img.decode().then(function () { this.done = true; }.bind(entry),
+                               function () { this.done = true; }.bind(entry));
+        }
+        if (!entry.done) pending++;
+    } else if (!img.complete || (img.currentSrc && img.naturalWidth === 0)) {
+        pending++;
+    }
+}
+return {
+    readyState: document.readyState,
+    installed: !!state,
+    resources: state ? state.resources : 0,
+    quietMs: state ? performance.now() - state.lastChange : 0,
+    pendingImages: pending
+};
+"""
+
+# 自适应模式下滚动之间的停顿，懒加载由后续的稳定检测兜底
+_ADAPTIVE_SCROLL_PAUSE = 0.15
+
+def _install_settle_observer(driver: WebDriver) -> None:
+    """注册页面稳定观察器，页面不允许执行脚本时静默跳过"""
+    try:
+        driver.execute_script(_SETTLE_OBSERVER_SCRIPT)
+    except WebDriverException as e:
+        logger.debug(f"注册页面稳定观察器失败: {e}")
+
+def _wait_for_page_settle(driver: WebDriver, quiet: float, max_wait: float, poll: float) -> bool:
+    """
+    等待页面稳定：readyState 为 complete、视口内图片全部解码完成，且资源加载与 DOM 变化静默 quiet 秒。
+    
+    Args:
+        driver: WebDriver 实例
+        quiet: 静默窗口（秒）
+        max_wait: 最长等待时间（秒）
+        poll: 轮询间隔（秒）
+        
+    Returns:
+        bool: 在 max_wait 内稳定返回 True，超时返回 False
+    """
+    deadline = time.monotonic() + max_wait
+    quiet_ms = quiet * 1000
+    while True:
+        try:
+            probe = driver.execute_script(_SETTLE_PROBE_SCRIPT) or {}
+        except WebDriverException as e:
+            logger.debug(f"读取页面稳定信号失败: {e}")
+            probe = {}
+
+        if not probe.get("installed"):
+            # 页面发生了跳转，观察器随旧文档一起丢失，需要重新注册
+            _install_settle_observer(driver)
+        elif (probe.get("readyState") == "complete"
+                and not probe.get("pendingImages")
+                and probe.get("quietMs", 0) >= quiet_ms):
+            logger.debug(f"页面已稳定, 资源数: {probe.get('resources')}")
+            return True
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        time.sleep(min(poll, remaining))
+
+def _simulate_user_scroll(driver: WebDriver, steps: int, distance: int, pause: float, top_pause: float = 0.5) -> None:
     """
     通过滚动模拟用户行为，改善页面渲染效果。
     
@@ -31,23 +136,40 @@ def _simulate_user_scroll(driver: WebDriver, steps: int, distance: int, pause: f
         steps: 滚动次数
         distance: 每次滚动距离（像素）
         pause: 每次滚动后的暂停时间（秒）
+        top_pause: 滚回顶部后的等待时间（秒）
     """
     for _ in range(max(1, steps)):
         driver.execute_script("window.scrollBy(0, arguments[0]);", distance)
         time.sleep(max(0.1, pause))
     # 滚回顶部
     driver.execute_script("window.scrollTo(0, 0);")
-    time.sleep(0.5) # 等待滚回顶部完成
+    if top_pause > 0:
+        time.sleep(top_pause) # 等待滚回顶部完成
+
+def _take_screenshot(driver: WebDriver, screenshot_path: str, in_memory: bool, visit_info: Dict[str, Any]) -> None:
+    """
+    截图。in_memory 模式下以 PNG 字节形式放入 visit_info["screenshot_png"]，
+    文件交给后台线程异步写盘，写盘的 Future 放入 visit_info["screenshot_write"]。
+    """
+    if not in_memory:
+        driver.save_screenshot(screenshot_path)
+        return
+    png = driver.get_screenshot_as_png()
+    visit_info["screenshot_png"] = png
+    visit_info["screenshot_write"] = get_writer().write(screenshot_path, png)
 
-def visit_page(driver: WebDriver, url: str, screenshot_path: str, config: dict) -> bool:
+def visit_page(driver: WebDriver, url: str, screenshot_path: str, config: dict,
+               visit_info: Optional[Dict[str, Any]] = None) -> bool:
     """
-    访问单个 URL，执行滚动操作并截图。
+    访问单个 URL，执行滚动操作并截图。浏览器的复用与退出由调用方（浏览器池）负责。
     
     Args:
         driver: WebDriver 实例
         url: 目标 URL
         screenshot_path: 截图保存路径
         config: 配置字典
+        visit_info: 可选字典，用于回传页面稳定等待的模式、耗时与相对固定等待节省的时间，
+            以及内存截图模式下的截图字节
         
     Returns:
         bool: 访问并截图成功返回 True，否则返回 False
@@ -60,6 +182,15 @@ def visit_page(driver: WebDriver, url: str, screenshot_path: str, config: dict)
     scroll_pixels = int(visit_cfg.get("scroll_pixels", 400))
     scroll_pause = float(visit_cfg.get("scroll_pause", 0.8))
     settle_pause = float(visit_cfg.get("post_wait", 1.0))
+    settle_mode = str(visit_cfg.get("settle_mode", "fixed")).lower()
+    settle_quiet = float(visit_cfg.get("settle_quiet", 0.5))
+    settle_max_wait = float(visit_cfg.get("settle_max_wait", 3.5))
+    settle_poll = float(visit_cfg.get("settle_poll", 0.1))
+    in_memory = bool(visit_cfg.get("screenshot_in_memory", False))
+    # 固定模式下滚动与等待的总耗时，用于计算自适应模式节省的时间
+    fixed_schedule = max(1, scroll_steps) * max(0.1, scroll_pause) + 0.5 + settle_pause
+    if visit_info is None:
+        visit_info = {}
 
     try:
         logger.info(f"正在访问: {url}")
@@ -68,21 +199,41 @@ def visit_page(driver: WebDriver, url: str, screenshot_path: str, config: dict)
         
         # _wait_for_ready_state(driver, timeout)
         
-        # 模拟滚动以触发懒加载
-        _simulate_user_scroll(driver, scroll_steps, scroll_pixels, scroll_pause)
-        
-        # 等待页面稳定
-        time.sleep(settle_pause)
+        settle_start = time.perf_counter()
+        if settle_mode == "adaptive":
+            # 根据页面信号判断稳定，最长不超过 settle_max_wait
+            _install_settle_observer(driver)
+            _simulate_user_scroll(driver, scroll_steps, scroll_pixels,
+                                  min(scroll_pause, _ADAPTIVE_SCROLL_PAUSE), top_pause=0)
+            settled = _wait_for_page_settle(driver, settle_quiet, settle_max_wait, settle_poll)
+            if not settled:
+                logger.debug(f"页面在 {settle_max_wait}s 内未稳定，直接截图: {url}")
+        else:
+            # 模拟滚动以触发懒加载
+            _simulate_user_scroll(driver, scroll_steps, scroll_pixels, scroll_pause)
+            
+            # 等待页面稳定
+            time.sleep(settle_pause)
+            settled = True
+        settle_elapsed = time.perf_counter() - settle_start
+        visit_info.update({
+            "settle_mode": settle_mode,
+            "settled": settled,
+            "settle_elapsed": settle_elapsed,
+            "settle_saved": fixed_schedule - settle_elapsed,
+        })
+        if settle_mode == "adaptive":
+            logger.info(f"页面稳定等待 {settle_elapsed:.2f}s, 相比固定等待节省 {fixed_schedule - settle_elapsed:.2f}s")
         
         # 截图
         logger.info(f"保存截图到: {screenshot_path}")
-        driver.save_screenshot(screenshot_path)
+        _take_screenshot(driver, screenshot_path, in_memory, visit_info)
         return True
         
     except TimeoutException:
         # 访问超时
         logger.warning(f"访问超时: {url}, 截图保存到: {screenshot_path}")
-        driver.save_screenshot(screenshot_path)
+        _take_screenshot(driver, screenshot_path, in_memory, visit_info)
         return True
     except WebDriverException as e:
         logger.error(f"浏览器错误 ({url}): {e}")
@@ -90,5 +241,3 @@ def visit_page(driver: WebDriver, url: str, screenshot_path: str, config: dict)
     except Exception as e:
         logger.error(f"访问发生未知错误 ({url}): {e}")
         return False
-    finally:
-        driver.quit()